@@ -1,12 +1,13 @@
 import os
 import pandas as pd
 import json
-import boto3
 from datetime import datetime
 from decouple import config
 
 def upload_to_s3(local_file, bucket_name, s3_key):
     """Upload a file to S3."""
+    import boto3  # only the upload path needs it
+
     s3_client = boto3.client("s3")
     try:
         s3_client.upload_file(local_file, bucket_name, s3_key)
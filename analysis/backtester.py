@@ -0,0 +1,928 @@
+"""
+Event-driven backtester with resting limit orders and intrabar fills.
+
+    python -m analysis.backtester analysis/data_15m.csv --strategy bollinger --all-markets
+    python -m analysis.backtester candles.parquet --strategy slope_50 \\
+        --params '{"type": "slope_momentum", "window": 50}' --fill through
+
+The notebook simulators trade every signal at the bar's close. Here the
+live Bollinger rules are replayed as the bot places them: a market entry
+on the band touch plus a take-profit limit resting halfway to the
+opposite band, which fills when a later bar's high/low reaches it.
+
+Bars (or ticks, as one-price bars) become events in a priority queue:
+funding settles at the open of the bar after each funding time, resting
+limits fill inside the bar, stale limits expire, and strategies act on
+the close, in that order. Strategies only wake up on bars where they can
+act: when a market is flat, the next bar meeting an entry condition;
+when it is in a position, the next bar meeting an exit condition. Both
+come from the vectorised indicators (strategy_engine, indicators.py) by
+binary search. A resting order's fill bar is found by a forward scan of
+the market's high/low when it is placed. A year of 1m bars for 30
+markets therefore costs the indicator pass plus a few events per trade,
+not a Python step per bar.
+
+Fill models for resting limits:
+- "touch": fills once the bar's range reaches the limit price.
+- "through": the price must trade `through` (a fraction) beyond the
+  limit, for orders that sit at the back of the queue.
+- "close": fills only when a close crosses the limit, as the notebooks.
+A bar that opens beyond the limit fills at the open.
+
+Market orders fill at the decision bar's close moved against us by
+`slippage` and pay `taker_fee`; limits pay `maker_fee`. Positions pay
+`funding_rate` of their notional at each funding time (longs pay a
+positive rate, shorts receive it).
+
+Signal-only strategies (strategy_engine.SignalStrategy with masks())
+have no resting orders, so run() replays them on a vectorised path that
+finds all entries and exits per market by binary search and prices the
+fills with array operations. Strategies without masks() fall back to
+evaluate() on every bar.
+"""
+import argparse
+import bisect
+import heapq
+import itertools
+import json
+import logging
+import sys
+
+import numpy as np
+import pandas as pd
+
+from constants import MIN_LIMIT_GAP, NUM_STD, STALE_LIMIT_HOURS, TRADE_SIZE, TRADING_STRATEGIES, WINDOW
+from strategy_engine import CLOSE, BarView, BollingerStrategy, IndicatorSet, SignalStrategy, build_strategy
+
+logger = logging.getLogger(__name__)
+
+FUNDING_INTERVAL_MS = 8 * 3600 * 1000
+FILL_MODELS = ("touch", "through", "close")
+MIDDLE_EXITS = ("live", "market", "hold")
+
+# events of one bar run in this order: funding settles at the open, resting
+# orders fill inside the bar, stale orders expire, strategies act on the close
+FUNDING, FILL, EXPIRE, BAR = range(4)
+
+
+class Bars:
+    """
+    Aligned OHLC bars for a backtest, as time x market arrays.
+
+    Parameters:
+    - time (array): Bar start times in Unix milliseconds, ascending.
+    - close (array): Closes, time x market; NaN where a market has no bar.
+    - markets (list): Market names, one per column.
+    - open, high, low (array): Same shape as close; default to the close (no intrabar range).
+    """
+
+    def __init__(self, time, close, markets, open=None, high=None, low=None):
+        self.time = np.asarray(time, dtype=np.int64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.open = self.close if open is None else np.asarray(open, dtype=np.float64)
+        self.high = self.close if high is None else np.asarray(high, dtype=np.float64)
+        self.low = self.close if low is None else np.asarray(low, dtype=np.float64)
+        self.markets = list(markets)
+        self.columns = {market: i for i, market in enumerate(self.markets)}
+        self.__series = {}
+
+    @classmethod
+    def from_closes(cls, price_data, intrabar="bridge"):
+        """
+        Bars from a close-only frame such as data_15m.csv.
+
+        Parameters:
+        - price_data (DataFrame): One close column per market, times in a 'time' column or the index.
+        - intrabar (str): "bridge" spans each bar from the previous close to its close, since
+          the price traded through everything in between; "close" gives bars no range.
+
+        Returns:
+        - Bars
+        """
+        markets = [c for c in price_data.columns if c != 'time']
+        times = price_data['time'] if 'time' in price_data.columns else price_data.index
+        time = pd.to_datetime(times).to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        close = price_data[markets].to_numpy(dtype=np.float64)
+        if intrabar == "close":
+            return cls(time, close, markets)
+        if intrabar != "bridge":
+            raise ValueError("intrabar must be 'bridge' or 'close'")
+        open = np.empty_like(close)
+        open[0] = close[0]
+        open[1:] = close[:-1]
+        gaps = np.isnan(open)
+        open[gaps] = close[gaps]
+        return cls(time, close, markets, open, np.fmax(open, close), np.fmin(open, close))
+
+    @classmethod
+    def from_candles(cls, candles):
+        """
+        Bars from exchange candles, aligned on the union of their timestamps.
+
+        Parameters:
+        - candles (dict): market -> rows of [ts, open, high, low, close, ...] as the
+          candles endpoints return them (strings are fine).
+
+        Returns:
+        - Bars: NaN where a market has no candle.
+        """
+        markets = list(candles)
+        parsed = {m: np.asarray([row[:5] for row in rows], dtype=np.float64).reshape(-1, 5)
+                  for m, rows in candles.items()}
+        time = np.unique(np.concatenate([rows[:, 0] for rows in parsed.values()])).astype(np.int64)
+        fields = np.full((4, len(time), len(markets)), np.nan)
+        for j, market in enumerate(markets):
+            rows = parsed[market]
+            index = np.searchsorted(time, rows[:, 0].astype(np.int64))
+            fields[:, index, j] = rows[:, 1:5].T
+        open, high, low, close = fields
+        return cls(time, close, markets, open, high, low)
+
+    @classmethod
+    def from_ticks(cls, ticks):
+        """
+        One-price bars from trades or tickers, the last price per market and timestamp.
+
+        Parameters:
+        - ticks (DataFrame): 'ts' (Unix ms), 'market' and 'price' columns.
+
+        Returns:
+        - Bars
+        """
+        prices = ticks.pivot_table(index='ts', columns='market', values='price', aggfunc='last').sort_index()
+        return cls(prices.index.to_numpy(dtype=np.int64), prices.to_numpy(dtype=np.float64), list(prices.columns))
+
+    def __len__(self):
+        return len(self.time)
+
+    def frame(self, markets=None):
+        """Close-only frame (time index, one column per market) for IndicatorSet."""
+        markets = self.markets if markets is None else markets
+        closes = self.close[:, [self.columns[m] for m in markets]]
+        return pd.DataFrame(closes, index=pd.to_datetime(self.time, unit='ms'), columns=markets)
+
+    def series(self, column):
+        """Contiguous (open, high, low, close) of one market, for the forward fill scans."""
+        series = self.__series.get(column)
+        if series is None:
+            series = self.__series[column] = tuple(np.ascontiguousarray(a[:, column])
+                                                   for a in (self.open, self.high, self.low, self.close))
+        return series
+
+    def funding_rows(self, interval_ms=FUNDING_INTERVAL_MS):
+        """Rows of the first bar starting at or after each funding time inside the data."""
+        return np.flatnonzero(np.diff(self.time // interval_ms) > 0) + 1
+
+
+class Order:
+    """A resting limit order; `size` is signed (positive buys)."""
+
+    __slots__ = ("id", "column", "size", "price", "row", "fill_row", "tag", "status")
+
+    def __init__(self, id, column, size, price, row, tag=None):
+        self.id = id
+        self.column = column
+        self.size = size
+        self.price = price
+        self.row = row
+        self.fill_row = None
+        self.tag = tag
+        self.status = "open"
+
+    def __repr__(self):
+        return "Order(%s, column=%s, size=%s, price=%s, %s)" % (self.id, self.column, self.size, self.price,
+                                                                 self.status)
+
+
+class OrderBook:
+    """
+    Resting limit orders of one market in price-sorted books, as PaperExecution keeps them.
+
+    Buys are kept highest last and sells lowest first, so best() is O(1)
+    and add/remove are O(log n + n) list inserts on books of a few orders.
+    """
+
+    def __init__(self):
+        self.buys = []
+        self.sells = []
+        self.orders = {}
+
+    def __len__(self):
+        return len(self.orders)
+
+    def add(self, order):
+        self.orders[order.id] = order
+        bisect.insort(self.buys if order.size > 0 else self.sells, (order.price, order.id))
+
+    def remove(self, order):
+        if self.orders.pop(order.id, None) is None:
+            return False
+        book = self.buys if order.size > 0 else self.sells
+        del book[bisect.bisect_left(book, (order.price, order.id))]
+        return True
+
+    def best(self, buy):
+        """Best resting buy (highest) or sell (lowest), or None."""
+        book = self.buys if buy else self.sells
+        if not book:
+            return None
+        return self.orders[(book[-1] if buy else book[0])[1]]
+
+
+class BacktestStrategy:
+    """
+    Base class for strategies replayed by Backtester.run.
+
+    indicators() lists strategy_engine indicator keys; prepare() receives
+    their values once. next_row(column, start) returns the first row at or
+    after `start` where on_bar() may act given the market's current state,
+    or None; the backtester asks again after each of the market's events,
+    so returning every row (the default) is always correct, only slower.
+    on_bar() trades through the backtester's market_order/limit_order/cancel.
+
+    Parameters:
+    - name (str): Name used in logs and results.
+    - markets (list): Markets to trade; defaults to the TRADING_STRATEGIES keys.
+    - directions (dict): market -> "long" | "short" | "both"; defaults to TRADING_STRATEGIES.
+    """
+
+    def __init__(self, name, markets=None, directions=None):
+        self.name = name
+        self.directions = directions if directions is not None else TRADING_STRATEGIES
+        self.markets = list(markets or self.directions.keys())
+
+    def indicators(self):
+        return []
+
+    def prepare(self, backtester, indicators, columns):
+        """Called once before the replay; `columns` maps each traded market to its Bars column."""
+
+    def next_row(self, column, start):
+        return start
+
+    def on_bar(self, backtester, column, row):
+        raise NotImplementedError
+
+    def on_fill(self, backtester, order, row):
+        """A resting order filled inside bar `row`."""
+
+    def on_expire(self, backtester, order, row):
+        """A resting order was cancelled as stale at bar `row`."""
+
+    def allows(self, market, side):
+        return self.directions.get(market, "both") in (side, "both")
+
+
+def _next(rows, start):
+    """First value in the sorted array `rows` that is >= start, or None."""
+    i = int(np.searchsorted(rows, start))
+    return int(rows[i]) if i < len(rows) else None
+
+
+class BollingerBacktest(BacktestStrategy):
+    """
+    The live rules of bollinger.evaluate_market with the orders they place.
+
+    A close at or below the lower band (for markets allowed to go long)
+    buys at market and rests a sell limit halfway between the middle and
+    upper bands; a close at or above the upper band sells at market and
+    rests a buy limit halfway between the middle and lower bands. Both
+    need the limit at least `min_limit_gap` away from the close. The live
+    "close_short"/"open_short" sides are the long/short entries here.
+
+    Limits still resting after `stale_hours` are cancelled as the live bot
+    does. What happens on the first close back at the middle band depends
+    on `middle_exit`:
+    - "live" (default): as the bot, which only drops the market from
+      open_trades. Nothing is sent; the position and its limit stay until
+      the limit fills, and a stale-cancelled limit leaves the position
+      open. The market can be entered again meanwhile.
+    - "market": the position is closed at market and its limit cancelled.
+    - "hold": the middle band is ignored; the position ends when its limit
+      fills, or at market when the limit goes stale.
+    """
+
+    def __init__(self, name="bollinger", window=WINDOW, num_std=NUM_STD, min_limit_gap=MIN_LIMIT_GAP,
+                 middle_exit="live", stale_hours=STALE_LIMIT_HOURS, trade_size=TRADE_SIZE, **kwargs):
+        if middle_exit not in MIDDLE_EXITS:
+            raise ValueError(f"middle_exit must be one of {MIDDLE_EXITS}")
+        super().__init__(name, **kwargs)
+        self.num_std = num_std
+        self.min_limit_gap = min_limit_gap
+        self.middle_exit = middle_exit
+        self.stale_hours = stale_hours
+        self.trade_size = trade_size
+        self.mean_key = ("sma", window)
+        self.std_key = ("std", window)
+
+    @classmethod
+    def from_engine(cls, strategy, **kwargs):
+        """The backtest twin of a strategy_engine.BollingerStrategy."""
+        return cls(strategy.name, window=strategy.mean_key[1], num_std=strategy.num_std,
+                   markets=strategy.markets, directions=strategy.directions, **kwargs)
+
+    def indicators(self):
+        return [self.mean_key, self.std_key]
+
+    def prepare(self, backtester, indicators, columns):
+        close = indicators.array(CLOSE)
+        middle = indicators.array(self.mean_key)
+        width = indicators.array(self.std_key) * self.num_std
+        with np.errstate(invalid="ignore"):
+            # take-profit limits halfway to the opposite band, as evaluate_market places them
+            self.long_limit = middle + width / 2
+            self.short_limit = middle - width / 2
+            long_entry = (close <= middle - width) & (np.abs(self.long_limit - close) >= self.min_limit_gap * close)
+            short_entry = (close >= middle + width) & (np.abs(self.short_limit - close) >= self.min_limit_gap * close)
+            long_exit = close >= middle
+            short_exit = close <= middle
+        self.close = close
+        self.rows = {}
+        for market, j in columns.items():
+            i = indicators.columns[market]
+            self.rows[j] = (np.flatnonzero(long_entry[:, i]) if self.allows(market, "long") else np.empty(0, int),
+                            np.flatnonzero(short_entry[:, i]) if self.allows(market, "short") else np.empty(0, int),
+                            np.flatnonzero(long_exit[:, i]), np.flatnonzero(short_exit[:, i]))
+        self.column_index = {j: indicators.columns[m] for m, j in columns.items()}
+        self.side = {j: 0 for j in columns.values()}
+        self.take_profit = {}
+        self.stale_ms = None if self.stale_hours is None else int(self.stale_hours * 3600 * 1000)
+
+    def next_row(self, column, start):
+        long_entry, short_entry, long_exit, short_exit = self.rows[column]
+        side = self.side[column]
+        if side == 0:
+            rows = [r for r in (_next(long_entry, start), _next(short_entry, start)) if r is not None]
+            return min(rows) if rows else None
+        if self.middle_exit == "hold":
+            return None
+        return _next(long_exit if side > 0 else short_exit, start)
+
+    def on_bar(self, backtester, column, row):
+        i = self.column_index[column]
+        side = self.side[column]
+        if side:
+            # back at the middle band
+            if self.middle_exit == "market":
+                backtester.cancel(self.take_profit.pop(column, None))
+                backtester.close_position(column, row, tag="exit")
+            else:
+                # the bot forgets the trade; its limit keeps resting untracked
+                self.take_profit.pop(column, None)
+            self.side[column] = 0
+            return
+        price = self.close[row, i]
+        size = self.trade_size / price
+        long_entry, short_entry = self.rows[column][:2]
+        # evaluate_market checks the long entry first
+        if _next(long_entry, row) == row:
+            side, limit = 1, self.long_limit[row, i]
+        elif _next(short_entry, row) == row:
+            side, limit = -1, self.short_limit[row, i]
+        else:
+            return
+        backtester.market_order(column, side * size, row, tag="entry")
+        expire = None
+        if self.stale_ms is not None:
+            expire = backtester.row_at(backtester.bars.time[row] + self.stale_ms)
+        self.take_profit[column] = backtester.limit_order(column, -side * size, limit, row, expire_row=expire,
+                                                          tag="take_profit")
+        self.side[column] = side
+
+    def on_fill(self, backtester, order, row):
+        # limits of forgotten trades ("live") fill without touching the current one
+        if self.take_profit.get(order.column) is order:
+            del self.take_profit[order.column]
+            self.side[order.column] = 0
+
+    def on_expire(self, backtester, order, row):
+        if self.take_profit.get(order.column) is not order:
+            return
+        del self.take_profit[order.column]
+        if self.middle_exit == "hold":
+            backtester.close_position(order.column, row, tag="stale_exit")
+            self.side[order.column] = 0
+
+
+class SignalBacktest(BacktestStrategy):
+    """
+    Replays a strategy_engine.SignalStrategy with market orders of `trade_size` USDT.
+
+    With the strategy's masks() the replay only visits entry and exit bars,
+    and Backtester.run takes the vectorised path; without them evaluate()
+    runs on every bar.
+    """
+
+    def __init__(self, strategy, trade_size=TRADE_SIZE):
+        super().__init__(strategy.name, markets=strategy.markets, directions=strategy.directions)
+        self.strategy = strategy
+        self.trade_size = trade_size
+        self.vectorized = False
+
+    def indicators(self):
+        return self.strategy.indicators()
+
+    def prepare(self, backtester, indicators, columns):
+        self.indicators_set = indicators
+        self.close = indicators.array(CLOSE)
+        self.markets_by_column = {j: m for m, j in columns.items()}
+        self.column_index = {j: indicators.columns[m] for m, j in columns.items()}
+        self.side = {j: 0 for j in columns.values()}
+        self.strategy.positions = {}
+        masks = self.strategy.masks(indicators)
+        self.vectorized = masks is not None
+        if masks is None:
+            return
+        entries, exits = masks
+        priced = ~np.isnan(self.close)
+        # entry() checks long first; a long signal in a short-only market is no entry at all
+        long_entry = entries["long"] & priced
+        short_entry = entries["short"] & ~entries["long"] & priced
+        self.rows = {}
+        for market, j in columns.items():
+            i = indicators.columns[market]
+            self.rows[j] = (np.flatnonzero(long_entry[:, i]) if self.allows(market, "long") else np.empty(0, int),
+                            np.flatnonzero(short_entry[:, i]) if self.allows(market, "short") else np.empty(0, int),
+                            np.flatnonzero(exits["long"][:, i]), np.flatnonzero(exits["short"][:, i]))
+
+    def next_row(self, column, start):
+        if not self.vectorized:
+            return start
+        long_entry, short_entry, long_exit, short_exit = self.rows[column]
+        side = self.side[column]
+        if side == 0:
+            rows = [r for r in (_next(long_entry, start), _next(short_entry, start)) if r is not None]
+            return min(rows) if rows else None
+        return _next(long_exit if side > 0 else short_exit, start)
+
+    def trades(self, column, rows):
+        """
+        Every (entry row, exit row or None, side) of one market, by binary search over its masks.
+
+        Parameters:
+        - column (int): Bars column of the market.
+        - rows (int): Number of bars.
+
+        Returns:
+        - list: trades in time order; the last one may still be open (exit None).
+        """
+        long_entry, short_entry, long_exit, short_exit = self.rows[column]
+        trades = []
+        start = 0
+        while start < rows:
+            long_row, short_row = _next(long_entry, start), _next(short_entry, start)
+            if long_row is None and short_row is None:
+                break
+            if short_row is None or (long_row is not None and long_row <= short_row):
+                entry, side = long_row, 1
+            else:
+                entry, side = short_row, -1
+            # exits are checked from the bar after the entry, and the exit bar enters nothing
+            exit = _next(long_exit if side > 0 else short_exit, entry + 1)
+            trades.append((entry, exit, side))
+            if exit is None:
+                break
+            start = exit + 1
+        return trades
+
+    def on_bar(self, backtester, column, row):
+        if self.vectorized:
+            side = self.side[column]
+            if side:
+                backtester.close_position(column, row, tag="exit")
+                self.side[column] = 0
+                return
+            long_entry = self.rows[column][0]
+            side = 1 if _next(long_entry, row) == row else -1
+            signal = "long" if side > 0 else "short"
+        else:
+            market = self.markets_by_column[column]
+            signal = self.strategy.evaluate(market, BarView(self.indicators_set, self.column_index[column], row))
+            if signal is None:
+                return
+            if signal == "exit":
+                backtester.close_position(column, row, tag="exit")
+                self.side[column] = 0
+                return
+            side = 1 if signal == "long" else -1
+        price = self.close[row, self.column_index[column]]
+        backtester.market_order(column, side * self.trade_size / price, row, tag="entry")
+        self.side[column] = side
+
+
+class BacktestResult:
+    """
+    Fills, funding payments and the equity curve of one backtest.
+
+    Parameters:
+    - bars (Bars): The replayed bars.
+    - fills (DataFrame): One row per fill: row, time, market, size (signed), price, fee, tag.
+    - funding (DataFrame): One row per funding payment: row, time, market, amount (negative = paid).
+    - initial_balance (float): Starting balance in USDT.
+    """
+
+    def __init__(self, name, bars, fills, funding, initial_balance):
+        self.name = name
+        self.bars = bars
+        self.fills = fills
+        self.funding = funding
+        self.initial_balance = initial_balance
+        self.__equity = None
+
+    @property
+    def equity(self):
+        """Balance plus open positions marked at each close, one value per bar."""
+        if self.__equity is None:
+            bars = self.bars
+            cash = np.zeros(len(bars))
+            fills = self.fills
+            np.add.at(cash, fills['row'].to_numpy(),
+                      -(fills['size'] * fills['price']).to_numpy() - fills['fee'].to_numpy())
+            np.add.at(cash, self.funding['row'].to_numpy(), self.funding['amount'].to_numpy())
+            equity = self.initial_balance + np.cumsum(cash)
+            for market, trades in fills.groupby('market'):
+                j = bars.columns[market]
+                held = np.zeros(len(bars))
+                np.add.at(held, trades['row'].to_numpy(), trades['size'].to_numpy())
+                held = np.cumsum(held)
+                # a market without a bar keeps its last close
+                marks = pd.Series(bars.close[:, j]).ffill().fillna(0.0).to_numpy()
+                equity += held * marks
+            self.__equity = pd.Series(equity, index=pd.to_datetime(bars.time, unit='ms'), name=self.name)
+        return self.__equity
+
+    def summary(self):
+        equity = self.equity
+        peak = np.maximum.accumulate(equity.to_numpy())
+        drawdown = ((equity.to_numpy() - peak) / peak).min() if len(equity) else 0.0
+        final = float(equity.iloc[-1]) if len(equity) else self.initial_balance
+        return {
+            "strategy": self.name,
+            "final_equity": final,
+            "return_pct": (final / self.initial_balance - 1) * 100,
+            "max_drawdown_pct": float(drawdown) * 100,
+            "trades": int((self.fills['tag'] == "entry").sum()),
+            "fills": len(self.fills),
+            "limit_fills": int((self.fills['tag'] == "take_profit").sum()),
+            "fees": float(self.fills['fee'].sum()),
+            "funding": float(self.funding['amount'].sum()),
+        }
+
+
+class Backtester:
+    """
+    Replays strategies over Bars through a priority queue of events.
+
+    Parameters:
+    - bars (Bars): Aligned bars of every market.
+    - taker_fee, maker_fee (float): Fee rates of market and limit fills (PaperExecution's defaults).
+    - slippage (float): Fraction market orders fill against us.
+    - funding_rate (float or dict): Rate per funding interval, or market -> rate.
+    - funding_interval_ms (int): Time between funding settlements (8h on Bitget).
+    - fill (str): Limit fill model, one of FILL_MODELS.
+    - through (float): How far beyond its price a limit must trade under the "through" model.
+    - initial_balance (float): Starting balance in USDT.
+    """
+
+    def __init__(self, bars, taker_fee=0.0006, maker_fee=0.0002, slippage=0.0005, funding_rate=0.0001,
+                 funding_interval_ms=FUNDING_INTERVAL_MS, fill="touch", through=0.0005, initial_balance=10000.0):
+        if fill not in FILL_MODELS:
+            raise ValueError(f"fill must be one of {', '.join(FILL_MODELS)}")
+        self.bars = bars
+        self.taker_fee = taker_fee
+        self.maker_fee = maker_fee
+        self.slippage = slippage
+        self.funding_rate = funding_rate
+        self.funding_interval_ms = funding_interval_ms
+        self.fill = fill
+        self.through = through
+        self.initial_balance = initial_balance
+
+    def rate(self, column):
+        if isinstance(self.funding_rate, dict):
+            return self.funding_rate.get(self.bars.markets[column], 0.0)
+        return self.funding_rate
+
+    def row_at(self, ts):
+        """First row starting at or after `ts`, or None past the end of the data."""
+        row = int(np.searchsorted(self.bars.time, ts))
+        return row if row < len(self.bars) else None
+
+    # -- run --------------------------------------------------------------
+
+    def run(self, strategy, vectorized=True):
+        """
+        Replay `strategy` over the bars.
+
+        Parameters:
+        - strategy: A BacktestStrategy, or a strategy_engine strategy (BollingerStrategy or a
+          SignalStrategy), which is wrapped in its backtest twin.
+        - vectorized (bool): Use the vectorised path for signal strategies that support it;
+          False forces the event path (same results, for checking).
+
+        Returns:
+        - BacktestResult
+        """
+        if isinstance(strategy, BollingerStrategy):
+            strategy = BollingerBacktest.from_engine(strategy)
+        elif isinstance(strategy, SignalStrategy):
+            strategy = SignalBacktest(strategy)
+        markets = [m for m in strategy.markets if m in self.bars.columns]
+        missing = set(strategy.markets) - set(markets)
+        if missing:
+            logger.warning("No bars for %s", ", ".join(sorted(missing)))
+        columns = {m: self.bars.columns[m] for m in markets}
+        indicators = IndicatorSet(self.bars.frame(markets))
+        keys = strategy.indicators()
+        indicators.prefetch(keys)
+        for key in keys:
+            indicators.array(key)
+
+        self.__reset()
+        strategy.prepare(self, indicators, columns)
+        if vectorized and getattr(strategy, "vectorized", False):
+            self.__run_vectorized(strategy, columns)
+        else:
+            self.__run_events(strategy, columns)
+        result = self.__result(strategy.name)
+        summary = result.summary()
+        logger.info("Backtest %s: %d trades, return %.2f%%", strategy.name, summary["trades"],
+                    summary["return_pct"], extra={"event": "backtest", **summary})
+        return result
+
+    def __reset(self):
+        markets = len(self.bars.markets)
+        self.positions = np.zeros(markets)
+        self.books = {}
+        self.__ids = itertools.count(1)
+        self.__queue = []
+        self.__seq = itertools.count()
+        self.__fills = []
+        self.__fill_arrays = []
+        self.__funding = []
+        self.__funding_arrays = []
+
+    def __push(self, row, kind, ref):
+        heapq.heappush(self.__queue, (row, kind, next(self.__seq), ref))
+
+    def __run_events(self, strategy, columns):
+        bars = self.bars
+        rows = len(bars)
+        scheduled = {}
+
+        def wake(column, start):
+            row = strategy.next_row(column, start) if start < rows else None
+            if row is not None and row < rows and scheduled.get(column) != row:
+                scheduled[column] = row
+                self.__push(row, BAR, column)
+
+        for row in bars.funding_rows(self.funding_interval_ms):
+            self.__push(int(row), FUNDING, None)
+        for column in columns.values():
+            wake(column, 0)
+
+        queue = self.__queue
+        while queue:
+            row, kind, _, ref = heapq.heappop(queue)
+            if kind == BAR:
+                if scheduled.get(ref) != row:
+                    continue
+                del scheduled[ref]
+                strategy.on_bar(self, ref, row)
+                wake(ref, row + 1)
+            elif kind == FILL:
+                if ref.status != "open" or ref.fill_row != row:
+                    continue
+                self.__fill_order(ref, row)
+                strategy.on_fill(self, ref, row)
+                # the strategy decides on this bar's close with the order filled
+                scheduled.pop(ref.column, None)
+                wake(ref.column, row)
+            elif kind == EXPIRE:
+                if ref.status != "open":
+                    continue
+                self.cancel(ref)
+                ref.status = "expired"
+                strategy.on_expire(self, ref, row)
+                scheduled.pop(ref.column, None)
+                wake(ref.column, row)
+            else:
+                self.__settle_funding(row)
+
+    def __run_vectorized(self, strategy, columns):
+        bars = self.bars
+        funding_rows = bars.funding_rows(self.funding_interval_ms)
+        for column in columns.values():
+            trades = strategy.trades(column, len(bars))
+            if not trades:
+                continue
+            entries = np.array([t[0] for t in trades])
+            exits = np.array([len(bars) if t[1] is None else t[1] for t in trades])
+            sides = np.array([t[2] for t in trades], dtype=np.float64)
+            close = bars.close[:, column]
+            sizes = sides * strategy.trade_size / close[entries]
+            closed = exits < len(bars)
+            rows = np.concatenate([entries, exits[closed]])
+            sizes_all = np.concatenate([sizes, -sizes[closed]])
+            prices = close[rows] * (1 + self.slippage * np.sign(sizes_all))
+            tags = np.array(["entry"] * len(entries) + ["exit"] * int(closed.sum()), dtype=object)
+            self.__fill_arrays.append((rows, np.full(len(rows), column), sizes_all, prices,
+                                       np.abs(sizes_all) * prices * self.taker_fee, tags))
+            # funding times passed while each position was held: entry < row <= exit
+            rate = self.rate(column)
+            if rate and len(funding_rows):
+                low = np.searchsorted(funding_rows, entries, side='right')
+                high = np.searchsorted(funding_rows, np.minimum(exits, len(bars) - 1), side='right')
+                counts = high - low
+                if counts.sum():
+                    index = np.repeat(low - np.cumsum(np.concatenate([[0], counts[:-1]])), counts) + \
+                        np.arange(counts.sum())
+                    paid = funding_rows[index]
+                    held = np.repeat(sizes, counts)
+                    price = bars.open[paid, column]
+                    amount = -held * price * rate
+                    valid = ~np.isnan(amount)
+                    self.__funding_arrays.append((paid[valid], np.full(int(valid.sum()), column), amount[valid]))
+
+    # -- orders -----------------------------------------------------------
+
+    def market_order(self, column, size, row, tag=None):
+        """Fill `size` (signed) at bar `row`'s close moved against us by the slippage."""
+        price = self.bars.close[row, column] * (1 + self.slippage if size > 0 else 1 - self.slippage)
+        self.__record(row, column, size, price, abs(size) * price * self.taker_fee, tag)
+
+    def close_position(self, column, row, tag=None):
+        if self.positions[column]:
+            self.market_order(column, -self.positions[column], row, tag)
+
+    def limit_order(self, column, size, price, row, expire_row=None, tag=None):
+        """
+        Rest a limit order placed on bar `row`'s close; it can fill from the next bar on.
+
+        Parameters:
+        - column (int): Bars column of the market.
+        - size (float): Signed size, positive buys.
+        - price (float): Limit price.
+        - row (int): Bar the order is placed on.
+        - expire_row (int): Bar at which the order is cancelled if still resting.
+        - tag (str): Label carried into the fills.
+
+        Returns:
+        - Order
+        """
+        order = Order(next(self.__ids), column, size, price, row, tag)
+        self.books.setdefault(column, OrderBook()).add(order)
+        stop = len(self.bars) if expire_row is None else expire_row + 1
+        order.fill_row = self.__cross_row(order, row + 1, stop)
+        if order.fill_row is not None:
+            self.__push(order.fill_row, FILL, order)
+        elif expire_row is not None:
+            self.__push(expire_row, EXPIRE, order)
+        return order
+
+    def cancel(self, order):
+        if order is None or order.status != "open":
+            return False
+        self.books[order.column].remove(order)
+        order.status = "cancelled"
+        return True
+
+    def open_orders(self, column):
+        book = self.books.get(column)
+        return list(book.orders.values()) if book else []
+
+    def __cross_row(self, order, start, stop):
+        """First bar in [start, stop) whose prices reach the order under the fill model, or None."""
+        open, high, low, close = self.bars.series(order.column)
+        buy = order.size > 0
+        if self.fill == "close":
+            series, threshold = close, order.price
+        elif self.fill == "through":
+            series = low if buy else high
+            threshold = order.price * (1 - self.through if buy else 1 + self.through)
+        else:
+            series, threshold = (low if buy else high), order.price
+        # growing chunks: most limits fill (or are cancelled) soon after they are placed
+        step = 256
+        while start < stop:
+            end = min(start + step, stop)
+            window = series[start:end]
+            hits = window <= threshold if buy else window >= threshold
+            i = int(hits.argmax())
+            if hits[i]:
+                return start + i
+            start = end
+            step *= 4
+        return None
+
+    def __fill_order(self, order, row):
+        self.books[order.column].remove(order)
+        order.status = "filled"
+        price = order.price
+        if self.fill != "close":
+            # a bar that opens beyond the limit fills at the open
+            first = self.bars.open[row, order.column]
+            if order.size > 0 and first < price or order.size < 0 and first > price:
+                price = first
+        self.__record(row, order.column, order.size, price, abs(order.size) * price * self.maker_fee, order.tag)
+
+    def __record(self, row, column, size, price, fee, tag):
+        self.positions[column] += size
+        if abs(self.positions[column]) < 1e-12:
+            self.positions[column] = 0.0
+        self.__fills.append((row, column, size, price, fee, tag))
+
+    def __settle_funding(self, row):
+        for column in np.flatnonzero(self.positions):
+            price = self.bars.open[row, column]
+            amount = -self.positions[column] * price * self.rate(column)
+            if amount == amount and amount:
+                self.__funding.append((row, int(column), amount))
+
+    # -- results ----------------------------------------------------------
+
+    def __result(self, name):
+        bars = self.bars
+        chunks = list(self.__fill_arrays)
+        if self.__fills:
+            chunks.append(tuple(np.array(field, dtype=object if i == 5 else None)
+                                for i, field in enumerate(zip(*self.__fills))))
+        if chunks:
+            rows, columns, sizes, prices, fees, tags = (np.concatenate(f) for f in zip(*chunks))
+        else:
+            rows = columns = np.empty(0, dtype=np.int64)
+            sizes = prices = fees = np.empty(0)
+            tags = np.empty(0, dtype=object)
+        rows = rows.astype(np.int64)
+        order = np.argsort(rows, kind="stable")
+        fills = pd.DataFrame({
+            'row': rows[order],
+            'time': pd.to_datetime(bars.time[rows[order]], unit='ms'),
+            'market': np.asarray(bars.markets, dtype=object)[columns[order].astype(np.int64)],
+            'size': sizes[order].astype(np.float64),
+            'price': prices[order].astype(np.float64),
+            'fee': fees[order].astype(np.float64),
+            'tag': tags[order],
+        })
+        chunks = list(self.__funding_arrays)
+        if self.__funding:
+            chunks.append(tuple(np.array(field) for field in zip(*self.__funding)))
+        if chunks:
+            rows, columns, amounts = (np.concatenate(f) for f in zip(*chunks))
+        else:
+            rows = columns = np.empty(0, dtype=np.int64)
+            amounts = np.empty(0)
+        rows = rows.astype(np.int64)
+        order = np.argsort(rows, kind="stable")
+        funding = pd.DataFrame({
+            'row': rows[order],
+            'time': pd.to_datetime(bars.time[rows[order]], unit='ms'),
+            'market': np.asarray(bars.markets, dtype=object)[columns[order].astype(np.int64)],
+            'amount': amounts[order].astype(np.float64),
+        })
+        return BacktestResult(name, bars, fills, funding, self.initial_balance)
+
+
+def load_bars(path, intrabar="bridge"):
+    """Bars from a close-only CSV/Parquet frame (data_15m.csv layout), repaired as the live ingest does."""
+    from data_quality import validate_prices
+
+    frame = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    frame, _ = validate_prices(frame, granularity=None)
+    return Bars.from_closes(frame, intrabar=intrabar)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("data", help="close-only price frame, CSV or Parquet")
+    parser.add_argument("--strategy", default="bollinger", help="strategy name")
+    parser.add_argument("--params", default="{}",
+                        help="strategy parameters as JSON, as in constants.STRATEGIES")
+    parser.add_argument("--all-markets", action="store_true",
+                        help="trade every market in the data, both directions")
+    parser.add_argument("--intrabar", choices=("bridge", "close"), default="bridge")
+    parser.add_argument("--fill", choices=FILL_MODELS, default="touch")
+    parser.add_argument("--through", type=float, default=0.0005)
+    parser.add_argument("--funding-rate", type=float, default=0.0001)
+    parser.add_argument("--slippage", type=float, default=0.0005)
+    parser.add_argument("--middle-exit", choices=MIDDLE_EXITS, default="live",
+                        help="Bollinger exit on the middle band (see BollingerBacktest)")
+    parser.add_argument("--events", action="store_true", help="force the event path")
+    args = parser.parse_args(argv)
+
+    bars = load_bars(args.data, args.intrabar)
+    params = json.loads(args.params)
+    if args.all_markets:
+        params["directions"] = {market: "both" for market in bars.markets}
+    strategy = build_strategy(args.strategy, params)
+    if isinstance(strategy, BollingerStrategy):
+        strategy = BollingerBacktest.from_engine(strategy, middle_exit=args.middle_exit)
+    backtester = Backtester(bars, slippage=args.slippage, funding_rate=args.funding_rate, fill=args.fill,
+                            through=args.through)
+    result = backtester.run(strategy, vectorized=not args.events)
+    json.dump(result.summary(), sys.stdout, indent=4)
+    print()
+
+
+if __name__ == "__main__":
+    main()
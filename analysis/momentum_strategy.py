@@ -0,0 +1,280 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class MomentumStrategy:
+    """
+    Percentage-slope momentum simulator from percent_slope_simulation.ipynb.
+
+    Ported as a module so benchmarks and scripts can import it; the plotting
+    helpers stay in the notebooks.
+    """
+
+    def __init__(self, price_data, leverage, initial_portfolio_value):
+        """
+        Initialize the MomentumStrategy.
+
+        Parameters:
+        - price_data (DataFrame): DataFrame with timestamp indexed asset prices.
+        - leverage (float): Leverage factor for trades.
+        - initial_portfolio_value (float): Starting portfolio value.
+        """
+        self.price_data = price_data.copy()
+        self.leverage = leverage
+        self.initial_portfolio_value = initial_portfolio_value
+        # Initialize trade logs with all necessary columns, including 'return'
+        self.trade_logs = {asset: pd.DataFrame(columns=['timestamp', 'type', 'price', 'slope', 'return'])
+                           for asset in self.price_data.columns if asset != 'time'}
+        # window -> DataFrame of SMA percentage slopes for every market, see prepare_percentage_slopes
+        self.slope_cache = {}
+
+    def calculate_kalman_filter(self, price_series, initial_state=None, process_var=1e-5, meas_var=0.1):
+        """
+        Calculate the Kalman filter estimate of the price series using pykalman.
+
+        Parameters:
+        - price_series (Series): Asset price series.
+        - initial_state (float): Initial state estimate (defaults to first price).
+        - process_var (float): Process variance (system noise).
+        - meas_var (float): Measurement variance (sensor noise).
+
+        Returns:
+        - Series: Kalman-filtered estimates.
+        """
+        from pykalman import KalmanFilter
+
+        if initial_state is None:
+            initial_state = price_series.iloc[0]
+
+        kf = KalmanFilter(
+            transition_matrices=[1],
+            observation_matrices=[1],
+            initial_state_mean=initial_state,
+            initial_state_covariance=1.0,
+            transition_covariance=process_var,
+            observation_covariance=meas_var
+        )
+        state_means, _ = kf.filter(price_series.values)
+        return pd.Series(state_means.flatten(), index=price_series.index)
+
+    def calculate_moving_avg(self, price_series, window):
+        """
+        Calculate the moving average of the price series.
+
+        Parameters:
+        - price_series (Series): Asset price series.
+        - window (int): Window size for moving average.
+
+        Returns:
+        - Series: Moving average series.
+        """
+        return price_series.rolling(window=window).mean()
+
+    def calculate_percentage_slope(self, moving_avg_series):
+        """
+        Calculate the percentage slope of the moving average.
+
+        Parameters:
+        - moving_avg_series (Series): Moving average series.
+
+        Returns:
+        - Series: Percentage slope values.
+        """
+        slope = (moving_avg_series.diff(1) / moving_avg_series.shift(1)) * 100
+        slope = slope.fillna(0)  # Replace NaN values with 0
+        return slope
+
+    def prepare_percentage_slopes(self, windows, dtype=np.float32):
+        """
+        Precompute the SMA percentage slopes of several windows for all markets in one kernel pass.
+
+        simulate_trade_with_percentage_slope uses them instead of recomputing
+        the moving average per market and call.
+
+        Parameters:
+        - windows (iterable): SMA window sizes.
+        - dtype: Storage dtype; float32 halves memory for wide window ranges.
+        """
+        from indicators import WindowKernels
+
+        windows = sorted(set(int(w) for w in windows) - set(self.slope_cache))
+        if not windows:
+            return
+        kernels = WindowKernels(self.price_data, dtype=dtype)
+        for window, slopes in zip(windows, kernels.sma_slope(windows)):
+            self.slope_cache[window] = pd.DataFrame(slopes, index=self.price_data.index, columns=kernels.markets)
+
+    def _log_trade(self, market, timestamp, trade_type, price, slope, trade_return):
+        new_row = pd.DataFrame([{
+            'timestamp': timestamp,
+            'type': trade_type,
+            'price': price,
+            'slope': slope,
+            'return': trade_return
+        }])
+        log = self.trade_logs[market]
+        # concat with the empty starting frame is deprecated (its dtypes would decide the result's)
+        self.trade_logs[market] = pd.concat([log, new_row], ignore_index=True) if len(log) else new_row
+
+    def _trade_return(self, entry_price, exit_price, position_type, position_size):
+        if position_type == "long":
+            price_change = (exit_price - entry_price) / entry_price
+        else:
+            price_change = (entry_price - exit_price) / entry_price
+        leveraged_return = price_change * position_size * self.leverage
+        # Assume a trading fee (e.g., 0.1%)
+        trading_fee = position_size * self.leverage * 0.001
+        return leveraged_return - trading_fee
+
+    def simulate_trade_with_percentage_slope(self, market, position_size, entry_threshold, exit_threshold, window=None, use_kalman=False, kalman_params=None):
+        """
+        Simulate trading for a single market using percentage-based slope values and record trade returns.
+
+        Parameters:
+        - market (str): Market identifier (column name in price_data).
+        - position_size (float): Size of each position.
+        - entry_threshold (float): Threshold for entering trades.
+        - exit_threshold (float): Threshold for exiting trades.
+        - window (int): Window size for moving average and slope calculation.
+
+        Returns:
+        - float: Final portfolio value after trading.
+        """
+        price_series = self.price_data[market]
+        if use_kalman:
+            filtered_series = self.calculate_kalman_filter(price_series, **(kalman_params or {}))
+            slope_series = self.calculate_percentage_slope(filtered_series).fillna(0)
+        elif window in self.slope_cache:
+            slope_series = self.slope_cache[window][market]
+        else:
+            filtered_series = self.calculate_moving_avg(price_series, window)
+            slope_series = self.calculate_percentage_slope(filtered_series).fillna(0)
+
+        portfolio_value = self.initial_portfolio_value
+        in_position = False
+        position_type = None  # "long" or "short"
+        entry_price = 0.0
+
+        for idx in range(len(self.price_data)):
+            current_slope = slope_series.iloc[idx]
+            current_price = price_series.iloc[idx]
+            current_time = slope_series.index[idx]
+
+            # Entry Conditions
+            if not in_position:
+                if current_slope >= entry_threshold:
+                    in_position, position_type, entry_price = True, "long", current_price
+                    self._log_trade(market, current_time, 'long_entry', entry_price, current_slope, np.nan)
+                elif current_slope <= -entry_threshold:
+                    in_position, position_type, entry_price = True, "short", current_price
+                    self._log_trade(market, current_time, 'short_entry', entry_price, current_slope, np.nan)
+
+            # Exit Conditions
+            elif (position_type == "long" and current_slope <= exit_threshold) or \
+                    (position_type == "short" and current_slope >= -exit_threshold):
+                trade_return = self._trade_return(entry_price, current_price, position_type, position_size)
+                portfolio_value += trade_return
+                self._log_trade(market, current_time, f'{position_type}_exit', current_price, current_slope, trade_return)
+                in_position, position_type, entry_price = False, None, None
+
+        # Exiting the last open position at the end of the data
+        if in_position:
+            final_price = price_series.iloc[-1]
+            trade_return = self._trade_return(entry_price, final_price, position_type, position_size)
+            portfolio_value += trade_return
+            self._log_trade(market, slope_series.index[-1], f'{position_type}_exit', final_price,
+                            slope_series.iloc[-1], trade_return)
+
+        return portfolio_value
+
+    def trade_all_markets_with_percentage_slope(self, window, position_size, entry_threshold, exit_threshold, use_kalman=False, kalman_params=None):
+        """
+        Simulate trading across all markets using percentage-based slope values.
+
+        Returns:
+        - float: Aggregate returns across all markets.
+        """
+        total_returns = 0.0
+        self.market_returns = {}
+        for market in self.price_data.columns:
+            if market == 'time':
+                continue
+
+            final_portfolio = self.simulate_trade_with_percentage_slope(
+                market=market,
+                position_size=position_size,
+                entry_threshold=entry_threshold,
+                exit_threshold=exit_threshold,
+                window=window,
+                use_kalman=use_kalman,
+                kalman_params=kalman_params
+            )
+            self.market_returns[market] = final_portfolio - self.initial_portfolio_value
+            total_returns += self.market_returns[market]
+
+        return total_returns
+
+    def run_monte_carlo_simulation_with_percentage_slope(self, iterations, window_range, entry_threshold_range, exit_threshold_range, output_name, use_kalman=False, kalman_params=None, save_path='simulation_results', store=None):
+        """
+        Run Monte Carlo simulations using percentage-based slope values.
+
+        Parameters:
+        - iterations (int): Number of simulation iterations.
+        - window_range (tuple): Tuple indicating the range (min, max) for window sizes.
+        - entry_threshold_range (tuple): Tuple indicating the range (min, max) for entry thresholds.
+        - exit_threshold_range (tuple): Tuple indicating the range (min, max) for exit thresholds.
+        - output_name (str): Base name for the output JSON file.
+        - save_path (str): Directory path to save simulation results.
+        - store (ResultsStore): Also record every evaluation, with per-market returns, in this store.
+
+        Returns:
+        - list: List of simulation result dictionaries.
+        """
+        simulation_results = []
+        market_metrics = []
+
+        if not os.path.exists(save_path):
+            os.makedirs(save_path)
+
+        # sample every iteration up front so all windows come from one kernel pass
+        samples = [(np.random.randint(*window_range), np.random.uniform(*entry_threshold_range),
+                    np.random.uniform(*exit_threshold_range)) for _ in range(iterations)]
+        if not use_kalman:
+            self.prepare_percentage_slopes(window for window, _, _ in samples)
+
+        for i, (window, entry_threshold, exit_threshold) in enumerate(samples):
+            position_size = 1
+            total_returns = self.trade_all_markets_with_percentage_slope(
+                window=window,
+                position_size=position_size,
+                entry_threshold=entry_threshold,
+                exit_threshold=exit_threshold,
+                use_kalman=use_kalman,
+                kalman_params=kalman_params
+            )
+            simulation_results.append({
+                'returns': total_returns,
+                'window': int(window),
+                'position_size': position_size,
+                'entry_threshold': entry_threshold,
+                'exit_threshold': exit_threshold,
+                'use_kalman': use_kalman,
+                'kalman_params': kalman_params
+            })
+            market_metrics.append({market: {'returns': value} for market, value in self.market_returns.items()})
+            if (i+1) % 10 == 0 or (i+1) == iterations:
+                print(f"Completed {i+1}/{iterations} simulations.")
+
+        with open(os.path.join(save_path, f'{output_name}_percentage_slope_simulation_results.json'), 'w') as f:
+            json.dump(simulation_results, f, indent=4)
+
+        if store is not None:
+            from .results_store import data_fingerprint
+
+            run_id = store.create_run(output_name, 'percentage_slope', data_fingerprint(self.price_data))
+            store.append(run_id, simulation_results, market_metrics)
+
+        return simulation_results
@@ -0,0 +1,411 @@
+"""
+SQLite store for parameter sweep results.
+
+    python -m analysis.results_store import analysis/*.json simulation_results/*.json
+    python -m analysis.results_store top --run window_percentage_slope -k 20
+    python -m analysis.results_store group window --bucket 50
+
+Every evaluation is one row of `evaluations` with its total `returns` and
+one p_<name> column per parameter, so sorting, range filters and group-bys
+run on indexed columns instead of re-reading JSON dumps. Per-market
+metrics go in `market_metrics`. Each run records the price data
+fingerprint and the git commit that produced it.
+
+The database runs in WAL mode, so parallel sweep workers can each open a
+store on the same file and append while others query.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    strategy TEXT,
+    data_fingerprint TEXT,
+    code_version TEXT,
+    source TEXT,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS evaluations (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    returns REAL
+);
+CREATE TABLE IF NOT EXISTS market_metrics (
+    evaluation_id INTEGER NOT NULL REFERENCES evaluations(id),
+    market TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS evaluations_run_returns ON evaluations(run_id, returns);
+CREATE INDEX IF NOT EXISTS evaluations_returns ON evaluations(returns);
+CREATE INDEX IF NOT EXISTS market_metrics_lookup ON market_metrics(market, metric, value);
+CREATE INDEX IF NOT EXISTS market_metrics_evaluation ON market_metrics(evaluation_id);
+"""
+
+# result keys that are outcomes rather than parameters
+METRIC_KEYS = ("returns",)
+
+
+def data_fingerprint(price_data):
+    """
+    Short hash identifying a price frame: its markets, time range and values.
+
+    Parameters:
+    - price_data (DataFrame): Close prices, one column per market.
+
+    Returns:
+    - str: 16 hex characters; equal frames give equal fingerprints.
+    """
+    import pandas as pd
+
+    digest = hashlib.sha1()
+    digest.update(json.dumps([str(c) for c in price_data.columns]).encode())
+    if len(price_data):
+        digest.update(f"{price_data.index[0]}|{price_data.index[-1]}|{len(price_data)}".encode())
+    digest.update(pd.util.hash_pandas_object(price_data, index=True).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def git_version(path=None):
+    """Current git commit (with a -dirty suffix for local changes), or 'unknown'."""
+    cwd = path or os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=cwd, text=True,
+                                         stderr=subprocess.DEVNULL).strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD"], cwd=cwd, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if dirty else "")
+
+
+def _column(name):
+    if not name.replace("_", "").isalnum():
+        raise ValueError(f"Invalid parameter name: {name!r}")
+    return "p_" + name
+
+
+def _value(value):
+    # bools and numbers stay numeric for range queries; anything else is stored as JSON
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return json.dumps(value, sort_keys=True)
+
+
+class ResultsStore:
+    """
+    Append-only store of sweep evaluations.
+
+    Parameters:
+    - path (str): SQLite database file, created on first use.
+    - timeout (float): Seconds to wait for another writer's lock.
+    """
+
+    def __init__(self, path=DEFAULT_DB, timeout=30.0):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=timeout)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # large scans (group_by over millions of rows) read straight from the page cache
+        self.conn.execute("PRAGMA mmap_size=1073741824")
+        self.conn.execute("PRAGMA cache_size=-262144")
+        self.conn.executescript(_SCHEMA)
+        self.__columns = None
+        self.__indexed = set()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # writing
+
+    def params(self):
+        """Parameter names that have a column, in column order."""
+        if self.__columns is None:
+            rows = self.conn.execute("PRAGMA table_info(evaluations)").fetchall()
+            self.__columns = [row['name'][2:] for row in rows if row['name'].startswith("p_")]
+        return self.__columns
+
+    def __ensure_params(self, names):
+        missing = [name for name in names if name not in self.params()]
+        if not missing:
+            return
+        self.__columns = None
+        for name in missing:
+            column = _column(name)
+            try:
+                self.conn.execute(f"ALTER TABLE evaluations ADD COLUMN {column}")
+            except sqlite3.OperationalError as e:
+                # another worker added it first
+                if "duplicate column" not in str(e):
+                    raise
+        self.__columns = None
+
+    def index(self, name):
+        """
+        Index a parameter column (with returns, so group-bys read only the index).
+
+        Queries call this for the parameters they filter or group on, so
+        indexes exist only for parameters someone queries and appends from
+        sweep workers do not pay for the rest.
+        """
+        if name == "returns" or name in self.__indexed:
+            return
+        column = _column(name)
+        if name in self.params():
+            with self.conn:
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS evaluations_{column} ON evaluations({column}, returns)")
+        self.__indexed.add(name)
+
+    def create_run(self, name, strategy=None, data_fingerprint=None, code_version=None, source=None):
+        """
+        Register a sweep run and return its id.
+
+        Parameters:
+        - name (str): Run name, e.g. the output_name passed to the Monte Carlo runner.
+        - strategy (str): Strategy family, e.g. 'percentage_slope'.
+        - data_fingerprint (str): data_fingerprint() of the prices the run used.
+        - code_version (str): Commit that produced the results; defaults to the current one.
+        - source (str): Where the results came from, e.g. an imported JSON file.
+        """
+        if code_version is None:
+            code_version = git_version()
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (name, strategy, data_fingerprint, code_version, source, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (name, strategy, data_fingerprint, code_version, source, time.time()))
+        return cursor.lastrowid
+
+    def append(self, run_id, results, market_metrics=None, commit=True):
+        """
+        Append evaluations to a run in one transaction.
+
+        Parameters:
+        - run_id (int): Id from create_run().
+        - results (list): Dicts of parameters plus 'returns', as written by the sweeps.
+        - market_metrics (list): Optional {market: {metric: value}} per result, same order.
+        - commit (bool): Run in its own transaction; False when the caller already holds one.
+
+        Returns:
+        - int: Number of evaluations written.
+        """
+        results = list(results)
+        if not results:
+            return 0
+        names = list(dict.fromkeys(k for result in results for k in result if k not in METRIC_KEYS))
+        # BEGIN IMMEDIATE takes the write lock up front, so schema changes and rows land together
+        if commit:
+            self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.__ensure_params(names)
+            columns = ", ".join(_column(name) for name in names)
+            placeholders = ", ".join("?" * (len(names) + 2))
+            sql = f"INSERT INTO evaluations (run_id, returns, {columns}) VALUES ({placeholders})"
+            rows = [(run_id, result.get('returns')) + tuple(_value(result.get(n)) for n in names)
+                    for result in results]
+            if market_metrics is None:
+                self.conn.executemany(sql, rows)
+            else:
+                metric_rows = []
+                for row, per_market in zip(rows, market_metrics):
+                    evaluation_id = self.conn.execute(sql, row).lastrowid
+                    for market, metrics in (per_market or {}).items():
+                        metric_rows.extend((evaluation_id, market, metric, value) for metric, value in metrics.items())
+                self.conn.executemany("INSERT INTO market_metrics VALUES (?, ?, ?, ?)", metric_rows)
+            if commit:
+                self.conn.execute("COMMIT")
+        except BaseException:
+            if commit:
+                self.conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def import_json(self, file_path, name=None, strategy=None):
+        """
+        Import a *_simulation_results.json file written by the notebooks.
+
+        Parameters:
+        - file_path (str): Path of the JSON list of result dicts.
+        - name (str): Run name; defaults to the file name without '_simulation_results.json'.
+        - strategy (str): Strategy family; inferred from the file name when omitted.
+
+        Returns:
+        - int: Id of the new run.
+        """
+        base = os.path.basename(file_path)
+        if name is None:
+            name = base.replace("_simulation_results.json", "").replace(".json", "")
+        if strategy is None:
+            strategy = next((s for s in ("percentage_slope", "normalized_slope", "ema_sma") if s in base), None)
+        with open(file_path) as f:
+            results = json.load(f)
+        # the commit that produced old dumps is not known
+        run_id = self.create_run(name, strategy, source=os.path.abspath(file_path), code_version="unknown")
+        self.append(run_id, results)
+        logger.info("Imported %d results from %s as run %d", len(results), file_path, run_id)
+        return run_id
+
+    # querying
+
+    def runs(self):
+        sql = ("SELECT runs.*, s.evaluations, s.best FROM runs LEFT JOIN "
+               "(SELECT run_id, COUNT(*) AS evaluations, MAX(returns) AS best FROM evaluations GROUP BY run_id) s "
+               "ON s.run_id = runs.id ORDER BY runs.id")
+        return [dict(row) for row in self.conn.execute(sql)]
+
+    def __where(self, run=None, where=None, clauses=None):
+        """
+        SQL conditions and arguments for a run (id or name) and {param: value | (low, high)} filters.
+
+        A (low, high) tuple is an inclusive range; None on either side leaves it open.
+        """
+        clauses, args = list(clauses or ()), []
+        if run is not None:
+            if isinstance(run, int):
+                clauses.append("e.run_id = ?")
+            else:
+                clauses.append("e.run_id IN (SELECT id FROM runs WHERE name = ?)")
+            args.append(run)
+        for name, condition in (where or {}).items():
+            self.index(name)
+            column = "e.returns" if name == "returns" else "e." + _column(name)
+            if isinstance(condition, tuple):
+                low, high = condition
+                if low is not None:
+                    clauses.append(f"{column} >= ?")
+                    args.append(low)
+                if high is not None:
+                    clauses.append(f"{column} <= ?")
+                    args.append(high)
+            else:
+                clauses.append(f"{column} = ?")
+                args.append(_value(condition))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def __decode(self, row):
+        result = {"id": row['id'], "run_id": row['run_id'], "returns": row['returns']}
+        for name in self.params():
+            value = row[_column(name)]
+            if value is not None:
+                result[name] = value
+        return result
+
+    def top(self, k=10, run=None, where=None, ascending=False):
+        """
+        The `k` best evaluations by returns.
+
+        Parameters:
+        - k (int): Number of rows.
+        - run (int or str): Restrict to one run, by id or name.
+        - where (dict): {param: value or (low, high)} filters.
+        - ascending (bool): Return the worst instead.
+
+        Returns:
+        - list: Result dicts (parameters, 'returns', 'id', 'run_id').
+        """
+        clause, args = self.__where(run, where, ["e.returns IS NOT NULL"])
+        order = "ASC" if ascending else "DESC"
+        sql = f"SELECT e.* FROM evaluations e{clause} ORDER BY e.returns {order} LIMIT ?"
+        return [self.__decode(row) for row in self.conn.execute(sql, args + [k])]
+
+    def select(self, run=None, where=None, limit=None):
+        """All evaluations matching the filters (see top()), in insertion order."""
+        clause, args = self.__where(run, where)
+        sql = f"SELECT e.* FROM evaluations e{clause} ORDER BY e.id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [self.__decode(row) for row in self.conn.execute(sql, args)]
+
+    def group_by(self, param, bucket=None, run=None, where=None, market=None, metric="returns"):
+        """
+        Aggregate returns per value (or bucket) of one parameter.
+
+        Parameters:
+        - param (str): Parameter to group on, e.g. 'window'.
+        - bucket (float): Group numeric values into buckets of this width.
+        - run, where: Filters as in top().
+        - market (str): Aggregate this market's `metric` from market_metrics instead of total returns.
+        - metric (str): Per-market metric used with `market`.
+
+        Returns:
+        - list: Dicts with the group value, count, mean, min and max, ordered by value.
+        """
+        self.index(param)
+        column = "e." + _column(param)
+        key = f"CAST({column} / ? AS INTEGER) * ?" if bucket else column
+        clause, args = self.__where(run, where)
+        value = "e.returns"
+        join = ""
+        if market is not None:
+            join = " JOIN market_metrics m ON m.evaluation_id = e.id AND m.market = ? AND m.metric = ?"
+            value = "m.value"
+            args = [market, metric] + args
+        if bucket:
+            args = [bucket, bucket] + args
+        sql = (f"SELECT {key} AS value, COUNT(*) AS count, AVG({value}) AS mean, MIN({value}) AS min, "
+               f"MAX({value}) AS max FROM evaluations e{join}{clause} GROUP BY 1 ORDER BY 1")
+        return [dict(row) for row in self.conn.execute(sql, args)]
+
+    def frame(self, run=None, where=None):
+        """select() as a DataFrame, for plotting in the notebooks."""
+        import pandas as pd
+
+        return pd.DataFrame(self.select(run, where))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DEFAULT_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="import *_simulation_results.json files")
+    importer.add_argument("files", nargs="+")
+    commands.add_parser("runs", help="list runs")
+    top = commands.add_parser("top", help="best evaluations by returns")
+    top.add_argument("-k", type=int, default=10)
+    top.add_argument("--run")
+    group = commands.add_parser("group", help="returns aggregated per parameter value")
+    group.add_argument("param")
+    group.add_argument("--bucket", type=float)
+    group.add_argument("--run")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    with ResultsStore(args.db) as store:
+        if args.command == "import":
+            for pattern in args.files:
+                for file_path in sorted(glob.glob(pattern)) or [pattern]:
+                    store.import_json(file_path)
+        elif args.command == "runs":
+            rows = store.runs()
+        elif args.command == "top":
+            rows = store.top(args.k, run=args.run)
+        else:
+            rows = store.group_by(args.param, bucket=args.bucket, run=args.run)
+        if args.command != "import":
+            for row in rows:
+                print(json.dumps(row))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,476 @@
+"""
+Parameter sweeps split into work units and run by workers on any number of hosts.
+
+    python -m analysis.sweep serve space.json --data analysis/data_15m.csv --port 8765
+    python -m analysis.sweep work http://coordinator:8765 --processes 8      (on each node)
+    python -m analysis.sweep status http://coordinator:8765
+
+The coordinator expands a parameter space (Monte Carlo ranges like the
+ones given to run_monte_carlo_simulation_with_percentage_slope, or a grid)
+into units of `unit_size` parameter sets per date range, queues them in
+the results database and serves them over HTTP. Workers download the price
+data once as Parquet, lease units, and post back one result per parameter
+set.
+
+A lease that is not completed within `lease_seconds` (a dead worker, a
+lost node) goes back to the queue, up to `max_attempts` leases per unit.
+Completion is idempotent: the first result for a unit is stored together
+with the unit's state in one transaction, and any later duplicate is
+ignored. Units are content-addressed, so restarting the coordinator with
+the same space resumes the sweep instead of repeating it.
+
+Example space:
+
+    {"name": "window_sweep", "strategy": "percentage_slope", "iterations": 2000,
+     "window_range": [100, 150], "entry_threshold_range": [0.01, 0.1],
+     "exit_threshold_range": [-0.05, 0.0], "date_ranges": [["2024-10-01", "2024-11-01"], [null, null]],
+     "markets": null, "unit_size": 20, "seed": 0}
+
+or "grid": {"window": [...], "entry_threshold": [...], "exit_threshold": [...]}
+instead of "iterations" and the *_range keys.
+"""
+import argparse
+import hashlib
+import io
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse
+
+from .results_store import DEFAULT_DB, ResultsStore, data_fingerprint
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweeps (
+    name TEXT PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    space TEXT NOT NULL,
+    data_fingerprint TEXT
+);
+CREATE TABLE IF NOT EXISTS sweep_units (
+    id TEXT PRIMARY KEY,
+    sweep TEXT NOT NULL REFERENCES sweeps(name),
+    spec TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS sweep_units_state ON sweep_units(sweep, state, lease_expires);
+"""
+
+SPACE_DEFAULTS = {
+    "strategy": "percentage_slope",
+    "markets": None,
+    "date_ranges": [[None, None]],
+    "position_size": 1,
+    "use_kalman": False,
+    "kalman_params": None,
+    "leverage": 1,
+    "initial_portfolio_value": 1000,
+    "unit_size": 20,
+    "seed": 0,
+}
+
+
+def sample_params(space):
+    """
+    Parameter sets of a sweep space, in a fixed order for a given seed.
+
+    Parameters:
+    - space (dict): Either 'grid' ({param: [values]}) or 'iterations' plus
+      window_range, entry_threshold_range and exit_threshold_range.
+
+    Returns:
+    - list: Dicts in the shape of the Monte Carlo results (without 'returns').
+    """
+    import numpy as np
+
+    fixed = {"position_size": space["position_size"], "use_kalman": space["use_kalman"],
+             "kalman_params": space["kalman_params"]}
+    if "grid" in space:
+        names = list(space["grid"])
+        return [dict(zip(names, values), **fixed) for values in itertools.product(*space["grid"].values())]
+    rng = np.random.RandomState(space["seed"])
+    params = []
+    for _ in range(space["iterations"]):
+        params.append(dict({
+            "window": int(rng.randint(*space["window_range"])),
+            "entry_threshold": float(rng.uniform(*space["entry_threshold_range"])),
+            "exit_threshold": float(rng.uniform(*space["exit_threshold_range"])),
+        }, **fixed))
+    return params
+
+
+def split_units(space):
+    """Work units of a space: `unit_size` parameter sets for one date range each."""
+    space = dict(SPACE_DEFAULTS, **space)
+    params = sample_params(space)
+    size = space["unit_size"]
+    units = []
+    for start, end in space["date_ranges"]:
+        for i in range(0, len(params), size):
+            spec = {"strategy": space["strategy"], "markets": space["markets"], "start": start, "end": end,
+                    "leverage": space["leverage"], "initial_portfolio_value": space["initial_portfolio_value"],
+                    "params": params[i:i + size]}
+            unit_id = hashlib.sha1(json.dumps([space["name"], spec], sort_keys=True).encode()).hexdigest()[:20]
+            units.append((unit_id, spec))
+    return units
+
+
+class SweepQueue:
+    """
+    Work units of one sweep, queued in the results database.
+
+    Parameters:
+    - store (ResultsStore): Store that receives the results; the queue shares its database.
+    - name (str): Sweep name; reusing a name resumes that sweep.
+    - lease_seconds (float): Time a worker has to finish a unit before it is handed out again.
+    - max_attempts (int): Leases per unit before it is marked failed.
+    """
+
+    def __init__(self, store, name, lease_seconds=600, max_attempts=3):
+        self.store = store
+        self.conn = store.conn
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.conn.executescript(_SCHEMA)
+        self.run_id = None
+
+    def create(self, space, fingerprint, strategy):
+        """Register the sweep (or find it again) and enqueue its units; returns the number of new units."""
+        row = self.conn.execute("SELECT run_id, data_fingerprint FROM sweeps WHERE name = ?", (self.name,)).fetchone()
+        if row is not None:
+            if row['data_fingerprint'] != fingerprint:
+                raise ValueError(f"Sweep {self.name} was started on other price data ({row['data_fingerprint']})")
+            self.run_id = row['run_id']
+        else:
+            self.run_id = self.store.create_run(self.name, strategy, fingerprint)
+            with self.conn:
+                self.conn.execute("INSERT INTO sweeps VALUES (?, ?, ?, ?)",
+                                  (self.name, self.run_id, json.dumps(space), fingerprint))
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO sweep_units (id, sweep, spec, updated) VALUES (?, ?, ?, ?)",
+                                  [(unit_id, self.name, json.dumps(spec), time.time())
+                                   for unit_id, spec in split_units(space)])
+            return self.conn.total_changes - before
+
+    def lease(self, worker, count=1):
+        """Hand up to `count` pending or expired units to `worker`."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # expired leases that used up their attempts stop being retried
+            self.conn.execute(
+                "UPDATE sweep_units SET state = 'failed', error = 'lease expired', updated = ? "
+                "WHERE sweep = ? AND state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.name, now, self.max_attempts))
+            rows = self.conn.execute(
+                "SELECT id, spec FROM sweep_units WHERE sweep = ? AND (state = 'pending' OR "
+                "(state = 'leased' AND lease_expires < ?)) ORDER BY rowid LIMIT ?",
+                (self.name, now, count)).fetchall()
+            self.conn.executemany(
+                "UPDATE sweep_units SET state = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated = ? WHERE id = ?", [(worker, now + self.lease_seconds, now, row['id']) for row in rows])
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return [{"id": row['id'], **json.loads(row['spec'])} for row in rows]
+
+    def complete(self, unit_id, worker, results, market_metrics=None):
+        """
+        Store a unit's results; False when the unit was already completed (a duplicate report).
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("SELECT state FROM sweep_units WHERE id = ? AND sweep = ?",
+                                    (unit_id, self.name)).fetchone()
+            if row is None or row['state'] == 'done':
+                self.conn.execute("ROLLBACK")
+                return False
+            self.store.append(self.run_id, results, market_metrics, commit=False)
+            self.conn.execute("UPDATE sweep_units SET state = 'done', worker = ?, error = NULL, updated = ? "
+                              "WHERE id = ?", (worker, time.time(), unit_id))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def fail(self, unit_id, worker, error):
+        """Return a unit its worker could not finish to the queue, or mark it failed after max_attempts."""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE sweep_units SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, updated = ? WHERE id = ? AND sweep = ? AND state = 'leased' AND worker = ?",
+                (self.max_attempts, error, time.time(), unit_id, self.name, worker))
+        logger.warning("Unit %s failed on %s: %s", unit_id, worker, error.strip().splitlines()[-1] if error else "")
+
+    def status(self):
+        rows = self.conn.execute("SELECT state, COUNT(*) AS count FROM sweep_units WHERE sweep = ? GROUP BY state",
+                                 (self.name,)).fetchall()
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update({row['state']: row['count'] for row in rows})
+        counts["finished"] = counts["pending"] == 0 and counts["leased"] == 0
+        return counts
+
+
+class SweepCoordinator:
+    """
+    Serves one sweep's units and price data to workers over HTTP.
+
+    Routes: GET /data (Parquet price frame), GET /status, and POST /lease,
+    /complete and /fail with JSON bodies. Requests are handled one at a
+    time, so the queue's connection is never shared between threads.
+    """
+
+    def __init__(self, space, price_data, db_path=DEFAULT_DB, lease_seconds=600, max_attempts=3):
+        self.space = dict(SPACE_DEFAULTS, **space)
+        self.price_data = price_data
+        self.fingerprint = data_fingerprint(price_data)
+        buffer = io.BytesIO()
+        price_data.to_parquet(buffer)
+        self.parquet = buffer.getvalue()
+        self.store = ResultsStore(db_path)
+        self.queue = SweepQueue(self.store, self.space["name"], lease_seconds, max_attempts)
+        added = self.queue.create(self.space, self.fingerprint, self.space["strategy"])
+        logger.info("Sweep %s: %d new units, %s", self.space["name"], added, self.queue.status())
+        self.routes = {
+            ("GET", "/status"): lambda body: self.queue.status(),
+            ("POST", "/lease"): lambda body: {"units": self.queue.lease(body["worker"], body.get("count", 1)),
+                                              "fingerprint": self.fingerprint, **self.queue.status()},
+            ("POST", "/complete"): lambda body: {"accepted": self.queue.complete(
+                body["unit"], body["worker"], body["results"], body.get("market_metrics"))},
+            ("POST", "/fail"): lambda body: self.queue.fail(body["unit"], body["worker"], body.get("error", "")),
+        }
+
+    def handle(self, method, path, body):
+        """Return (http status, content type, payload bytes) for one request."""
+        if (method, path) == ("GET", "/data"):
+            return 200, "application/octet-stream", self.parquet
+        route = self.routes.get((method, path))
+        if route is None:
+            return 404, "application/json", b'{"error": "not found"}'
+        try:
+            return 200, "application/json", json.dumps(route(body)).encode()
+        except (KeyError, ValueError, TypeError) as e:
+            return 400, "application/json", json.dumps({"error": str(e)}).encode()
+
+    def serve(self, host="0.0.0.0", port=8765):
+        server = make_server(self, host, port)
+        logger.info("Coordinator listening on %s:%d", host, server.server_port)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            self.store.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    coordinator = None
+
+    def do_GET(self):
+        self.__reply(*self.coordinator.handle("GET", urlparse(self.path).path, None))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.__reply(400, "application/json", b'{"error": "invalid JSON"}')
+            return
+        self.__reply(*self.coordinator.handle("POST", urlparse(self.path).path, body))
+
+    def __reply(self, status, content_type, payload):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def make_server(coordinator, host="0.0.0.0", port=8765):
+    """HTTPServer serving `coordinator`; port 0 picks a free port (see server.server_port)."""
+    handler = type("SweepHandler", (_Handler,), {"coordinator": coordinator})
+    return HTTPServer((host, port), handler)
+
+
+# worker side
+
+def evaluate_unit(unit, price_data):
+    """
+    Run every parameter set of a unit.
+
+    Returns:
+    - tuple: (results, market_metrics), one entry per parameter set.
+    """
+    from .momentum_strategy import MomentumStrategy
+
+    if unit["strategy"] != "percentage_slope":
+        raise ValueError(f"Unsupported strategy: {unit['strategy']}")
+    frame = price_data
+    if unit["markets"]:
+        frame = frame[unit["markets"]]
+    if unit["start"] is not None or unit["end"] is not None:
+        frame = frame.loc[unit["start"]:unit["end"]]
+
+    # the unit's SMA slopes come from one kernel pass, shared by every evaluation
+    prepared = MomentumStrategy(frame, unit["leverage"], unit["initial_portfolio_value"])
+    prepared.prepare_percentage_slopes(p["window"] for p in unit["params"] if not p["use_kalman"])
+
+    results, market_metrics = [], []
+    for params in unit["params"]:
+        # a fresh simulator per evaluation keeps its trade logs from growing across the unit
+        strategy = MomentumStrategy(frame, unit["leverage"], unit["initial_portfolio_value"])
+        strategy.slope_cache = prepared.slope_cache
+        total = strategy.trade_all_markets_with_percentage_slope(
+            window=params["window"], position_size=params["position_size"],
+            entry_threshold=params["entry_threshold"], exit_threshold=params["exit_threshold"],
+            use_kalman=params["use_kalman"], kalman_params=params["kalman_params"])
+        results.append(dict(params, returns=total, start=unit["start"], end=unit["end"]))
+        market_metrics.append({market: {"returns": value} for market, value in strategy.market_returns.items()})
+    return results, market_metrics
+
+
+class SweepWorker:
+    """
+    Pulls units from a coordinator until the sweep is finished.
+
+    Parameters:
+    - url (str): Coordinator base URL, e.g. http://10.0.0.5:8765.
+    - name (str): Worker id used in leases; defaults to host:pid.
+    - batch (int): Units leased per request.
+    - cache_dir (str): Where the Parquet price data is cached between runs.
+    - idle_sleep (float): Wait between lease attempts while other workers hold the remaining units.
+    """
+
+    def __init__(self, url, name=None, batch=1, cache_dir=None, idle_sleep=2.0, timeout=60):
+        import requests
+
+        self.url = url.rstrip("/")
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch = batch
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "sweep_cache")
+        self.idle_sleep = idle_sleep
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.price_data = None
+        self.fingerprint = None
+
+    def __post(self, path, body):
+        response = self.session.post(self.url + path, json=body, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def load_data(self, fingerprint):
+        """The coordinator's price frame, downloaded once per fingerprint and cached as Parquet."""
+        import pandas as pd
+
+        if self.fingerprint == fingerprint:
+            return self.price_data
+        path = os.path.join(self.cache_dir, f"{fingerprint}.parquet")
+        if not os.path.exists(path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            response = self.session.get(self.url + "/data", timeout=self.timeout)
+            response.raise_for_status()
+            partial = f"{path}.{os.getpid()}"
+            with open(partial, "wb") as f:
+                f.write(response.content)
+            os.replace(partial, path)
+        self.price_data = pd.read_parquet(path)
+        self.fingerprint = fingerprint
+        return self.price_data
+
+    def run(self):
+        """Work until no units are left; returns the number of units completed."""
+        completed = 0
+        while True:
+            reply = self.__post("/lease", {"worker": self.name, "count": self.batch})
+            if not reply["units"]:
+                if reply["finished"]:
+                    logger.info("Worker %s done after %d units", self.name, completed)
+                    return completed
+                time.sleep(self.idle_sleep)
+                continue
+            price_data = self.load_data(reply["fingerprint"])
+            for unit in reply["units"]:
+                try:
+                    results, market_metrics = evaluate_unit(unit, price_data)
+                except Exception:
+                    self.__post("/fail", {"unit": unit["id"], "worker": self.name, "error": traceback.format_exc()})
+                    continue
+                self.__post("/complete", {"unit": unit["id"], "worker": self.name, "results": results,
+                                          "market_metrics": market_metrics})
+                completed += 1
+
+
+def _work(url, batch):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(message)s")
+    return SweepWorker(url, batch=batch).run()
+
+
+def run_workers(url, processes, batch=1):
+    """Run `processes` workers on this host; returns the units each completed."""
+    with multiprocessing.Pool(processes) as pool:
+        return pool.starmap(_work, [(url, batch)] * processes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="queue a sweep and serve it to workers")
+    serve.add_argument("space", help="JSON file describing the parameter space")
+    serve.add_argument("--data", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_15m.csv"))
+    serve.add_argument("--db", default=DEFAULT_DB)
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--lease-seconds", type=float, default=600)
+    serve.add_argument("--max-attempts", type=int, default=3)
+    work = commands.add_parser("work", help="pull and run units from a coordinator")
+    work.add_argument("url")
+    work.add_argument("--processes", type=int, default=os.cpu_count())
+    work.add_argument("--batch", type=int, default=1, help="units leased per request")
+    status = commands.add_parser("status", help="unit counts of a running sweep")
+    status.add_argument("url")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if args.command == "serve":
+        import pandas as pd
+
+        with open(args.space) as f:
+            space = json.load(f)
+        space.setdefault("name", os.path.splitext(os.path.basename(args.space))[0])
+        from data_quality import validate_prices
+
+        price_data, _ = validate_prices(pd.read_csv(args.data, index_col="time"), granularity=None)
+        SweepCoordinator(space, price_data, args.db, args.lease_seconds, args.max_attempts).serve(args.host, args.port)
+    elif args.command == "work":
+        completed = run_workers(args.url, args.processes, args.batch)
+        logger.info("%d units completed by %d workers", sum(completed), len(completed))
+    else:
+        import requests
+
+        print(json.dumps(requests.get(args.url.rstrip("/") + "/status", timeout=30).json()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+Benchmark cases for the bot's hot paths.
+
+Each case is a function returning (callable, ops), where `ops` is the number
+of logical operations one call performs; the runner reports time per call
+and per op. Setup work happens before the callable is returned and is not
+timed.
+"""
+import json
+import os
+import tempfile
+
+from . import fixtures
+
+CASES = {}
+
+
+def case(name):
+    def register(fn):
+        CASES[name] = fn
+        return fn
+    return register
+
+
+@case("bollinger_bands_16x600")
+def bollinger_small():
+    return _bollinger(fixtures.load_prices().iloc[-600:, :16])
+
+
+@case("bollinger_bands_100x5000")
+def bollinger_large():
+    return _bollinger(fixtures.synthetic_prices(100, 5000))
+
+
+def _bollinger(prices):
+    from bollinger import calculate_bollinger_bands
+    from constants import WINDOW, NUM_STD
+
+    columns = [prices[m] for m in prices.columns]
+
+    def run():
+        for series in columns:
+            calculate_bollinger_bands(series, WINDOW, NUM_STD)
+    return run, len(columns)
+
+
+@case("window_kernels_20x100x5000")
+def window_kernels():
+    import numpy as np
+    from indicators import WindowKernels
+
+    prices = fixtures.synthetic_prices(100, 5000)
+    windows = list(range(20, 420, 20))
+
+    def run():
+        kernels = WindowKernels(prices, dtype=np.float32)
+        kernels.sma(windows)
+        kernels.std(windows)
+    return run, len(windows)
+
+
+@case("candle_parse_16x3x200")
+def candle_parse():
+    import market_data
+
+    prices = fixtures.load_prices()
+    markets = list(prices.columns[:16])
+    responses = {m: fixtures.history_candle_responses(prices, m, 3) for m in markets}
+    times_dict = {f"range_{i}": {"from_unix": 0, "to_unix": i} for i in range(3)}
+    workdir = tempfile.mkdtemp(prefix="bench_candles_")
+
+    class RecordedApi:
+        def get(self, request_path, params):
+            return responses[params["symbol"]][params["endTime"]]
+
+    def run():
+        cwd, api, sleep = os.getcwd(), market_data.baseApi, market_data.time.sleep
+        market_data.baseApi, market_data.time.sleep = RecordedApi(), lambda s: None
+        os.chdir(workdir)
+        try:
+            market_data.fetch_and_compile_candle_data(times_dict, markets, "15m")
+        finally:
+            os.chdir(cwd)
+            market_data.baseApi, market_data.time.sleep = api, sleep
+    return run, len(markets) * len(times_dict)
+
+
+@case("books_merge_checksum_1000")
+def books_merge():
+    from bitget.ws.bitget_ws_client import BooksInfo
+
+    asks, bids = fixtures.synthetic_book()
+    updates = [BooksInfo(a, b, 0) for a, b in fixtures.synthetic_book_updates(1000)]
+
+    def run():
+        book = BooksInfo(list(asks), list(bids), 0)
+        for update in updates:
+            book = book.merge(update)
+            book.check_sum(update.checksum)
+    return run, len(updates)
+
+
+@case("utils_sign_10000")
+def utils_sign():
+    from bitget import utils
+
+    message = utils.pre_hash(1700000000000, "POST", "/api/v2/mix/order/place-order",
+                             json.dumps({"symbol": "BTCUSDT", "size": "0.01", "side": "sell"}))
+
+    def run():
+        for _ in range(10000):
+            utils.sign(message, "0123456789abcdef0123456789abcdef")
+    return run, 10000
+
+
+@case("utils_parse_params_10000")
+def utils_params():
+    from bitget import utils
+
+    params = {"symbol": "BTCUSDT", "productType": "USDT-FUTURES", "granularity": "15m",
+              "endTime": 1700000000000, "limit": "200"}
+
+    def run():
+        for _ in range(10000):
+            utils.parse_params_to_str(params)
+    return run, 10000
+
+
+def _order_log(existing):
+    from bollinger import log_order_response
+
+    response = {"code": "00000", "msg": "success", "requestTime": 1700000000000,
+                "data": {"orderId": "1234567890", "clientOid": "abc"}}
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_orders_"), "order_responses.json")
+    with open(path, "w") as f:
+        json.dump([response] * existing, f, indent=4)
+    with open(path) as f:
+        seed = f.read()
+
+    def run():
+        # reset to the same starting size so each call measures the same growth step
+        with open(path, "w") as f:
+            f.write(seed)
+        for _ in range(10):
+            log_order_response(response, path)
+    return run, 10
+
+
+@case("log_order_response_at_0")
+def order_log_empty():
+    return _order_log(0)
+
+
+@case("log_order_response_at_1000")
+def order_log_1000():
+    return _order_log(1000)
+
+
+@case("log_order_response_at_10000")
+def order_log_10000():
+    return _order_log(10000)
+
+
+@case("momentum_simulation_4x1800")
+def momentum_simulation():
+    from analysis.momentum_strategy import MomentumStrategy
+
+    prices = fixtures.load_prices().iloc[:, :4].reset_index(drop=True)
+
+    def run():
+        strategy = MomentumStrategy(prices, 50, 2000)
+        strategy.trade_all_markets_with_percentage_slope(window=120, position_size=1,
+                                                         entry_threshold=0.05, exit_threshold=0.0)
+    return run, len(prices.columns)
+
+
+@case("backtest_bollinger_30x20000")
+def backtest_bollinger():
+    from analysis.backtester import Backtester, Bars
+    from strategy_engine import BollingerStrategy
+
+    bars = Bars.from_closes(fixtures.synthetic_prices(30, 20000))
+    directions = {market: "both" for market in bars.markets}
+
+    def run():
+        Backtester(bars).run(BollingerStrategy(directions=directions))
+    return run, len(bars)
+
+
+@case("ws_replay_books_3x2000")
+def ws_replay_books():
+    import random
+
+    from bitget import consts
+    from bitget.ws.bitget_ws_client import BitgetWsClient, SubscribeReq
+    from bitget.ws.recorder import Replayer, WsRecorder
+    from simulator.ws import _Book
+
+    rng = random.Random(5)
+    markets = ["SYM0USDT", "SYM1USDT", "SYM2USDT"]
+    channels = [SubscribeReq("USDT-FUTURES", "books", m) for m in markets]
+    directory = tempfile.mkdtemp(prefix="bench_ws_replay_")
+    recorder = WsRecorder(directory).start()
+    for i, market in enumerate(markets):
+        book = _Book(50.0 + i, rng)
+        arg = {"instType": "USDT-FUTURES", "channel": "books", "instId": market}
+        snapshot = book.message([list(a) for a in book.asks], [list(b) for b in book.bids])
+        frames = [{"action": "snapshot", "arg": arg, "data": [snapshot]}]
+        frames += [{"action": "update", "arg": arg, "data": [book.message(*book.update())]} for _ in range(2000)]
+        for frame in frames:
+            recorder.record(json.dumps(frame), arg)
+    recorder.close()
+    replayer = Replayer(directory)
+
+    def run():
+        client = BitgetWsClient(consts.PUBLIC_WS_URL).offline().build()
+        client.subscribe(channels, lambda message: None)
+        replayer.play(client.feed, speed=0)
+    return run, len(markets) * 2001
+
+
+@case("risk_check_16")
+def risk_check():
+    import numpy as np
+    import pandas as pd
+
+    from constants import RISK_LIMITS, TRADE_SIZE, TRADING_STRATEGIES
+    from risk import RiskEngine
+
+    rng = np.random.default_rng(6)
+    markets = list(TRADING_STRATEGIES)
+    prices = dict(zip(markets, rng.uniform(1, 100, len(markets))))
+    risk = RiskEngine(dict(RISK_LIMITS, max_volatility=TRADE_SIZE * 0.05), markets)
+    risk.update_prices(prices)
+    risk.update_returns(pd.DataFrame(rng.normal(0, 0.01, (500, len(markets))), columns=markets))
+    risk.sync_open_trades({m: {"position_type": "open_short", "base_position_size": TRADE_SIZE / prices[m]}
+                           for m in markets[:4]})
+    orders = [(m, rng.choice([-1.0, 1.0]) * TRADE_SIZE / prices[m], prices[m]) for m in markets]
+
+    def run():
+        risk.check(orders)
+    return run, 1
+
+
+@case("ticker_snapshot_600")
+def ticker_snapshot_lookup():
+    from constants import TRADING_STRATEGIES
+    from ticker_snapshot import TickerSnapshot
+
+    symbols = [f"SYM{i}USDT" for i in range(600 - len(TRADING_STRATEGIES))] + list(TRADING_STRATEGIES)
+    rows = [{"symbol": s, "lastPr": str(10.0 + i), "bidPr": str(9.99 + i), "askPr": str(10.01 + i),
+             "ts": "1700000000000"} for i, s in enumerate(symbols)]
+
+    class MarketApi:
+        def tickers(self, params):
+            return {"code": "00000", "data": rows}
+
+    snapshot = TickerSnapshot(ttl=0, market_api=MarketApi())
+
+    def run():
+        # ttl=0: every lookup parses a fresh 600-symbol response
+        snapshot.prices()
+    return run, len(symbols)
+
+
+@case("data_quality_16x600")
+def data_quality():
+    import pandas as pd
+
+    from data_quality import validate_prices
+
+    prices = fixtures.synthetic_prices(16, 600)
+    # the raw fetch layout: a time column, closes as strings and overlapping ranges
+    frame = prices.astype(str).rename_axis("time").reset_index()
+    frame["time"] = frame["time"].astype(str)
+    frame = pd.concat([frame.iloc[:300], frame.iloc[295:]], ignore_index=True)
+
+    def run():
+        validate_prices(frame)
+    return run, len(frame)
@@ -0,0 +1,74 @@
+import os
+import random
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRICE_CSV = os.path.join(REPO_ROOT, "analysis", "data_15m.csv")
+
+
+def load_prices():
+    """15m closes from analysis/data_15m.csv, indexed by time."""
+    return pd.read_csv(PRICE_CSV, index_col="time")
+
+
+def synthetic_prices(markets, bars, seed=7):
+    """Geometric random walk price frame with `markets` columns and `bars` rows."""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.004, size=(bars, markets))
+    prices = 100 * np.exp(np.cumsum(returns, axis=0))
+    index = pd.date_range("2025-01-01", periods=bars, freq="15min")
+    return pd.DataFrame(prices, index=index, columns=[f"SYM{i}USDT" for i in range(markets)])
+
+
+def history_candle_responses(prices, market, ranges, limit=200):
+    """
+    Bitget /api/v2/mix/market/history-candles responses replayed from a price column.
+
+    Each response holds `limit` candles, newest range first, in the exchange's
+    shape: [ts, open, high, low, close, base volume, quote volume], all strings.
+    """
+    column = prices[market].dropna()
+    times = pd.to_datetime(column.index).astype("int64") // 10 ** 6
+    responses = []
+    for i in range(ranges):
+        end = len(column) - i * limit
+        start = max(end - limit, 0)
+        rows = []
+        for ts, close in zip(times[start:end], column.values[start:end]):
+            price = repr(float(close))
+            rows.append([str(ts), price, price, price, price, "1000", str(float(close) * 1000)])
+        responses.append({"code": "00000", "msg": "success", "requestTime": int(times[-1]), "data": rows})
+    return responses
+
+
+def synthetic_book(levels=200, mid=50.0, tick=0.01, seed=11):
+    rng = random.Random(seed)
+    asks = [["%.2f" % (mid + tick * (i + 1)), "%.3f" % rng.uniform(0.1, 50)] for i in range(levels)]
+    bids = [["%.2f" % (mid - tick * (i + 1)), "%.3f" % rng.uniform(0.1, 50)] for i in range(levels)]
+    return asks, bids
+
+
+def synthetic_book_updates(count, levels=200, mid=50.0, tick=0.01, per_update=10, seed=13):
+    """Stream of (asks, bids) deltas that resize, remove and re-add levels."""
+    rng = random.Random(seed)
+    removed = {1: set(), -1: set()}
+    updates = []
+    for _ in range(count):
+        delta = {1: {}, -1: {}}
+        for sign in (1, -1):
+            for _ in range(per_update):
+                level = rng.randint(1, levels)
+                price = "%.2f" % (mid + sign * tick * level)
+                if price in delta[sign]:
+                    continue
+                # never delete inside the top 30, the checksum reads the top 25
+                if level > 30 and level not in removed[sign] and rng.random() < 0.2:
+                    removed[sign].add(level)
+                    delta[sign][price] = "0"
+                else:
+                    removed[sign].discard(level)
+                    delta[sign][price] = "%.3f" % rng.uniform(0.1, 50)
+        updates.append(([[p, v] for p, v in delta[1].items()], [[p, v] for p, v in delta[-1].items()]))
+    return updates
@@ -0,0 +1,72 @@
+"""
+Cold-start import budget for the bot's entry points.
+
+    python -m benchmarks.import_budget
+
+Each entry point's imports run in a fresh interpreter, best of --repeat.
+The check fails when an import takes longer than its budget, or when it
+pulls in a heavy module that should only load on first use.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from .fixtures import REPO_ROOT
+
+# module list imported by each entry point -> budget in ms
+BUDGETS = {
+    # pandas loads when a cycle first needs it
+    "bollinger_15m": ("bollinger_15m", 150),
+    "daemon": ("daemon", 150),
+    "live_bollinger": ("live_bollinger", 120),
+    "execution": ("execution, contracts, order_tracker", 50),
+    "bitget.utils": ("bitget.utils", 20),
+}
+
+# must not be loaded by importing any entry point above
+LAZY_MODULES = ("pandas", "boto3", "Crypto", "decouple")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {modules}
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{"ms": elapsed, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(modules, repeat=3):
+    """Best-of-`repeat` import time (ms) in fresh interpreters, and any lazy modules that got loaded."""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    best, loaded = None, []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, "-c", _PROBE.format(modules=modules, lazy=LAZY_MODULES)],
+                                         cwd=REPO_ROOT, env=env, text=True)
+        result = json.loads(output.strip().splitlines()[-1])
+        best = result["ms"] if best is None else min(best, result["ms"])
+        loaded = result["loaded"]
+    return best, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply budgets, e.g. 2 on slow CI hosts")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name, (modules, budget) in BUDGETS.items():
+        elapsed, loaded = measure(modules, args.repeat)
+        budget *= args.scale
+        over = elapsed > budget
+        failed = failed or over or bool(loaded)
+        print("{:<16} {:8.1f} ms  budget {:6.0f} ms{}{}".format(
+            name, elapsed, budget, "  OVER BUDGET" if over else "",
+            "  eagerly loads " + ", ".join(loaded) if loaded else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
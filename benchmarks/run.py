@@ -0,0 +1,106 @@
+"""
+Offline benchmark runner.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --compare bench_baseline.json --threshold 0.15
+    python -m benchmarks.run --only bollinger --repeat 10
+
+Results are JSON; with --compare the run exits non-zero when any case's
+median time regresses by more than the threshold against the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# API clients read credentials on first use; benchmarks never reach the network
+for _key in ("apiKey", "secretKey", "passphrase"):
+    os.environ.setdefault(_key, "benchmark")
+
+from .cases import CASES
+from .fixtures import REPO_ROOT
+
+
+def run_case(name, repeat, warmup):
+    fn, ops = CASES[name]()
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    median = statistics.median(samples)
+    return {
+        "ops": ops,
+        "repeat": repeat,
+        "min_ms": min(samples) * 1000,
+        "median_ms": median * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "stdev_ms": statistics.stdev(samples) * 1000 if len(samples) > 1 else 0.0,
+        "median_us_per_op": median * 1e6 / ops,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                         stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "machine": platform.machine(), "commit": commit, "created": datetime.now().isoformat()}
+
+
+def compare(results, baseline, threshold):
+    """Return rows of (name, baseline_ms, current_ms, ratio, regressed)."""
+    rows = []
+    for name, current in results["cases"].items():
+        previous = baseline.get("cases", {}).get(name)
+        if previous is None:
+            continue
+        ratio = current["median_ms"] / previous["median_ms"] if previous["median_ms"] else float("inf")
+        rows.append((name, previous["median_ms"], current["median_ms"], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed median slowdown (0.10 = 10%%)")
+    parser.add_argument("--only", action="append", default=[], help="run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, REPO_ROOT)
+    names = [n for n in CASES if not args.only or any(o in n for o in args.only)]
+    results = {"environment": environment(), "cases": {}}
+    for name in names:
+        results["cases"][name] = stats = run_case(name, args.repeat, args.warmup)
+        print("{:<34} median {:10.3f} ms  ({:10.3f} us/op)".format(name, stats["median_ms"], stats["median_us_per_op"]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.threshold)
+        print("\n{:<34} {:>12} {:>12} {:>8}".format("case", "baseline ms", "current ms", "ratio"))
+        for name, before, after, ratio, regressed in rows:
+            print("{:<34} {:12.3f} {:12.3f} {:8.2f}{}".format(name, before, after, ratio, "  REGRESSION" if regressed else ""))
+        if any(row[4] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
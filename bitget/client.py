@@ -1,10 +1,25 @@
 import requests
 import json
+import logging
+import threading
+import time
 from . import consts as c, utils, exceptions
+from .clock import ClockSync
+from .metrics import NULL_METRICS
+
+logger = logging.getLogger(__name__)
 
 
 class Client(object):
 
+    # shared by every client unless an instance assigns its own registry
+    metrics = NULL_METRICS
+    # None means consts.API_URL, read per request so it can be changed at runtime
+    base_url = None
+    # ClockSync whose cached offset is applied to every signed timestamp
+    clock = None
+    __clock_lock = threading.Lock()
+
     def __init__(self, api_key, api_secret_key, passphrase, use_server_time=False, first=False):
 
         self.API_KEY = api_key
@@ -14,53 +29,77 @@ class Client(object):
         self.first = first
 
     def _request(self, method, request_path, params, cursor=False):
+        metrics = self.metrics
+        if not metrics.enabled:
+            return self._send(method, request_path, params, cursor, metrics)
+
+        endpoint = request_path
+        metrics.gauge_add("bitget_requests_in_flight", 1, endpoint=endpoint)
+        start = time.perf_counter()
+        try:
+            return self._send(method, request_path, params, cursor, metrics)
+        finally:
+            metrics.observe("bitget_request_latency_ms", (time.perf_counter() - start) * 1000,
+                            endpoint=endpoint, phase="total")
+            metrics.gauge_add("bitget_requests_in_flight", -1, endpoint=endpoint)
+
+    def _send(self, method, request_path, params, cursor, metrics):
+        endpoint = request_path
         if method == c.GET:
             request_path = request_path + utils.parse_params_to_str(params)
         # url
-        url = c.API_URL + request_path
+        url = (self.base_url or c.API_URL) + request_path
 
-        # 获取本地时间
-        timestamp = utils.get_timestamp()
+        if metrics.enabled:
+            sign_start = time.perf_counter()
 
-        # sign & header
-        if self.use_server_time:
-            # 获取服务器时间接口
-            timestamp = self._get_timestamp()
+        # 获取本地时间, corrected by the cached server offset when a clock is installed
+        clock = self.clock
+        if clock is None and self.use_server_time:
+            clock = Client._server_clock()
+        timestamp = clock.now_ms() if clock is not None else utils.get_timestamp()
 
         body = json.dumps(params) if method == c.POST else ""
-        sign = utils.sign(utils.pre_hash(timestamp, method, request_path, str(body)), self.API_SECRET_KEY)
         if c.SIGN_TYPE == c.RSA:
             sign = utils.signByRSA(utils.pre_hash(timestamp, method, request_path, str(body)), self.API_SECRET_KEY)
+        else:
+            sign = utils.sign(utils.pre_hash(timestamp, method, request_path, str(body)), self.API_SECRET_KEY)
         header = utils.get_header(self.API_KEY, sign, timestamp, self.PASSPHRASE)
 
         if self.first:
-            print("url:", url)
-            print("method:", method)
-            print("body:", body)
-            print("headers:", header)
-            # print("sign:", sign)
+            logger.debug("url: %s method: %s body: %s", url, method, body)
             self.first = False
 
-
-
-
         # send request
+        start = time.perf_counter()
+        if metrics.enabled:
+            metrics.observe("bitget_request_latency_ms", (start - sign_start) * 1000, endpoint=endpoint, phase="sign")
         response = None
         if method == c.GET:
             response = requests.get(url, headers=header)
-            print("response : ",response.text)
         elif method == c.POST:
             response = requests.post(url, data=body, headers=header)
-            print("response : ",response.text)
             #response = requests.post(url, json=body, headers=header)
         elif method == c.DELETE:
             response = requests.delete(url, headers=header)
-
-        print("status:", response.status_code)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        logger.info("%s %s %s", method, endpoint, response.status_code,
+                    extra={"event": "rest_request", "method": method, "path": endpoint,
+                           "status": response.status_code, "elapsed_ms": round(elapsed_ms, 3)})
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("response: %s", response.text)
+        if metrics.enabled:
+            metrics.observe("bitget_request_latency_ms", elapsed_ms, endpoint=endpoint, phase="network")
+            metrics.inc("bitget_http_responses_total", endpoint=endpoint, status=response.status_code)
         # exception handle
         if not str(response.status_code).startswith('2'):
             raise exceptions.BitgetAPIException(response)
         try:
+            decode_start = time.perf_counter()
+            result = response.json()
+            if metrics.enabled:
+                self._observe_response(metrics, endpoint, result, timestamp, decode_start)
             res_header = response.headers
             if cursor:
                 r = dict()
@@ -69,13 +108,58 @@ class Client(object):
                     r['after'] = res_header['OK-AFTER']
                 except:
                     pass
-                return response.json(), r
+                return result, r
             else:
-                return response.json()
+                return result
 
         except ValueError:
             raise exceptions.BitgetRequestException('Invalid Response: %s' % response.text)
 
+    def _observe_response(self, metrics, endpoint, result, timestamp, decode_start):
+        metrics.observe("bitget_request_latency_ms", (time.perf_counter() - decode_start) * 1000,
+                        endpoint=endpoint, phase="decode")
+        if not isinstance(result, dict):
+            return
+        code = result.get('code')
+        if code is not None and code != '00000':
+            metrics.inc("bitget_api_errors_total", endpoint=endpoint, code=code)
+        request_time = result.get('requestTime')
+        if request_time:
+            # exchange receive time minus our signed timestamp: one-way delay plus clock offset
+            metrics.observe("bitget_request_latency_ms", max(int(request_time) - int(timestamp), 0),
+                            endpoint=endpoint, phase="exchange")
+
+    @classmethod
+    def set_base_url(cls, base_url):
+        """Send requests from all clients to another host, e.g. the local simulator."""
+        cls.base_url = base_url.rstrip('/') if base_url else None
+
+    @classmethod
+    def set_clock(cls, clock):
+        """Sign all clients' requests with `clock.now_ms()` (a started ClockSync); None for the local clock."""
+        cls.clock = clock
+        return clock
+
+    @classmethod
+    def _server_clock(cls):
+        """
+        Install a ClockSync on first use by a use_server_time client.
+
+        Entry points should call set_clock() at startup, as the daemon does.
+        This fallback installs exactly one clock even when several workers
+        sign their first request at once, and syncs it in the background so
+        that request is not held up by the server time round trips.
+        """
+        with Client.__clock_lock:
+            if Client.clock is None:
+                Client.set_clock(ClockSync().start(wait=False))
+            return Client.clock
+
+    @classmethod
+    def set_metrics(cls, registry):
+        """Install a MetricsRegistry for all clients; pass None to turn metrics off."""
+        cls.metrics = registry if registry is not None else NULL_METRICS
+
     def _request_without_params(self, method, request_path):
         return self._request(method, request_path, {})
 
@@ -83,9 +167,9 @@ class Client(object):
         return self._request(method, request_path, params, cursor)
 
     def _get_timestamp(self):
-        url = c.API_URL + c.SERVER_TIMESTAMP_URL
+        url = (self.base_url or c.API_URL) + c.SERVER_TIMESTAMP_URL
         response = requests.get(url)
         if response.status_code == 200:
-            return response.json()['timestamp']
+            return response.json()['data']['serverTime']
         else:
             return ""
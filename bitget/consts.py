@@ -1,6 +1,13 @@
-# Base Url
-API_URL = 'https://api.bitget.com'
+import os
+
+# Base Url (overridable, e.g. to point the bot at the local simulator)
+API_URL = os.environ.get('BITGET_API_URL', 'https://api.bitget.com')
 CONTRACT_WS_URL = 'wss://ws.bitget.com/mix/v1/stream'
+PUBLIC_WS_URL = os.environ.get('BITGET_WS_PUBLIC_URL', 'wss://ws.bitget.com/v2/ws/public')
+PRIVATE_WS_URL = os.environ.get('BITGET_WS_PRIVATE_URL', 'wss://ws.bitget.com/v2/ws/private')
+
+# public server time, used when signing with the exchange clock
+SERVER_TIMESTAMP_URL = '/api/v2/public/time'
 
 # http header
 CONTENT_TYPE = 'Content-Type'
@@ -25,3 +32,7 @@ SIGN_TYPE = SHA256
 
 # ws
 REQUEST_PATH = '/user/verify'
+# exchange side limits for subscribe/unsubscribe requests
+WS_MAX_ARGS_PER_MESSAGE = 50
+WS_MAX_MESSAGE_BYTES = 4096
+WS_MAX_MESSAGES_PER_SECOND = 10
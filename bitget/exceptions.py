@@ -43,3 +43,12 @@ class BitgetParamsException(Exception):
 
     def __str__(self):
         return 'BitgetParamsException: %s' % self.message
+
+
+class BitgetWsReconnectException(Exception):
+
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return 'BitgetWsReconnectException: %s' % self.message
@@ -0,0 +1,181 @@
+#!/usr/bin/python
+import bisect
+import threading
+
+# latency buckets in milliseconds
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of histograms, counters and gauges keyed by name and labels.
+    """
+
+    enabled = True
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.__lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge_add(self, name, delta, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.gauges[key] = self.gauges.get(key, 0) + delta
+
+    def gauge_set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.gauges[key] = value
+
+    def snapshot(self):
+        """Consistent copies of (histograms, counters, gauges) for exporters."""
+        with self.__lock:
+            histograms = {}
+            for key, h in self.histograms.items():
+                copy = histograms[key] = Histogram(h.buckets)
+                copy.counts, copy.count, copy.sum, copy.max = list(h.counts), h.count, h.sum, h.max
+            return histograms, dict(self.counters), dict(self.gauges)
+
+    def reset(self):
+        with self.__lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+
+class NullMetrics:
+    """Metrics sink used when instrumentation is off; callers check `enabled` first."""
+
+    enabled = False
+
+    def observe(self, name, value, **labels):
+        pass
+
+    def inc(self, name, value=1, **labels):
+        pass
+
+    def gauge_add(self, name, delta, **labels):
+        pass
+
+    def gauge_set(self, name, value, **labels):
+        pass
+
+    def snapshot(self):
+        return {}, {}, {}
+
+    def reset(self):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+class InProcessExporter:
+    """Plain-dict snapshot and a compact text summary of a registry."""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def export(self):
+        histograms, counters, gauges = self.registry.snapshot()
+        return {
+            "histograms": [
+                {"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum, "max": h.max,
+                 "p50": h.quantile(0.5), "p99": h.quantile(0.99)}
+                for (name, labels), h in sorted(histograms.items(), key=_sort_key)
+            ],
+            "counters": [{"name": name, "labels": dict(labels), "value": v}
+                         for (name, labels), v in sorted(counters.items(), key=_sort_key)],
+            "gauges": [{"name": name, "labels": dict(labels), "value": v}
+                       for (name, labels), v in sorted(gauges.items(), key=_sort_key)],
+        }
+
+    def summary(self, name="bitget_request_latency_ms"):
+        """One line per histogram series of `name`: count, mean, p50, p99 and max."""
+        lines = []
+        for row in self.export()["histograms"]:
+            if row["name"] != name or not row["count"]:
+                continue
+            labels = " ".join("{}={}".format(k, v) for k, v in row["labels"].items())
+            lines.append("{:<60} n={:<5d} mean={:8.1f}ms p50<={:g}ms p99<={:g}ms max={:8.1f}ms".format(
+                labels, row["count"], row["sum"] / row["count"], row["p50"], row["p99"], row["max"]))
+        return "\n".join(lines)
+
+
+class PrometheusTextExporter:
+    """Render a registry in the Prometheus text exposition format."""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def export(self):
+        histograms, counters, gauges = self.registry.snapshot()
+        lines = []
+        for (name, labels), h in sorted(histograms.items(), key=_sort_key):
+            cumulative = 0
+            for bound, n in zip(list(h.buckets) + ["+Inf"], h.counts):
+                cumulative += n
+                lines.append("{}_bucket{} {}".format(name, _labels(labels + (("le", bound),)), cumulative))
+            lines.append("{}_sum{} {}".format(name, _labels(labels), h.sum))
+            lines.append("{}_count{} {}".format(name, _labels(labels), h.count))
+        for (name, labels), value in sorted(counters.items(), key=_sort_key):
+            lines.append("{}{} {}".format(name, _labels(labels), value))
+        for (name, labels), value in sorted(gauges.items(), key=_sort_key):
+            lines.append("{}{} {}".format(name, _labels(labels), value))
+        return "\n".join(lines) + "\n"
+
+
+def _sort_key(item):
+    (name, labels), _ = item
+    return name, [(k, str(v)) for k, v in labels]
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(k, str(v).replace('"', '\\"')) for k, v in labels) + "}"
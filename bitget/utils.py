@@ -2,11 +2,6 @@ import base64
 import hmac
 import time
 
-
-from Crypto.Hash import SHA256
-from Crypto.PublicKey import RSA
-from Crypto.Signature import PKCS1_v1_5 as pk
-
 from . import consts as c
 
 
@@ -16,6 +11,11 @@ def sign(message, secret_key):
     return str(base64.b64encode(d), 'utf8')
 
 def signByRSA(message, secret_key):
+    # PyCryptodome is only needed when SIGN_TYPE is RSA
+    from Crypto.Hash import SHA256
+    from Crypto.PublicKey import RSA
+    from Crypto.Signature import PKCS1_v1_5 as pk
+
     privatekey = RSA.importKey(secret_key)
     h = SHA256.new(message.encode('utf-8'))
     signer = pk.new(privatekey)
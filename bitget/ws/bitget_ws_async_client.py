@@ -0,0 +1,370 @@
+#!/usr/bin/python
+import asyncio
+import collections
+import inspect
+import json
+import logging
+import time
+
+import websockets
+
+from bitget.consts import GET
+from .. import consts as c, utils
+from ..exceptions import BitgetWsReconnectException
+from .bitget_ws_client import WS_OP_LOGIN, WS_OP_SUBSCRIBE, WS_OP_UNSUBSCRIBE, \
+    BaseWsReq, BooksInfo, SubscribeReq, WsLoginReq
+from .reconnect import ReconnectManager
+
+# overflow policies for the per-channel queues
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+
+logger = logging.getLogger(__name__)
+
+
+async def handle(message):
+    logger.info("default: %s", message)
+
+
+async def handel_error(message):
+    logger.error("default_error: %s", message)
+
+
+async def _call(listener, message):
+    # listeners may be plain functions or coroutines
+    result = listener(message)
+    if inspect.isawaitable(result):
+        await result
+
+
+class ChannelQueue:
+    """
+    Bounded message queue for a single channel.
+
+    When the queue is full, DROP_OLDEST discards the oldest pending message
+    and COALESCE collapses everything pending into the newest message, which
+    suits snapshot style channels (ticker, candle) where only the latest
+    value matters.
+    """
+
+    def __init__(self, maxsize, overflow=DROP_OLDEST):
+        if overflow not in (DROP_OLDEST, COALESCE):
+            raise ValueError("unknown overflow policy: %s" % overflow)
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.dropped = 0
+        self.__items = collections.deque()
+        self.__not_empty = asyncio.Event()
+
+    def __len__(self):
+        return len(self.__items)
+
+    def put(self, message):
+        if len(self.__items) >= self.maxsize:
+            if self.overflow == DROP_OLDEST:
+                self.__items.popleft()
+                self.dropped += 1
+            else:
+                self.dropped += len(self.__items)
+                self.__items.clear()
+        self.__items.append(message)
+        self.__not_empty.set()
+
+    async def get(self):
+        while not self.__items:
+            self.__not_empty.clear()
+            await self.__not_empty.wait()
+        return self.__items.popleft()
+
+
+class BitgetWsAsyncClient:
+    """
+    asyncio counterpart of BitgetWsClient.
+
+    Everything runs on the caller's event loop: one task reads frames, one
+    sends heartbeats and one consumer task per subscribed channel drains a
+    bounded ChannelQueue into that channel's listener, so a slow listener
+    never blocks frame reads.
+
+    A frame that fails to parse or to dispatch is logged and skipped, and
+    any error other than cancellation ends in a reconnect rather than
+    stopping the read task. build() raises asyncio.TimeoutError if the
+    first connection is not up within `connect_timeout` seconds.
+    """
+
+    def __init__(self, url, need_login=False, queue_size=1000, overflow=DROP_OLDEST,
+                 ping_interval=25, ping_timeout=10, reconnect_manager=None, connect_timeout=30):
+        utils.check_none(url, "url")
+        self.__need_login = need_login
+        self.__url = url
+        self.__queue_size = queue_size
+        self.__overflow = overflow
+        self.__ping_interval = ping_interval
+        self.__ping_timeout = ping_timeout
+        self.__connect_timeout = connect_timeout
+        self.__reconnect_manager = reconnect_manager or ReconnectManager()
+        self.__api_key = None
+        self.__api_secret_key = None
+        self.__passphrase = None
+        self.__listener = handle
+        self.__error_listener = handel_error
+        self.__ws = None
+        self.__closed = False
+        self.__connected = None
+        self.__login_event = None
+        self.__last_pong = 0
+        self.__run_task = None
+        self.__all_suribe = set()
+        self.__scribe_map = {}
+        self.__queues = {}
+        self.__consumers = {}
+        self.__allbooks_map = {}
+        self.__recorder = None
+
+    async def build(self):
+        if self.__recorder is not None:
+            self.__recorder.start()
+        self.__connected = asyncio.Event()
+        self.__login_event = asyncio.Event()
+        self.__closed = False
+        self.__run_task = asyncio.ensure_future(self.__run())
+        try:
+            await asyncio.wait_for(self.__connected.wait(), self.__connect_timeout)
+        except asyncio.TimeoutError:
+            logger.error("ws not connected after %ss: %s", self.__connect_timeout, self.__url)
+            await self.close()
+            raise
+        return self
+
+    async def close(self):
+        self.__closed = True
+        if self.__ws is not None:
+            await self.__ws.close()
+        for task in list(self.__consumers.values()) + [self.__run_task]:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*[t for t in self.__consumers.values()], return_exceptions=True)
+        self.__consumers.clear()
+
+    def recorder(self, recorder):
+        """Record every frame received (see recorder.WsRecorder)."""
+        self.__recorder = recorder
+        return self
+
+    def api_key(self, api_key):
+        self.__api_key = api_key
+        return self
+
+    def api_secret_key(self, api_secret_key):
+        self.__api_secret_key = api_secret_key
+        return self
+
+    def passphrase(self, passphrase):
+        self.__passphrase = passphrase
+        return self
+
+    def listener(self, listener):
+        self.__listener = listener
+        return self
+
+    def error_listener(self, error_listener):
+        self.__error_listener = error_listener
+        return self
+
+    def has_connect(self):
+        return self.__connected is not None and self.__connected.is_set()
+
+    def reconnect_stats(self):
+        return self.__reconnect_manager.stats()
+
+    def missed_channels(self):
+        return self.__reconnect_manager.missed_channels()
+
+    def clear_missed(self, channels=None):
+        self.__reconnect_manager.clear_missed(channels)
+
+    def queue_stats(self):
+        return {"{}:{}".format(channel.channel, channel.inst_id): {"depth": len(q), "dropped": q.dropped}
+                for channel, q in self.__queues.items()}
+
+    async def send_message(self, op, args):
+        message = json.dumps(BaseWsReq(op, args), default=lambda o: o.__dict__)
+        logger.debug("send message: %s", message)
+        await self.__ws.send(message)
+
+    async def subscribe(self, channels, listener=None):
+        for channel in channels:
+            channel.inst_type = str(channel.inst_type)
+            if listener:
+                self.__scribe_map[channel] = listener
+            self.__all_suribe.add(channel)
+            self.__ensure_consumer(channel)
+
+        if self.has_connect():
+            await self.send_message(WS_OP_SUBSCRIBE, channels)
+
+    async def unsubscribe(self, channels):
+        for channel in channels:
+            self.__scribe_map.pop(channel, None)
+            self.__all_suribe.discard(channel)
+            self.__queues.pop(channel, None)
+            task = self.__consumers.pop(channel, None)
+            if task is not None:
+                task.cancel()
+
+        if self.has_connect():
+            await self.send_message(WS_OP_UNSUBSCRIBE, channels)
+
+    def __ensure_consumer(self, channel):
+        if channel in self.__consumers:
+            return
+        queue = ChannelQueue(self.__queue_size, self.__overflow)
+        self.__queues[channel] = queue
+        self.__consumers[channel] = asyncio.ensure_future(self.__consume(channel, queue))
+
+    async def __consume(self, channel, queue):
+        while True:
+            message = await queue.get()
+            try:
+                await _call(self.__scribe_map.get(channel, self.__listener), message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("listener error on %s:%s", channel.channel, channel.inst_id)
+
+    async def __run(self):
+        while not self.__closed:
+            try:
+                async with websockets.connect(self.__url, ping_interval=None) as ws:
+                    self.__ws = ws
+                    logger.info('connection is success....')
+                    await self.__on_connected()
+                    heartbeat = asyncio.ensure_future(self.__keep_connected(ws))
+                    try:
+                        async for message in ws:
+                            await self.__on_message(message)
+                    finally:
+                        heartbeat.cancel()
+            except asyncio.CancelledError:
+                raise
+            except (websockets.ConnectionClosed, OSError, asyncio.TimeoutError) as ex:
+                logger.warning("ws is closeing ......%s", ex)
+            except Exception:
+                # anything else would end the task for good; reconnect instead
+                logger.exception("ws read loop failed")
+            finally:
+                self.__ws = None
+                self.__connected.clear()
+                self.__login_event.clear()
+
+            if not self.__closed:
+                self.__reconnect_manager.on_disconnect(self.__all_suribe)
+                try:
+                    delay = self.__reconnect_manager.next_delay()
+                except BitgetWsReconnectException as e:
+                    self.__closed = True
+                    await _call(self.__error_listener, str(e))
+                    return
+                logger.warning("start reconnection in %.2fs ...", delay)
+                await asyncio.sleep(delay)
+
+    async def __on_connected(self):
+        self.__last_pong = time.monotonic()
+        self.__allbooks_map.clear()
+        if self.__need_login:
+            await self.__login()
+        self.__connected.set()
+        manager = self.__reconnect_manager
+        # the gap is recorded before any snapshot can clear it
+        manager.on_reconnected()
+        for batch in manager.batches(list(self.__all_suribe)):
+            await self.send_message(WS_OP_SUBSCRIBE, batch)
+            await asyncio.sleep(manager.batch_interval)
+        manager.on_resubscribed()
+
+    async def __login(self):
+        utils.check_none(self.__api_key, "api key")
+        utils.check_none(self.__api_secret_key, "api secret key")
+        utils.check_none(self.__passphrase, "passphrase")
+        timestamp = int(round(time.time()))
+        sign = utils.sign(utils.pre_hash(timestamp, GET, c.REQUEST_PATH), self.__api_secret_key)
+        if c.SIGN_TYPE == c.RSA:
+            sign = utils.signByRSA(utils.pre_hash(timestamp, GET, c.REQUEST_PATH), self.__api_secret_key)
+        ws_login_req = WsLoginReq(self.__api_key, self.__passphrase, str(timestamp), sign)
+        message = json.dumps(BaseWsReq(WS_OP_LOGIN, [ws_login_req]), default=lambda o: o.__dict__)
+        await self.__ws.send(message)
+        logger.info("logging in......")
+        # the login reply arrives through the read loop, which is not running yet
+        while not self.__login_event.is_set():
+            await self.__on_message(await asyncio.wait_for(self.__ws.recv(), self.__ping_timeout))
+
+    async def __keep_connected(self, ws):
+        while True:
+            await asyncio.sleep(self.__ping_interval)
+            if time.monotonic() - self.__last_pong > self.__ping_interval + self.__ping_timeout:
+                logger.warning("pong timeout, closing connection")
+                await ws.close()
+                return
+            await ws.send("ping")
+
+    async def __on_message(self, message):
+        # one bad frame or failing listener must not take down the read loop
+        try:
+            await self.__handle_message(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("error handling ws message: %.200s", message)
+
+    async def __handle_message(self, message):
+        if message == 'pong':
+            self.__last_pong = time.monotonic()
+            return
+        json_obj = json.loads(message)
+        if self.__recorder is not None:
+            self.__recorder.record(message, json_obj.get('arg'))
+        if "code" in json_obj and json_obj.get("code") != 0:
+            if self.__error_listener:
+                await _call(self.__error_listener, message)
+                return
+
+        if "event" in json_obj and json_obj.get("event") == "login":
+            logger.info("login msg: %s", message)
+            self.__login_event.set()
+            return
+
+        if "data" in json_obj and json_obj.get("arg"):
+            subscribe_req = self.__arg_to_subscribe_req(json_obj['arg'])
+            if not await self.__check_sum(subscribe_req, json_obj):
+                return
+            queue = self.__queues.get(subscribe_req)
+            if queue is not None:
+                queue.put(message)
+                return
+
+        await _call(self.__listener, message)
+
+    def __arg_to_subscribe_req(self, arg):
+        inst_id = arg['instId'] if "instId" in arg else arg.get('coin')
+        return SubscribeReq(str(arg.get('instType')), arg.get('channel'), inst_id)
+
+    async def __check_sum(self, subscribe_req, json_obj):
+        if subscribe_req.channel != "books" or "action" not in json_obj:
+            return True
+        data = json_obj['data'][0]
+        books_info = BooksInfo(data['asks'], data['bids'], data['checksum'])
+        if json_obj['action'] == "snapshot":
+            self.__allbooks_map[subscribe_req] = books_info
+            return True
+        all_books = self.__allbooks_map.get(subscribe_req)
+        if all_books is None:
+            return False
+        all_books = all_books.merge(books_info)
+        if not all_books.check_sum(books_info.checksum):
+            # resync the book from a fresh snapshot
+            self.__allbooks_map.pop(subscribe_req, None)
+            await self.send_message(WS_OP_UNSUBSCRIBE, [subscribe_req])
+            await self.send_message(WS_OP_SUBSCRIBE, [subscribe_req])
+            return False
+        self.__allbooks_map[subscribe_req] = all_books
+        return True
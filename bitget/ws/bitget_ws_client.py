@@ -1,9 +1,9 @@
 #!/usr/bin/python
 import json
+import logging
 import math
 import threading
 import time
-import traceback
 from threading import Timer
 from zlib import crc32
 
@@ -11,18 +11,22 @@ import websocket
 
 from bitget.consts import GET
 from .. import consts as c, utils
+from ..exceptions import BitgetWsReconnectException
+from .reconnect import ReconnectManager
 
 WS_OP_LOGIN = 'login'
 WS_OP_SUBSCRIBE = "subscribe"
 WS_OP_UNSUBSCRIBE = "unsubscribe"
 
+logger = logging.getLogger(__name__)
+
 
 def handle(message):
-    print("default:" + message)
+    logger.info("default: %s", message)
 
 
 def handel_error(message):
-    print("default_error:" + message)
+    logger.error("default_error: %s", message)
 
 
 class BitgetWsClient:
@@ -33,6 +37,11 @@ class BitgetWsClient:
         self.__connection = False
         self.__login_status = False
         self.__reconnect_status = False
+        self.__reconnect_lock = threading.Lock()
+        self.__failure = None
+        self.__closed = False
+        self.__thread = None
+        self.__ws_client = None
         self.__api_key = None
         self.__api_secret_key = None
         self.__passphrase = None
@@ -42,23 +51,39 @@ class BitgetWsClient:
         self.__url = url
         self.__scribe_map = {}
         self.__allbooks_map = {}
+        self.__reconnect_manager = ReconnectManager()
+        self.__keep_alive_started = False
+        self.__dispatcher = None
+        self.__recorder = None
+        self.__offline = False
 
     def build(self):
-        self.__ws_client = self.__init_client()
-        __thread = threading.Thread(target=self.connect)
-        __thread.start()
+        if self.__dispatcher is not None:
+            self.__dispatcher.start()
+        if self.__recorder is not None:
+            self.__recorder.start()
+        if self.__offline:
+            return self
+        self.__start()
 
         while not self.has_connect():
-            print("start connecting... url: ", self.__url)
+            logger.info("start connecting... url: %s", self.__url)
             time.sleep(1)
 
         if self.__need_login:
             self.__login()
 
-        self.__keep_connected(25)
+        if not self.__keep_alive_started:
+            self.__keep_alive_started = True
+            self.__keep_connected(25)
 
         return self
 
+    def __start(self):
+        self.__ws_client = self.__init_client()
+        self.__thread = threading.Thread(target=self.connect, daemon=True)
+        self.__thread.start()
+
     def api_key(self, api_key):
         self.__api_key = api_key
         return self
@@ -79,6 +104,56 @@ class BitgetWsClient:
         self.__error_listener = error_listener
         return self
 
+    def dispatcher(self, dispatcher):
+        self.__dispatcher = dispatcher
+        return self
+
+    def recorder(self, recorder):
+        """Record every frame received (see recorder.WsRecorder)."""
+        self.__recorder = recorder
+        return self
+
+    def offline(self):
+        """
+        Never connect: subscribe() only registers listeners and frames arrive
+        through feed(), e.g. from a recorder.Replayer.
+        """
+        self.__offline = True
+        return self
+
+    def is_offline(self):
+        return self.__offline
+
+    def feed(self, message):
+        """Handle one raw frame as if it had arrived on the socket."""
+        self.__on_message(None, message)
+
+    def dispatch_stats(self):
+        return self.__dispatcher.stats() if self.__dispatcher is not None else None
+
+    def reconnect_manager(self, reconnect_manager):
+        self.__reconnect_manager = reconnect_manager
+        return self
+
+    def close(self):
+        """Close the connection for good: no reconnect and no more keep-alive pings."""
+        self.__closed = True
+        if self.__ws_client is not None:
+            self.__close()
+
+    def failure(self):
+        """The BitgetWsReconnectException that ended reconnecting, or None while the client is usable."""
+        return self.__failure
+
+    def reconnect_stats(self):
+        return self.__reconnect_manager.stats()
+
+    def missed_channels(self):
+        return self.__reconnect_manager.missed_channels()
+
+    def clear_missed(self, channels=None):
+        self.__reconnect_manager.clear_missed(channels)
+
     def has_connect(self):
         return self.__connection
 
@@ -90,8 +165,8 @@ class BitgetWsClient:
                                           on_error=self.__on_error,
                                           on_close=self.__on_close)
 
-        except Exception as ex:
-            print(ex)
+        except Exception:
+            logger.exception("failed to create websocket client")
 
     def __login(self):
         utils.check_none(self.__api_key, "api key")
@@ -103,27 +178,34 @@ class BitgetWsClient:
             sign = utils.signByRSA(utils.pre_hash(timestamp, GET, c.REQUEST_PATH), self.__api_secret_key)
         ws_login_req = WsLoginReq(self.__api_key, self.__passphrase, str(timestamp), sign)
         self.send_message(WS_OP_LOGIN, [ws_login_req])
-        print("logging in......")
+        logger.info("logging in......")
         while not self.__login_status:
+            if not self.__connection:
+                raise ConnectionError("connection closed while logging in")
             time.sleep(1)
 
     def connect(self):
         try:
             self.__ws_client.run_forever(ping_timeout=10)
-        except Exception as ex:
-            print(ex)
+        except Exception:
+            logger.exception("websocket run loop failed")
 
     def __keep_connected(self, interval):
         try:
+            if self.__closed:
+                return
             __timer_thread = Timer(interval, self.__keep_connected, (interval,))
+            __timer_thread.daemon = True
             __timer_thread.start()
             self.__ws_client.send("ping")
         except Exception as ex:
-            print(ex)
+            logger.warning("keep alive ping failed: %s", ex)
 
     def send_message(self, op, args):
+        if self.__offline:
+            return
         message = json.dumps(BaseWsReq(op, args), default=lambda o: o.__dict__)
-        print("send message:" + message)
+        logger.debug("send message: %s", message)
         self.__ws_client.send(message)
 
     def subscribe(self, channels, listener=None):
@@ -153,23 +235,24 @@ class BitgetWsClient:
             pass
 
     def __on_open(self, ws):
-        print('connection is success....')
+        logger.info('connection is success....')
         self.__connection = True
-        self.__reconnect_status = False
 
     def __on_message(self, ws, message):
 
         if message == 'pong':
-            print("Keep connected:" + message)
+            logger.debug("Keep connected: %s", message)
             return
         json_obj = json.loads(message)
+        if self.__recorder is not None:
+            self.__recorder.record(message, json_obj.get('arg'))
         if "code" in json_obj and json_obj.get("code") != 0:
             if self.__error_listener:
                 self.__error_listener(message)
                 return
 
         if "event" in json_obj and json_obj.get("event") == "login":
-            print("login msg:" + message)
+            logger.info("login msg: %s", message)
             self.__login_status = True
             return
         listenner = None
@@ -179,11 +262,13 @@ class BitgetWsClient:
 
             listenner = self.get_listener(json_obj)
 
-        if listenner:
-            listenner(message)
+        listenner = listenner or self.__listener
+        if self.__dispatcher is not None:
+            arg = json_obj.get('arg') or {}
+            self.__dispatcher.submit(arg.get('instId') or arg.get('coin'), listenner, message)
             return
 
-        self.__listener(message)
+        listenner(message)
 
     def __dict_books_info(self, dict):
         return BooksInfo(dict['asks'], dict['bids'], dict['checksum'])
@@ -202,29 +287,71 @@ class BitgetWsClient:
                 subscribe_req = json.loads(json_str, object_hook=self.__dict_to_subscribe_req)
                 return self.__scribe_map.get(subscribe_req)
         except Exception as e:
-            print(json_obj.get('arg'), e)
+            logger.warning("no listener for %s: %s", json_obj.get('arg'), e)
             pass
 
     def __on_error(self, ws, msg):
-        print("error:", msg)
+        logger.error("error: %s", msg)
         self.__close()
-        if not self.__reconnect_status:
-            self.__re_connect()
+        self.__re_connect()
 
     def __on_close(self, ws, close_status_code, close_msg):
-        print("ws is closeing ......close_status:{},close_msg:{}".format(close_status_code, close_msg))
+        logger.warning("ws is closeing ......close_status:%s,close_msg:%s", close_status_code, close_msg)
         self.__close()
-        if not self.__reconnect_status:
-            self.__re_connect()
-
-    def __re_connect(self):
-        # 重连
-        self.__reconnect_status = True
-        print("start reconnection ...")
-        self.build()
-        for channel in self.__all_suribe :
-            self.subscribe([channel])
-        pass
+        self.__re_connect()
+
+    def __re_connect(self, connect_timeout=10):
+        # 重连; only one reconnect runs at a time, until login and resubscription are done
+        with self.__reconnect_lock:
+            if self.__reconnect_status or self.__failure is not None or self.__closed:
+                return
+            self.__reconnect_status = True
+        try:
+            self.__reconnect_and_resubscribe(connect_timeout)
+        finally:
+            self.__reconnect_status = False
+        if not self.__connection and self.__failure is None and not self.__closed:
+            # dropped again just before the flag was cleared, so no other reconnect started
+            self.__re_connect(connect_timeout)
+
+    def __reconnect_and_resubscribe(self, connect_timeout):
+        manager = self.__reconnect_manager
+        while not self.__closed:
+            manager.on_disconnect(self.__all_suribe)
+            try:
+                delay = manager.next_delay()
+            except BitgetWsReconnectException as e:
+                # nothing reconnects after this; the owner sees it through failure()
+                logger.error("giving up on %s: %s", self.__url, e)
+                self.__failure = e
+                self.__error_listener(str(e))
+                return
+            logger.warning("start reconnection in %.2fs ...", delay)
+            time.sleep(delay)
+            self.__start()
+            deadline = time.time() + connect_timeout
+            # a refused connection ends the run loop long before the timeout
+            while not self.has_connect() and self.__thread.is_alive() and time.time() < deadline:
+                time.sleep(0.1)
+            if not self.has_connect():
+                self.__ws_client.close()
+                continue
+            try:
+                if self.__need_login:
+                    self.__login()
+                # the gap is recorded before any snapshot can clear it
+                manager.on_reconnected()
+                for batch in manager.batches(list(self.__all_suribe)):
+                    self.send_message(WS_OP_SUBSCRIBE, batch)
+                    time.sleep(manager.batch_interval)
+            except Exception as ex:
+                # the new socket dropped while logging in or resubscribing: start over
+                logger.warning("resubscribe failed, reconnecting: %s", ex)
+                self.__close()
+                continue
+            if self.has_connect():
+                manager.on_resubscribed()
+                return
 
     def __close(self):
         self.__login_status = False
@@ -251,7 +378,7 @@ class BitgetWsClient:
                 self.__allbooks_map[subscribe_req] = books_info
                 return True
             if action == "update":
-                all_books = self.__allbooks_map[subscribe_req]
+                all_books = self.__allbooks_map.get(subscribe_req)
                 if all_books is None:
                     return False
 
@@ -262,9 +389,8 @@ class BitgetWsClient:
                     self.subscribe([subscribe_req])
                     return False
                 self.__allbooks_map[subscribe_req] = all_books
-        except Exception as e:
-            msg = traceback.format_exc()
-            print(msg)
+        except Exception:
+            logger.exception("books checksum failed")
 
         return True
 
@@ -310,9 +436,9 @@ class BooksInfo:
                 crc32str = crc32str + self.asks[x][0] + ":" + self.asks[x][1] + ":"
 
         crc32str = crc32str[0:len(crc32str) - 1]
-        print(crc32str)
         merge_num = crc32(bytes(crc32str, encoding="utf8"))
-        print("start checknum mergeVal:" + str(merge_num) + ",checkVal:" + str(new_check_sum)+",checkSin:"+str(self.__signed_int(merge_num)))
+        logger.debug("start checknum mergeVal:%s,checkVal:%s,checkSin:%s",
+                     merge_num, new_check_sum, self.__signed_int(merge_num))
         return self.__signed_int(merge_num) == new_check_sum
 
     def __signed_int(self, checknum):
@@ -0,0 +1,119 @@
+#!/usr/bin/python
+import collections
+import logging
+import queue
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+
+class OrderedDispatcher:
+    """
+    Moves websocket messages off the socket thread onto a worker pool.
+
+    Each key (normally the instId) is pinned to one worker by a stable hash,
+    so messages for a symbol are handled in arrival order while different
+    symbols are handled in parallel. submit() never blocks: when a worker's
+    queue is full the message is dropped, counted and logged as a warning
+    (a dropped candle close leaves that market's bands one bar short).
+    """
+
+    def __init__(self, workers=4, max_queue=10000, latency_samples=1000, name="ws-dispatch"):
+        self.workers = workers
+        self.name = name
+        self.dropped = 0
+        self.handled = 0
+        self.errors = 0
+        self.__queues = [queue.Queue(maxsize=max_queue) for _ in range(workers)]
+        self.__threads = []
+        self.__lock = threading.Lock()
+        self.__pending = collections.Counter()
+        self.__latency = collections.deque(maxlen=latency_samples)
+        self.__wait = collections.deque(maxlen=latency_samples)
+        self.__max_latency = 0.0
+
+    def start(self):
+        if self.__threads:
+            return self
+        for i, q in enumerate(self.__queues):
+            thread = threading.Thread(target=self.__work, args=(q,), name="{}-{}".format(self.name, i), daemon=True)
+            thread.start()
+            self.__threads.append(thread)
+        return self
+
+    def stop(self, timeout=5):
+        for q in self.__queues:
+            q.put(None)
+        for thread in self.__threads:
+            thread.join(timeout)
+        self.__threads = []
+
+    def submit(self, key, handler, message):
+        q = self.__queues[zlib.crc32(str(key).encode()) % self.workers]
+        # counted before the put: a worker may finish the message before put_nowait returns
+        with self.__lock:
+            self.__pending[key] += 1
+        try:
+            q.put_nowait((key, handler, message, time.perf_counter()))
+        except queue.Full:
+            with self.__lock:
+                self.__pending[key] -= 1
+                if self.__pending[key] <= 0:
+                    del self.__pending[key]
+                self.dropped += 1
+                dropped = self.dropped
+            logger.warning("Dispatch queue full, dropped message for %s (%d dropped so far): %.120s", key, dropped,
+                           message, extra={"event": "ws_drop", "key": key, "dropped": dropped})
+            return False
+        return True
+
+    def __work(self, q):
+        while True:
+            item = q.get()
+            if item is None:
+                return
+            key, handler, message, enqueued = item
+            started = time.perf_counter()
+            try:
+                handler(message)
+            except Exception:
+                with self.__lock:
+                    self.errors += 1
+                logger.exception("dispatch handler error for %s", key)
+            finished = time.perf_counter()
+            with self.__lock:
+                self.handled += 1
+                self.__pending[key] -= 1
+                if self.__pending[key] <= 0:
+                    del self.__pending[key]
+                self.__wait.append(started - enqueued)
+                self.__latency.append(finished - started)
+                self.__max_latency = max(self.__max_latency, finished - started)
+
+    def stats(self):
+        """Queue depth per worker and key plus handler latency / queue wait in milliseconds."""
+        with self.__lock:
+            latency = sorted(self.__latency)
+            wait = sorted(self.__wait)
+            return {
+                "queue_depth": [q.qsize() for q in self.__queues],
+                "pending_by_key": dict(self.__pending),
+                "handled": self.handled,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "handler_latency_ms": _summary(latency, self.__max_latency),
+                "queue_wait_ms": _summary(wait, wait[-1] if wait else 0.0),
+            }
+
+
+def _summary(samples, max_value):
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "p50": samples[len(samples) // 2] * 1000,
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+        "max": max_value * 1000,
+    }
@@ -0,0 +1,130 @@
+#!/usr/bin/python
+import collections
+import json
+import random
+import time
+
+from .. import consts as c
+from ..exceptions import BitgetWsReconnectException
+
+# bytes of the {"op": ..., "args": []} frame around the channels, for the longest op
+ENVELOPE_BYTES = len(json.dumps({"op": "unsubscribe", "args": []}))
+
+
+class ReconnectManager:
+    """
+    Reconnect policy shared by the websocket clients.
+
+    Delays follow full-jitter exponential backoff, the number of reconnects
+    inside a rolling window is capped by a budget, and resubscription is
+    split into batches that respect the exchange's per-message limits.
+    Every disconnect is recorded as a gap so that channels which may have
+    missed data can be backfilled selectively.
+    """
+
+    def __init__(self, base_delay=1, max_delay=60, budget=20, budget_window=600,
+                 batch_size=c.WS_MAX_ARGS_PER_MESSAGE, max_batch_bytes=c.WS_MAX_MESSAGE_BYTES,
+                 messages_per_second=c.WS_MAX_MESSAGES_PER_SECOND, history=100):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.budget_window = budget_window
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.batch_interval = 1.0 / messages_per_second
+        self.attempt = 0
+        self.gap_count = 0
+        self.total_gap_seconds = 0.0
+        self.max_gap_seconds = 0.0
+        self.gaps = collections.deque(maxlen=history)
+        self.__reconnects = collections.deque()
+        self.__disconnected_at = None
+        self.__gap_channels = set()
+        self.__missed = {}
+
+    def on_disconnect(self, channels):
+        """Start a gap; only the first call counts until the gap is closed."""
+        if self.__disconnected_at is None:
+            self.__disconnected_at = time.time()
+            self.__gap_channels = set(channels)
+
+    def next_delay(self):
+        """
+        Return how long to wait before the next attempt.
+
+        Raises:
+            BitgetWsReconnectException: when the reconnect budget is spent
+        """
+        now = time.monotonic()
+        while self.__reconnects and now - self.__reconnects[0] > self.budget_window:
+            self.__reconnects.popleft()
+        if len(self.__reconnects) >= self.budget:
+            raise BitgetWsReconnectException(
+                "reconnect budget of {} per {}s exhausted".format(self.budget, self.budget_window))
+        self.__reconnects.append(now)
+
+        ceiling = min(self.max_delay, self.base_delay * (2 ** self.attempt))
+        self.attempt += 1
+        return random.uniform(0, ceiling)
+
+    def batches(self, channels):
+        """Split channels into subscribe batches whose whole frame stays within count and size limits."""
+        batch, batch_bytes = [], ENVELOPE_BYTES
+        for channel in channels:
+            # plus the ", " separating it from the previous channel
+            size = len(json.dumps(channel, default=lambda o: o.__dict__)) + 2
+            if batch and (len(batch) >= self.batch_size or batch_bytes + size > self.max_batch_bytes):
+                yield batch
+                batch, batch_bytes = [], ENVELOPE_BYTES
+            batch.append(channel)
+            batch_bytes += size
+        if batch:
+            yield batch
+
+    def on_reconnected(self):
+        """
+        Close the current gap and mark its channels as possibly incomplete.
+
+        Call this before resubscribing: the snapshots sent in reply can be
+        handled, and clear_missed() called, before the last batch is out.
+        """
+        if self.__disconnected_at is None:
+            return
+        start, end = self.__disconnected_at, time.time()
+        gap = end - start
+        self.gap_count += 1
+        self.total_gap_seconds += gap
+        self.max_gap_seconds = max(self.max_gap_seconds, gap)
+        self.gaps.append({"start": start, "end": end, "seconds": gap, "channels": len(self.__gap_channels)})
+        for channel in self.__gap_channels:
+            # widen an earlier, not yet backfilled gap instead of replacing it
+            previous = self.__missed.get(channel)
+            self.__missed[channel] = (previous[0] if previous else int(start * 1000), int(end * 1000))
+        self.__disconnected_at = None
+        self.__gap_channels = set()
+
+    def on_resubscribed(self):
+        """Reset the backoff once every channel is subscribed again (closing the gap if still open)."""
+        self.attempt = 0
+        self.on_reconnected()
+
+    def missed_channels(self):
+        """Return {channel: (gap_start_ms, gap_end_ms)} for channels awaiting backfill."""
+        return dict(self.__missed)
+
+    def clear_missed(self, channels=None):
+        """Forget gaps once they have been backfilled (all of them by default)."""
+        if channels is None:
+            self.__missed.clear()
+            return
+        for channel in channels:
+            self.__missed.pop(channel, None)
+
+    def stats(self):
+        return {
+            "gap_count": self.gap_count,
+            "total_gap_seconds": self.total_gap_seconds,
+            "max_gap_seconds": self.max_gap_seconds,
+            "attempt": self.attempt,
+            "missed_channels": len(self.__missed),
+        }
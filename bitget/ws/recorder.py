@@ -0,0 +1,462 @@
+#!/usr/bin/python
+"""
+Records websocket frames to disk and replays them into the same listeners.
+
+    python -m bitget.ws.recorder record recordings/ --markets BTCUSDT,ETHUSDT --channels ticker,books,candle15m
+    python -m bitget.ws.recorder info recordings/
+    python -m bitget.ws.recorder replay recordings/ --speed 0
+
+A recording is a directory of segment files. Each segment starts with
+MAGIC and holds blocks; a block is a small header, a JSON index entry
+(time range, frame count and the channels it contains) and the zlib
+compressed frames, each framed as receive time (ns), channel number and
+length. Readers seek past blocks outside the wanted time range or
+channels without decompressing them, and a block cut short by a crash
+only ends the segment.
+
+The recorder never blocks the socket thread: frames are appended to the
+current block, and full (or `flush_seconds` old) blocks are compressed
+and written by a background thread. Segments rotate by size and age, and
+the oldest segments are deleted to keep the directory under `max_bytes`.
+"""
+import argparse
+import collections
+import glob
+import json
+import logging
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"BGWSREC1"
+BLOCK = struct.Struct("<4sII")     # b"BLK1", index entry length, compressed length
+FRAME = struct.Struct("<qHI")      # receive time (ns), channel number in the block, payload length
+SUFFIX = ".bgrec"
+
+
+def channel_key(arg):
+    """'instType|channel|instId' of a message's arg; '||' for frames without one."""
+    if not arg:
+        return "||"
+    return "%s|%s|%s" % (arg.get('instType', ''), arg.get('channel', ''), arg.get('instId') or arg.get('coin', ''))
+
+
+class WsRecorder:
+    """
+    Writes every frame passed to record() into rotating, compressed segments.
+
+    Attach it with BitgetWsClient(...).recorder(recorder); the client
+    records each frame before checksums and listeners run.
+
+    Args:
+        directory: where segments are written
+        segment_bytes: rotate to a new segment after this many bytes on disk
+        segment_seconds: or after this long
+        max_bytes: delete the oldest segments to stay under this total
+        block_bytes: raw frame bytes per compressed block
+        flush_seconds: write a partial block once it is this old
+        level: zlib compression level
+        max_pending: blocks waiting for the writer before new ones are dropped
+    """
+
+    def __init__(self, directory, segment_bytes=64 * 2 ** 20, segment_seconds=3600, max_bytes=2 ** 30,
+                 block_bytes=256 * 2 ** 10, flush_seconds=1.0, level=6, max_pending=64):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.max_bytes = max_bytes
+        self.block_bytes = block_bytes
+        self.flush_seconds = flush_seconds
+        self.level = level
+        self.recorded = 0
+        self.dropped = 0
+        self.written_bytes = 0
+        self.raw_bytes = 0
+        self.__queue = queue.Queue(maxsize=max_pending)
+        self.__lock = threading.Lock()
+        self.__block = []
+        self.__block_size = 0
+        self.__block_started = None
+        self.__thread = None
+        self.__file = None
+        self.__file_path = None
+        self.__file_opened = 0.0
+        self.__file_size = 0
+        self.__segments = collections.deque()
+        self.__behind = 0
+
+    def start(self):
+        if self.__thread is not None:
+            return self
+        os.makedirs(self.directory, exist_ok=True)
+        for path in sorted(glob.glob(os.path.join(self.directory, "*" + SUFFIX))):
+            self.__segments.append((path, os.path.getsize(path)))
+        self.__thread = threading.Thread(target=self.__work, name="ws-recorder", daemon=True)
+        self.__thread.start()
+        return self
+
+    def record(self, message, arg=None, ts=None):
+        """Append one raw frame (str or bytes) of channel `arg`, received at `ts` (time.time_ns())."""
+        payload = message.encode() if isinstance(message, str) else message
+        ts = time.time_ns() if ts is None else ts
+        with self.__lock:
+            if self.__block_started is None:
+                self.__block_started = ts
+            self.__block.append((ts, channel_key(arg), payload))
+            self.__block_size += len(payload)
+            self.recorded += 1
+            if self.__block_size < self.block_bytes:
+                return
+            block = self.__take()
+        self.__submit(block)
+
+    def flush(self, min_age=0.0):
+        """Hand the current block to the writer if it is at least `min_age` seconds old."""
+        with self.__lock:
+            if not self.__block or time.time_ns() - self.__block_started < min_age * 1e9:
+                return
+            block = self.__take()
+        self.__submit(block)
+
+    def close(self, timeout=10):
+        """Write everything recorded so far and close the segment."""
+        if self.__thread is None:
+            return
+        self.flush()
+        self.__queue.put(None)
+        self.__thread.join(timeout)
+        self.__thread = None
+
+    def stats(self):
+        with self.__lock:
+            return {
+                "recorded": self.recorded,
+                "dropped": self.dropped,
+                "pending_blocks": self.__queue.qsize(),
+                "raw_bytes": self.raw_bytes,
+                "written_bytes": self.written_bytes,
+                "segments": len(self.__segments) + (self.__file is not None),
+            }
+
+    def __take(self):
+        block = self.__block
+        self.__block = []
+        self.__block_size = 0
+        self.__block_started = None
+        return block
+
+    def __submit(self, block):
+        try:
+            self.__queue.put_nowait(block)
+        except queue.Full:
+            with self.__lock:
+                self.dropped += len(block)
+                first = not self.__behind
+                self.__behind += len(block)
+            if first:
+                logger.warning("recorder writer behind, dropping frames")
+
+    def __work(self):
+        while True:
+            try:
+                block = self.__queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                self.flush(self.flush_seconds)
+                continue
+            if block is None:
+                break
+            try:
+                self.__write(block)
+            except OSError:
+                logger.exception("failed to write recording block")
+            if self.__behind and self.__queue.empty():
+                with self.__lock:
+                    dropped, self.__behind = self.__behind, 0
+                logger.warning("recorder writer caught up after dropping %d frames", dropped)
+        self.__close_segment()
+
+    def __write(self, block):
+        channels = {}
+        parts = []
+        for ts, key, payload in block:
+            number = channels.setdefault(key, len(channels))
+            parts.append(FRAME.pack(ts, number, len(payload)))
+            parts.append(payload)
+        raw = b"".join(parts)
+        data = zlib.compress(raw, self.level)
+        entry = json.dumps({"first": block[0][0], "last": block[-1][0], "count": len(block), "raw": len(raw),
+                            "channels": list(channels)}, separators=(",", ":")).encode()
+        if self.__file is not None and (self.__file_size >= self.segment_bytes
+                                        or time.time() - self.__file_opened >= self.segment_seconds):
+            self.__close_segment()
+        if self.__file is None:
+            self.__open_segment(block[0][0])
+        self.__file.write(BLOCK.pack(b"BLK1", len(entry), len(data)) + entry + data)
+        self.__file.flush()
+        size = BLOCK.size + len(entry) + len(data)
+        self.__file_size += size
+        with self.__lock:
+            self.raw_bytes += len(raw)
+            self.written_bytes += size
+        self.__trim()
+
+    def __open_segment(self, ts):
+        path = os.path.join(self.directory, "ws-%019d%s" % (ts, SUFFIX))
+        self.__file = open(path, "wb")
+        self.__file.write(MAGIC)
+        self.__file_path = path
+        self.__file_opened = time.time()
+        self.__file_size = len(MAGIC)
+
+    def __close_segment(self):
+        if self.__file is None:
+            return
+        self.__file.close()
+        self.__segments.append((self.__file_path, self.__file_size))
+        self.__file = None
+
+    def __trim(self):
+        total = self.__file_size + sum(size for _, size in self.__segments)
+        while self.__segments and total > self.max_bytes:
+            path, size = self.__segments.popleft()
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            logger.info("recording over %d bytes, removed %s", self.max_bytes, path)
+
+
+def segments(path):
+    """Segment files of a recording directory (or one segment file), oldest first."""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "*" + SUFFIX)))
+    return [path]
+
+
+def _blocks(path):
+    """(offset, index entry, file) for each complete block header of a segment; the file is positioned at the data."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            logger.warning("%s is not a recording segment", path)
+            return
+        while True:
+            offset = f.tell()
+            header = f.read(BLOCK.size)
+            if len(header) < BLOCK.size:
+                return
+            tag, entry_length, data_length = BLOCK.unpack(header)
+            entry = f.read(entry_length)
+            if tag != b"BLK1" or len(entry) < entry_length:
+                logger.warning("%s: truncated block at %d", path, offset)
+                return
+            entry = json.loads(entry)
+            entry["length"] = data_length
+            yield offset, entry, f
+            f.seek(offset + BLOCK.size + entry_length + data_length)
+
+
+class Replayer:
+    """
+    Plays a recording back in receive order.
+
+    Frames can be limited to channels (channel names such as "books15" or
+    full 'instType|channel|instId' keys), markets (instIds) and a time
+    range in time.time_ns() units; whole blocks outside them are skipped
+    unread.
+
+    Args:
+        path: recording directory or segment file
+        channels, markets: iterables to keep, or None for all
+        start, end: receive time range in nanoseconds, or None
+    """
+
+    def __init__(self, path, channels=None, markets=None, start=None, end=None):
+        self.path = path
+        self.channels = set(channels) if channels else None
+        self.markets = set(markets) if markets else None
+        self.start = start
+        self.end = end
+
+    def __wanted(self, key):
+        _, channel, market = key.split("|")
+        if self.channels is not None and channel not in self.channels and key not in self.channels:
+            return False
+        return self.markets is None or market in self.markets
+
+    def index(self):
+        """Per channel key, the (segment, offset, first ns, last ns) of every block containing it."""
+        index = collections.defaultdict(list)
+        for segment in segments(self.path):
+            for offset, entry, _ in _blocks(segment):
+                for key in entry["channels"]:
+                    index[key].append((segment, offset, entry["first"], entry["last"]))
+        return dict(index)
+
+    def frames(self):
+        """Yield (receive ns, channel key, frame str) in receive order."""
+        for segment in segments(self.path):
+            for offset, entry, f in _blocks(segment):
+                if self.start is not None and entry["last"] < self.start:
+                    continue
+                if self.end is not None and entry["first"] > self.end:
+                    return
+                wanted = [self.__wanted(key) for key in entry["channels"]]
+                if not any(wanted):
+                    continue
+                data = f.read(entry["length"])
+                try:
+                    raw = zlib.decompress(data)
+                except zlib.error:
+                    logger.warning("%s: truncated block at %d", segment, offset)
+                    break
+                keys = entry["channels"]
+                position = 0
+                while position < len(raw):
+                    ts, number, length = FRAME.unpack_from(raw, position)
+                    position += FRAME.size
+                    if wanted[number] and (self.start is None or ts >= self.start) and \
+                            (self.end is None or ts <= self.end):
+                        yield ts, keys[number], raw[position:position + length].decode()
+                    position += length
+
+    def play(self, target, speed=1.0):
+        """
+        Call target(frame) for every frame.
+
+        Args:
+            target: a listener, or BitgetWsClient.feed to run the client's
+                checksum and listener routing as well
+            speed: 1.0 plays in real time, 10 ten times faster, 0 as fast as possible
+
+        Returns:
+            dict: frames, seconds, frames_per_second and, when paced, how late
+            frames were delivered (lag_ms p50/p99/max)
+        """
+        frames = 0
+        lags = []
+        started = time.perf_counter()
+        first = None
+        for ts, _, message in self.frames():
+            if speed:
+                if first is None:
+                    first = ts
+                due = started + (ts - first) / 1e9 / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    lags.append(-delay)
+            target(message)
+            frames += 1
+        elapsed = time.perf_counter() - started
+        stats = {"frames": frames, "seconds": elapsed, "frames_per_second": frames / elapsed if elapsed else 0.0}
+        if speed:
+            lags.sort()
+            stats["lag_ms"] = {
+                "late_frames": len(lags),
+                "p50": lags[len(lags) // 2] * 1000 if lags else 0.0,
+                "p99": lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000 if lags else 0.0,
+                "max": lags[-1] * 1000 if lags else 0.0,
+            }
+        return stats
+
+
+def _subscriptions(keys):
+    from .bitget_ws_client import SubscribeReq
+
+    requests = []
+    for key in keys:
+        inst_type, channel, market = key.split("|")
+        if channel:
+            requests.append(SubscribeReq(inst_type, channel, market))
+    return requests
+
+
+def main(argv=None):
+    from bitget import consts as c
+    from .bitget_ws_client import BitgetWsClient, SubscribeReq
+    from .dispatcher import OrderedDispatcher
+
+    parser = argparse.ArgumentParser(description="Record and replay Bitget websocket frames.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="record public channels until interrupted")
+    record.add_argument("directory")
+    record.add_argument("--markets", required=True, help="comma separated instIds")
+    record.add_argument("--channels", default="ticker,books,candle15m")
+    record.add_argument("--inst-type", default="USDT-FUTURES")
+    record.add_argument("--url", default=c.PUBLIC_WS_URL)
+    record.add_argument("--max-mb", type=float, default=1024)
+    info = commands.add_parser("info", help="channels, frames and time range of a recording")
+    info.add_argument("path")
+    replay = commands.add_parser("replay", help="replay through an offline client and report throughput")
+    replay.add_argument("path")
+    replay.add_argument("--speed", type=float, default=0.0, help="1 = real time, 0 = as fast as possible")
+    replay.add_argument("--channels")
+    replay.add_argument("--markets")
+    replay.add_argument("--workers", type=int, default=0, help="dispatch on an OrderedDispatcher pool")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        recorder = WsRecorder(args.directory, max_bytes=int(args.max_mb * 2 ** 20))
+        client = BitgetWsClient(args.url).recorder(recorder).listener(lambda message: None).build()
+        client.subscribe([SubscribeReq(args.inst_type, channel, market)
+                          for channel in args.channels.split(",") for market in args.markets.split(",")])
+        try:
+            while client.failure() is None:
+                time.sleep(10)
+                logger.info("recorder: %s", recorder.stats())
+            logger.error("recording stopped: %s", client.failure())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            recorder.close()
+        return 1 if client.failure() is not None else 0
+
+    if args.command == "info":
+        blocks = collections.Counter()
+        first = last = None
+        frames = size = 0
+        for segment in segments(args.path):
+            size += os.path.getsize(segment)
+            for _, entry, _ in _blocks(segment):
+                frames += entry["count"]
+                first = entry["first"] if first is None else first
+                last = entry["last"]
+                blocks.update(entry["channels"])
+        json.dump({"segments": len(segments(args.path)), "bytes": size, "frames": frames,
+                   "seconds": (last - first) / 1e9 if frames else 0.0, "blocks_per_channel": blocks},
+                  sys.stdout, indent=4)
+        print()
+        return
+
+    replayer = Replayer(args.path, channels=args.channels and args.channels.split(","),
+                        markets=args.markets and args.markets.split(","))
+    handled = []
+    client = BitgetWsClient(c.PUBLIC_WS_URL).offline()
+    dispatcher = OrderedDispatcher(workers=args.workers) if args.workers else None
+    if dispatcher is not None:
+        client.dispatcher(dispatcher)
+    client.build()
+    client.subscribe(_subscriptions(replayer.index()), handled.append)
+    stats = replayer.play(client.feed, speed=args.speed)
+    if dispatcher is not None:
+        # let the workers drain before counting
+        dispatcher.stop()
+        stats["dispatch"] = dispatcher.stats()
+    stats["handled"] = len(handled)
+    json.dump(stats, sys.stdout, indent=4)
+    print()
+
+
+if __name__ == "__main__":
+    from logging_config import setup_logging
+
+    setup_logging()
+    sys.exit(main())
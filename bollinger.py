@@ -1,17 +1,17 @@
-import pandas as pd
+import contextlib
 import json
+import logging
+import threading
+import time
 
-from constants import TRADE_SIZE, WINDOW, NUM_STD, TRADING_STRATEGIES, MIN_LIMIT_GAP
-import bitget.v1.mix.order_api as maxOrderApi
-from bitget.bitget_api import BitgetApi
+from constants import (TRADE_SIZE, TRADING_STRATEGIES, MIN_LIMIT_GAP, STALE_LIMIT_HOURS, RISK_RETURN_BARS,
+                       MAX_PRICE_DRIFT, WINDOW, NUM_STD)
 from bitget.exceptions import BitgetAPIException
-from decouple import config
+from contracts import contract_cache
+from execution import get_execution
+from profiler import span
 
-apiKey = config('apiKey')
-secretKey = config('secretKey')
-passphrase = config('passphrase')
-
-baseApi = BitgetApi(apiKey, secretKey, passphrase)
+logger = logging.getLogger(__name__)
 
 # Function to log the order response
 def log_order_response(response, file_path):
@@ -27,9 +27,19 @@ def log_order_response(response, file_path):
 
         with open(file_path, "w") as f:
             json.dump(data, f, indent=4)
-        print(f"Order logged successfully: {response['data']['orderId']}")
+        logger.debug("Order logged successfully: %s", response['data']['orderId'])
     except Exception as e:
-        print(f"Failed to log order: {e}")
+        logger.error("Failed to log order: %s", e)
+
+
+def log_order_event(market, params, response, elapsed_ms):
+    """Emit one structured record per order submission."""
+    logger.info("%s %s %s %s", params['orderType'], params['side'], market, response.get('code'),
+                extra={"event": "order", "market": market, "side": params['side'],
+                       "order_type": params['orderType'], "size": params['size'],
+                       "price": params.get('price'), "code": response.get('code'),
+                       "order_id": (response.get('data') or {}).get('orderId'),
+                       "elapsed_ms": round(elapsed_ms, 3)})
 
 
 def calculate_bollinger_bands(price_series, window, num_std):
@@ -52,131 +62,382 @@ def calculate_bollinger_bands(price_series, window, num_std):
     return upper_band, middle_band, lower_band
 
 
-def manage_trade(price_data_file):
-
-    price_data = pd.read_csv(price_data_file)
-
+def load_open_trades(file_path=None):
+    # live and paper trading keep their positions apart (execution.open_trades_file)
+    if file_path is None:
+        file_path = get_execution().open_trades_file
     try:
-        with open('open_trades.json', 'r') as json_file:
+        with span("state_read"), open(file_path, 'r') as json_file:
             open_trades = json.load(json_file)
-        print(f'Open positions loaded: {open_trades}')
+        logger.info('Open positions loaded: %s', open_trades)
     except FileNotFoundError:
         open_trades = {}
-        print('No open positions found, starting fresh')
+        logger.info('No open positions found, starting fresh')
+    return open_trades
 
-    keys_to_remove = []
 
-    for market in TRADING_STRATEGIES.keys():
+def save_open_trades(open_trades, file_path=None):
+    if file_path is None:
+        file_path = get_execution().open_trades_file
+    with span("state_write"), open(file_path, 'w') as json_file:
+        json.dump(open_trades, json_file, indent=4)
+
 
-        price_series = price_data[market]
-        upper_band, middle_band, lower_band = calculate_bollinger_bands(price_series, WINDOW, NUM_STD)
-        
-        current_price = price_series.iloc[-1]
-        current_upper = upper_band.iloc[-1]
-        current_middle = middle_band.iloc[-1]
-        current_lower = lower_band.iloc[-1]
+def evaluate_market(market, current_price, current_upper, current_middle, current_lower, open_trades, strategy=None):
+    """
+    Apply the Bollinger entry/exit rules to one market and place any resulting orders.
+
+    Args:
+        market: market symbol, e.g. "ETHUSDT"
+        current_price: latest price of the market
+        current_upper, current_middle, current_lower: latest band values
+        open_trades: dict of open positions, updated in place on entry
+        strategy: "long", "short" or "both"; defaults to the market's TRADING_STRATEGIES entry
 
-        key_to_remove = None
+    Returns:
+        bool: True when the open position for this market has hit its exit condition
+    """
+    if strategy is None:
         strategy = TRADING_STRATEGIES.get(market, "both")
 
-        if market not in open_trades:
-            # "Long" strategy: Close short at market when price touches lower band (oversold)
-            # Then open short limit halfway between middle band and upper band
-            if strategy in ["long", "both"]:
-                if current_price <= current_lower:
-                    # Compute proposed limit price and ensure sufficient gap before entering
-                    proposed_limit_price = current_middle + (current_upper - current_middle) / 2
-                    gap_ratio = abs(proposed_limit_price - current_price) / current_price
-                    print(f"Long entry check for {market}: current={current_price:.2f}, limit={proposed_limit_price:.2f}, gap={gap_ratio*100:.2f}%")
-                    if gap_ratio >= MIN_LIMIT_GAP:
-                        # Close short position at market (this is our "long" entry)
-                        enter_market_trade(market, "close_short", price_data, open_trades)
-                        # Open short limit halfway between middle and upper band
-                        enter_limit_trade(market, "open_short", price_data, proposed_limit_price)
-                    else:
-                        print(f"Skipping long entry for {market}: gap {round(gap_ratio*100,2)}% < {int(MIN_LIMIT_GAP*100)}%")
-            
-            # "Short" strategy: Open short at market when price touches upper band (overbought)
-            # Then close short limit halfway between middle band and lower band
-            if strategy in ["short", "both"]:
-                if current_price >= current_upper:
-                    # Compute proposed limit price and ensure sufficient gap before entering
-                    proposed_limit_price = current_middle - (current_middle - current_lower) / 2
-                    gap_ratio = abs(proposed_limit_price - current_price) / current_price
-                    print(f"Short entry check for {market}: current={current_price:.2f}, limit={proposed_limit_price:.2f}, gap={gap_ratio*100:.2f}%")
-                    if gap_ratio >= MIN_LIMIT_GAP:
-                        # Open short position at market
-                        enter_market_trade(market, "open_short", price_data, open_trades)
-                        # Close short limit halfway between middle and lower band
-                        enter_limit_trade(market, "close_short", price_data, proposed_limit_price)
-                    else:
-                        print(f"Skipping short entry for {market}: gap {round(gap_ratio*100,2)}% < {int(MIN_LIMIT_GAP*100)}%")
-
-        elif market in open_trades:
-            position_type = open_trades[market]['position_type']
-            
-            # Exit conditions based on position type
-            if position_type == "open_short":
-                # Close short position when price reaches middle band (SMA)
-                if current_price <= current_middle:
-                    key_to_remove = market
-            elif position_type == "close_short":
-                # This represents a "long" position that was entered by closing a short
-                # Exit when price reaches middle band or upper band
-                if current_price >= current_middle or current_price >= current_upper:
-                    key_to_remove = market
-
-            if key_to_remove is not None:
-                keys_to_remove.append(key_to_remove)
-
-    for key in keys_to_remove:
-        del open_trades[key]
-
-    with open('open_trades.json', 'w') as json_file:
-        json.dump(open_trades, json_file, indent=4)
+    if market not in open_trades:
+        # "Long" strategy: Close short at market when price touches lower band (oversold)
+        # Then open short limit halfway between middle band and upper band
+        if strategy in ["long", "both"]:
+            if current_price <= current_lower:
+                # Compute proposed limit price and ensure sufficient gap before entering
+                proposed_limit_price = current_middle + (current_upper - current_middle) / 2
+                gap_ratio = abs(proposed_limit_price - current_price) / current_price
+                logger.info("Long entry check for %s: current=%.2f, limit=%.2f, gap=%.2f%%",
+                            market, current_price, proposed_limit_price, gap_ratio * 100)
+                if gap_ratio >= MIN_LIMIT_GAP:
+                    # Close short position at market (this is our "long" entry),
+                    # then open short limit halfway between middle and upper band
+                    place_entry(market, "close_short", "open_short", current_price, proposed_limit_price, open_trades)
+                else:
+                    logger.info("Skipping long entry for %s: gap %.2f%% < %d%%", market, gap_ratio * 100, MIN_LIMIT_GAP * 100)
+
+        # "Short" strategy: Open short at market when price touches upper band (overbought)
+        # Then close short limit halfway between middle band and lower band
+        if strategy in ["short", "both"]:
+            if current_price >= current_upper:
+                # Compute proposed limit price and ensure sufficient gap before entering
+                proposed_limit_price = current_middle - (current_middle - current_lower) / 2
+                gap_ratio = abs(proposed_limit_price - current_price) / current_price
+                logger.info("Short entry check for %s: current=%.2f, limit=%.2f, gap=%.2f%%",
+                            market, current_price, proposed_limit_price, gap_ratio * 100)
+                if gap_ratio >= MIN_LIMIT_GAP:
+                    # Open short position at market,
+                    # then close short limit halfway between middle and lower band
+                    place_entry(market, "open_short", "close_short", current_price, proposed_limit_price, open_trades)
+                else:
+                    logger.info("Skipping short entry for %s: gap %.2f%% < %d%%", market, gap_ratio * 100, MIN_LIMIT_GAP * 100)
+        return False
+
+    position_type = open_trades[market]['position_type']
+
+    # Exit conditions based on position type
+    if position_type == "open_short":
+        # Close short position when price reaches middle band (SMA)
+        return current_price <= current_middle
+    if position_type == "close_short":
+        # This represents a "long" position that was entered by closing a short
+        # Exit when price reaches middle band or upper band
+        return current_price >= current_middle or current_price >= current_upper
+    return False
 
 
-def enter_market_trade(market, position_type, price_data, open_trades):
-    
-    asset_latest_price = price_data[market].iloc[-1]
+# entries decided inside order_batch(), per thread
+_batch = threading.local()
 
-    asset_position_size = round(TRADE_SIZE / asset_latest_price, 2)
+
+def place_entry(market, position_type, limit_type, price, limit_price, open_trades):
+    """
+    Enter at market and rest the exit limit, after the portfolio risk check (risk.py).
+
+    Inside order_batch() the entry is queued and checked together with the
+    rest of the cycle's entries; otherwise it is checked on its own.
+    """
+    entry = (market, position_type, limit_type, price, limit_price)
+    entries = getattr(_batch, "entries", None)
+    if entries is not None:
+        entries.append(entry)
+    else:
+        submit_entries([entry], open_trades)
+
+
+@contextlib.contextmanager
+def order_batch(open_trades, validate_prices=False):
+    """
+    Queue the entries decided in the block and submit them together on exit.
+
+    One vectorised risk check covers the whole batch, so entries in many
+    markets at once are scaled against each other instead of each seeing
+    the portfolio without the others. With `validate_prices` the entry
+    prices are first checked against one ticker snapshot (submit_entries).
+    """
+    _batch.entries = []
+    try:
+        yield
+        entries = _batch.entries
+    finally:
+        _batch.entries = None
+    submit_entries(entries, open_trades, validate_prices)
+
+
+def validate_entry_prices(entries, snapshot=None):
+    """
+    Drop entries whose decision price has drifted more than MAX_PRICE_DRIFT from the live ticker.
+
+    All markets are priced by one ticker_snapshot request. Entries are kept
+    when the market has no ticker or the snapshot could not be refreshed.
+
+    Args:
+        entries: list of (market, position_type, limit_type, price, limit_price)
+        snapshot: TickerSnapshot, defaults to the shared ticker_snapshot
+
+    Returns:
+        list: the entries still worth placing
+    """
+    import numpy as np
+
+    if snapshot is None:
+        from ticker_snapshot import ticker_snapshot as snapshot
+
+    live = snapshot.prices([entry[0] for entry in entries])
+    if snapshot.age() > 2 * snapshot.ttl:
+        logger.warning("No fresh ticker snapshot, placing entries without a price check")
+        return entries
+    decided = np.array([entry[3] for entry in entries], dtype=float)
+    with np.errstate(invalid="ignore"):
+        drifted = np.abs(live / decided - 1) > MAX_PRICE_DRIFT
+    for i in np.flatnonzero(drifted):
+        logger.info("Skipping entry for %s: decided at %s, ticker now %s", entries[i][0], decided[i], live[i],
+                    extra={"event": "price_drift", "market": entries[i][0], "decided": float(decided[i]),
+                           "ticker": float(live[i])})
+    return [entry for entry, skip in zip(entries, drifted) if not skip]
+
+
+def submit_entries(entries, open_trades, validate_prices=False):
+    """
+    Risk-check entries as one batch and place the approved ones at their scaled size.
+
+    Args:
+        entries: list of (market, position_type, limit_type, price, limit_price)
+        open_trades: dict of open positions, updated in place on entry
+        validate_prices: drop entries whose price moved since the decision (validate_entry_prices)
+    """
+    if validate_prices and entries:
+        with span("price_check", orders=len(entries)):
+            entries = validate_entry_prices(entries)
+    if not entries:
+        return
+    # numpy comes in with risk.py; imported here so live_bollinger starts without it
+    from risk import POSITION_SIGN, get_risk_engine
+
+    risk = get_risk_engine()
+    risk.sync_open_trades(open_trades)
+    orders = [(market, POSITION_SIGN[position_type] * TRADE_SIZE / price, price)
+              for market, position_type, _, price, _ in entries]
+    with span("risk_check", orders=len(orders)):
+        scales = risk.check(orders, reserve=True)
+    try:
+        for (market, position_type, limit_type, price, limit_price), scale in zip(entries, scales):
+            if scale <= 0:
+                continue
+            notional = TRADE_SIZE * float(scale)
+            if scale < 1 and not contract_cache.quantize_size(market, notional / price, raise_to_min=False):
+                # a scaled size under the contract minimum would be placed at the minimum, past the limit
+                logger.info("Risk vetoed %s order: scaled size below the contract minimum", market,
+                            extra={"event": "risk", "market": market, "scale": float(scale), "limit": "min_size"})
+                continue
+            enter_market_trade(market, position_type, price, open_trades, notional)
+            enter_limit_trade(market, limit_type, price, limit_price, notional)
+    finally:
+        # the placed entries are in open_trades now, which the next sync reads
+        risk.release(orders, scales)
+
+
+def reconcile_open_trades(finished_orders, open_trades):
+    """
+    Drop open trades whose exit limit order has filled on the exchange.
+
+    Args:
+        finished_orders: orders returned by OrderTracker.sync()
+        open_trades: dict of open positions, updated in place
+    """
+    for order in finished_orders:
+        trade = open_trades.get(order['market'])
+        # the exit limit is always on the opposite side of the entry
+        if (trade is not None and order['status'] == 'filled' and order['orderType'] == 'limit'
+                and order['side'] != trade['position_type']):
+            logger.info("Exit limit filled for %s, closing tracked %s position", order['market'], trade['position_type'])
+            del open_trades[order['market']]
+
+
+def manage_trade(price_data_file):
+
+    # pandas is imported here rather than at module load; live_bollinger never needs it
+    import pandas as pd
+
+    if isinstance(price_data_file, pd.DataFrame):
+        # the daemon keeps prices in memory between cycles
+        price_data = price_data_file
+    else:
+        with span("csv_read"):
+            price_data = pd.read_csv(price_data_file)
+
+    # Bad rows are repaired and markets without fresh closes sit this cycle out (data_quality.py)
+    from data_quality import validate_prices
+
+    with span("validate"):
+        price_data, _ = validate_prices(price_data, now_ms=time.time() * 1000, quarantine=True)
+
+    open_trades_file = get_execution().open_trades_file
+    open_trades = load_open_trades(open_trades_file)
+
+    # One bulk reconciliation of the limit orders placed in earlier cycles
+    tracker = get_execution().order_tracker
+    if tracker is not None:
+        with span("order_sync"):
+            try:
+                reconcile_open_trades(tracker.sync(), open_trades)
+                tracker.cancel_stale(STALE_LIMIT_HOURS * 3600)
+            except BitgetAPIException as e:
+                logger.error("Order sync failed: %s", e.message)
+
+    # paper mode matches resting orders against the latest close before deciding
+    for market in TRADING_STRATEGIES.keys():
+        if market in price_data:
+            get_execution().on_price(market, price_data[market].iloc[-1])
+
+    # the risk engine values positions at the latest closes and sizes the
+    # volatility limit from the recent bar returns
+    markets = [m for m in TRADING_STRATEGIES.keys() if m in price_data]
+    if not markets:
+        # every market was quarantined (e.g. the CSV is stale); nothing to value or evaluate
+        logger.warning("No market has usable prices, skipping evaluation this cycle",
+                       extra={"event": "data_quality"})
+        save_open_trades(open_trades, open_trades_file)
+        return
+
+    from risk import get_risk_engine
+
+    risk = get_risk_engine()
+    risk.update_prices(price_data[markets].iloc[-1].to_dict())
+    risk.update_returns(price_data[markets].tail(RISK_RETURN_BARS + 1).pct_change().iloc[1:])
+
+    # Indicators are computed once for all configured strategies (constants.STRATEGIES);
+    # the Bollinger strategy trades on open_trades, exits drop out of it.
+    from strategy_engine import get_engine
+
+    engine = get_engine()
+    bollinger = engine.get("bollinger")
+    if bollinger is not None:
+        bollinger.positions = open_trades
+    # entries across all markets go through one price and risk check at the end of the run
+    with order_batch(open_trades, validate_prices=True):
+        engine.run(price_data)
+
+    save_open_trades(open_trades, open_trades_file)
+
+
+def check_intrabar(price_data, snapshot=None):
+    """
+    Re-apply the band rules to live ticker prices between candle closes.
+
+    Bands are those at the last row of `price_data`, computed for every
+    market at once; one ticker snapshot prices the whole universe. Only
+    markets whose live price is outside their bands, or that hold a
+    position, go through evaluate_market.
+
+    Args:
+        price_data: DataFrame of closes, as passed to manage_trade
+        snapshot: TickerSnapshot, defaults to the shared ticker_snapshot
+    """
+    import numpy as np
+
+    if snapshot is None:
+        from ticker_snapshot import ticker_snapshot as snapshot
+
+    markets = [m for m in TRADING_STRATEGIES.keys() if m in price_data]
+    closes = price_data[markets].tail(WINDOW).to_numpy(dtype=float)
+    middle = np.nanmean(closes, axis=0)
+    width = np.nanstd(closes, axis=0, ddof=1) * NUM_STD
+    upper, lower = middle + width, middle - width
+    live = snapshot.prices(markets)
+    prices = snapshot.as_dict(markets)
+    # paper mode matches resting orders against the live prices, as manage_trade does with closes
+    for market, price in prices.items():
+        get_execution().on_price(market, price)
+
+    open_trades_file = get_execution().open_trades_file
+    open_trades = load_open_trades(open_trades_file)
+    with np.errstate(invalid="ignore"):
+        outside = (live >= upper) | (live <= lower)
+    held = np.array([m in open_trades for m in markets], dtype=bool)
+    candidates = np.flatnonzero((outside | held) & ~np.isnan(live))
+    if not len(candidates):
+        return
+
+    from risk import get_risk_engine
+
+    get_risk_engine().update_prices(prices)
+    before = dict(open_trades)
+    # the decision prices are the snapshot itself, so no second price check
+    with order_batch(open_trades):
+        for i in candidates:
+            market = markets[i]
+            if evaluate_market(market, float(live[i]), upper[i], middle[i], lower[i], open_trades):
+                del open_trades[market]
+    if open_trades != before:
+        save_open_trades(open_trades, open_trades_file)
+
+
+def enter_market_trade(market, position_type, asset_latest_price, open_trades, notional=TRADE_SIZE):
+
+    # Size and price steps differ per contract (e.g. PEPEUSDT); see contracts.py
+    asset_position_size = contract_cache.quantize_size(market, notional / asset_latest_price)
     
     if position_type == "close_short":
-        print(f"Closing short position (long entry) on: {market}")
+        logger.info("Closing short position (long entry) on: %s", market)
         market_params = {
             "symbol": f"{market}_UMCBL",
             "marginCoin": "USDT",
             "side": "close_short",
             "orderType": "market",
-            "size": round(asset_position_size, 2),
+            "size": asset_position_size,
             "timeInForceValue": "normal"
         }
     elif position_type == "open_short":
-        print(f"Opening short position on: {market}")
+        logger.info("Opening short position on: %s", market)
         market_params = {
             "symbol": f"{market}_UMCBL",
             "marginCoin": "USDT",
             "side": "open_short",
             "orderType": "market",
-            "size": round(asset_position_size, 2),
+            "size": asset_position_size,
             "timeInForceValue": "normal"
         }
     
-    # Initialize the API and define the order logging file.
-    order_api = maxOrderApi.OrderApi(apiKey, secretKey, passphrase)
-    ORDER_FILE = "order_responses.json"
+    # Live or paper execution (TRADING_MODE) and its order logging file.
+    execution = get_execution()
+    ORDER_FILE = execution.order_file
     
     # Place the market order.
     try:
-        response_market = order_api.placeOrder(market_params)
-        print("Market order response:", response_market)
+        start = time.perf_counter()
+        with span("order_placement", market=market, side=market_params['side']):
+            response_market = execution.place_order(market_params)
+        log_order_event(market, market_params, response_market, (time.perf_counter() - start) * 1000)
         if response_market['code'] == '00000':
             log_order_response(response_market, ORDER_FILE)
+            if execution.order_tracker is not None:
+                execution.order_tracker.track(market, market_params, response_market)
         else:
-            print(f"Market order failed: {response_market['msg']}")
+            logger.error("Market order failed: %s", response_market['msg'])
     except BitgetAPIException as e:
-        print("Market order API exception:", e.message)
+        logger.error("Market order API exception: %s", e.message)
 
     open_trades[f"{market}"] = {
         "position_type": position_type,
@@ -184,51 +445,53 @@ def enter_market_trade(market, position_type, price_data, open_trades):
     }
 
 
-def enter_limit_trade(market, position_type, price_data, limit_price):
-
-    asset_latest_price = price_data[market].iloc[-1]
+def enter_limit_trade(market, position_type, asset_latest_price, limit_price, notional=TRADE_SIZE):
 
-    asset_position_size = round(TRADE_SIZE / asset_latest_price, 2)
+    # Size and price steps differ per contract (e.g. PEPEUSDT); see contracts.py
+    asset_position_size = contract_cache.quantize_size(market, notional / asset_latest_price)
     
-    # Round the limit price to 2 decimal places
-    rounded_limit_price = round(limit_price, 2)
+    # Round the limit price to the contract's tick size
+    rounded_limit_price = contract_cache.quantize_price(market, limit_price)
 
     if position_type == "open_short":
-        print(f"Opening short limit trade on: {market} at {rounded_limit_price}")
+        logger.info("Opening short limit trade on: %s at %s", market, rounded_limit_price)
         params = {
             "symbol": f"{market}_UMCBL",
             "marginCoin": "USDT",
             "side": "open_short",
             "orderType": "limit",
-            "size": round(asset_position_size, 2),
+            "size": asset_position_size,
             "price": rounded_limit_price,
             "timeInForceValue": "normal"
         }
 
     elif position_type == "close_short":
-        print(f"Closing short limit trade on: {market} at {rounded_limit_price}")
+        logger.info("Closing short limit trade on: %s at %s", market, rounded_limit_price)
         params = {
             "symbol": f"{market}_UMCBL",
             "marginCoin": "USDT",
             "side": "close_short",
             "orderType": "limit",
-            "size": round(asset_position_size, 2),
+            "size": asset_position_size,
             "price": rounded_limit_price,
             "timeInForceValue": "normal"
         }
 
-    # Execute the trades
-    order_api = maxOrderApi.OrderApi(apiKey, secretKey, passphrase)
+    # Execute the trades (live or paper, see TRADING_MODE)
+    execution = get_execution()
     # File to store order responses
-    ORDER_FILE = "order_responses.json"
+    ORDER_FILE = execution.order_file
     try:
-        response_base = order_api.placeOrder(params)
-        print(response_base)
+        start = time.perf_counter()
+        with span("order_placement", market=market, side=params['side']):
+            response_base = execution.place_order(params)
+        log_order_event(market, params, response_base, (time.perf_counter() - start) * 1000)
         # Check if the response is successful
         if response_base['code'] == '00000':
             log_order_response(response_base, ORDER_FILE)
+            if execution.order_tracker is not None:
+                execution.order_tracker.track(market, params, response_base)
         else:
-            error_message = f"Order failed: {response_base['msg']}"
-            print(error_message)
+            logger.error("Order failed: %s", response_base['msg'])
     except BitgetAPIException as e:
-        print("error:" + e.message)
\ No newline at end of file
+        logger.error("error: %s", e.message)
\ No newline at end of file
@@ -1,41 +1,74 @@
-import pandas as pd
+import logging
+import sys
 
+from logging_config import setup_logging
+from profiler import profiler, span
 from market_data import get_unix_times, fetch_and_compile_candle_data
 from bollinger import manage_trade
 from constants import TRADING_STRATEGIES
+from bitget.client import Client
+from bitget.metrics import MetricsRegistry, InProcessExporter
 
+# Credentials are read and API clients built on first use (market_data.get_base_api,
+# execution.get_execution), so startup only pays for what the cycle touches.
 
-from bitget.bitget_api import BitgetApi
-from decouple import config
+logger = logging.getLogger("bollinger_15m")
 
-'''Create instance of Api'''
 
+def run_cycle(fetch=None):
+    """
+    Fetch market data and run the Bollinger strategy once.
 
-apiKey = config('apiKey')
-secretKey = config('secretKey')
-passphrase = config('passphrase')
+    Args:
+        fetch: callable returning this cycle's prices (DataFrame or CSV path);
+            by default the full history is refetched into data_15m.csv
+    """
+    # Get market prices and create a .csv for selected markets
+    prices = 'data_15m.csv'
+    try:
+        # Get markets from TRADING_STRATEGIES keys
+        markets = list(TRADING_STRATEGIES.keys())
+        with span("fetch_all"):
+            if fetch is None:
+                # Create dictionary for requesting market data
+                fetch_and_compile_candle_data(get_unix_times(3), markets, '15m')
+            else:
+                prices = fetch()
+        logger.info("Market data fetched for: %s", markets)
+    except Exception:
+        # data_15m.csv (or the daemon's frame) still holds the previous bar, and its close was already traded
+        logger.exception("Error fetching market data, skipping this cycle")
+        return
 
+    # Execute the Bollinger Bands trading strategy
+    try:
+        with span("manage_trade"):
+            manage_trade(prices)
+        logger.info("Trading strategy executed successfully")
+    except Exception:
+        logger.exception("Error executing trading strategy")
 
-baseApi = BitgetApi(apiKey, secretKey, passphrase)
 
+def main():
+    setup_logging()
 
+    # Collect per-endpoint REST timings for this cycle
+    metrics = MetricsRegistry()
+    Client.set_metrics(metrics)
 
+    # Stage profiling: BOT_PROFILE=1 or --profile
+    if "--profile" in sys.argv:
+        profiler.enable()
 
-# Create dictionary for requesting market data
-times_dict = get_unix_times(3)
+    run_cycle()
 
-# Get market prices and create a .csv for selected markets
-try:
-    # Get markets from TRADING_STRATEGIES keys
-    markets = list(TRADING_STRATEGIES.keys())
-    fetch_and_compile_candle_data(times_dict, markets, '15m')
-    print(f"Market data fetched for: {markets}")
-except Exception as e:
-    print(f"Error fetching market data: {e}")
+    trace_file = profiler.write(prefix="bollinger_15m")
+    if trace_file:
+        logger.info("Stage profile written to %s:\n%s", trace_file, profiler.format_summary())
 
-# Execute the Bollinger Bands trading strategy
-try:
-    manage_trade('data_15m.csv')
-    print("Trading strategy executed successfully")
-except Exception as e:
-    print(f"Error executing trading strategy: {e}")
\ No newline at end of file
+    logger.info("Cycle REST timing summary:\n%s", InProcessExporter(metrics).summary(),
+                extra={"event": "cycle_metrics", "metrics": InProcessExporter(metrics).export()})
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,23 @@ TRADE_SIZE = 200
 WINDOW = 200  # Rolling window for Bollinger Bands calculation
 NUM_STD = 2  # Number of standard deviations for Bollinger Bands
 MIN_LIMIT_GAP = 0.03  # Minimum required gap (3%) between current price and limit price
+STALE_LIMIT_HOURS = 72  # Cancel exit limit orders still resting after this long
+MAX_PRICE_DRIFT = 0.01  # Skip entries whose decision price is further than this (1%) from the live ticker
+INTRABAR_CHECK_SECONDS = None  # daemon.py re-checks bands on live tickers this often between closes; None = closes only
+RISK_RETURN_BARS = 500  # Bars of returns behind the risk engine's covariance
+
+# Portfolio limits checked before every entry (risk.py); notionals in USDT, None disables a limit.
+# Entries are scaled down to fit and vetoed below min_scale of TRADE_SIZE.
+RISK_LIMITS = {
+    "max_asset_notional": 2 * TRADE_SIZE,  # per market
+    "max_gross_notional": 12 * TRADE_SIZE,  # longs plus shorts
+    "max_net_notional": 6 * TRADE_SIZE,  # longs minus shorts, either way
+    "leverage": 5,
+    "margin_balance": 1000,  # USDT margin the estimate is compared to
+    "max_margin_use": 0.6,
+    "max_volatility": None,  # one-sigma portfolio move per bar, USDT
+    "min_scale": 0.25,
+}
 
 # Strategy preferences for each asset: "long", "short", or "both"
 TRADING_STRATEGIES = {
@@ -21,4 +38,11 @@ TRADING_STRATEGIES = {
     "UNIUSDT": "short",
     "SUIUSDT": "both",
     "DOGEUSDT": "short"
-}
\ No newline at end of file
+}
+
+# Strategies run by strategy_engine each cycle: name -> parameters ("type" defaults to the name).
+# "bollinger" trades; "slope_momentum" and "ema_sma" only log their signals, e.g.
+# "slope_50": {"type": "slope_momentum", "window": 50, "entry_threshold": 0.1, "exit_threshold": 0.0}
+STRATEGIES = {
+    "bollinger": {"window": WINDOW, "num_std": NUM_STD},
+}
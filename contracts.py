@@ -0,0 +1,147 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_TYPE = "USDT-FUTURES"
+
+
+def floor_significant(value, digits):
+    """`value` rounded toward zero to `digits` significant digits."""
+    if value <= 0:
+        return 0.0
+    places = digits - 1 - math.floor(math.log10(value))
+    return round(math.floor(value * 10 ** places + 1e-9) / 10 ** places, max(places, 0))
+
+
+class ContractSpec:
+    """Precision rules for one contract, from /api/v2/mix/market/contracts."""
+
+    __slots__ = ("symbol", "price_place", "price_end_step", "volume_place", "size_multiplier", "min_size",
+                 "tick", "size_step")
+
+    def __init__(self, symbol, price_place, price_end_step, volume_place, size_multiplier, min_size):
+        self.symbol = symbol
+        self.price_place = int(price_place)
+        self.price_end_step = int(price_end_step)
+        self.volume_place = int(volume_place)
+        self.size_multiplier = float(size_multiplier)
+        self.min_size = float(min_size)
+        self.tick = self.price_end_step * 10 ** -self.price_place
+        self.size_step = max(self.size_multiplier, 10 ** -self.volume_place)
+
+    @classmethod
+    def from_api(cls, row):
+        return cls(row["symbol"], row["pricePlace"], row.get("priceEndStep") or 1, row["volumePlace"],
+                   row.get("sizeMultiplier") or 10 ** -int(row["volumePlace"]), row.get("minTradeNum") or 0)
+
+    def to_dict(self):
+        return {"symbol": self.symbol, "pricePlace": self.price_place, "priceEndStep": self.price_end_step,
+                "volumePlace": self.volume_place, "sizeMultiplier": self.size_multiplier,
+                "minTradeNum": self.min_size}
+
+    def quantize_price(self, price):
+        return round(round(price / self.tick) * self.tick, self.price_place)
+
+    def quantize_size(self, size, raise_to_min=True):
+        # round down so the notional never exceeds what was asked for, but stay above the exchange minimum
+        steps = math.floor(size / self.size_step + 1e-9)
+        quantized = round(steps * self.size_step, self.volume_place)
+        if quantized < self.min_size and not raise_to_min:
+            # sizes cut down on purpose (risk scaling) must not grow back to the minimum
+            return 0.0
+        return max(quantized, self.min_size)
+
+
+class ContractCache:
+    """
+    Contract specs for every USDT-M symbol, persisted to `file_path`.
+
+    The first lookup loads the file, or fetches from MarketApi.contracts when
+    the file is missing or older than `ttl` seconds. After that a lookup is
+    a dict get. If a refresh fails, the stale file is used when there is
+    one. Symbols without a spec fall back to five significant digits for
+    price and four for size.
+    """
+
+    def __init__(self, file_path="contracts.json", ttl=24 * 3600, market_api=None):
+        self.file_path = file_path
+        self.ttl = ttl
+        self.market_api = market_api
+        self.fetched_at = 0
+        self.specs = {}
+        self.__loaded = False
+        self.__lock = threading.Lock()
+
+    def get(self, symbol):
+        if not self.__loaded or time.time() - self.fetched_at > self.ttl:
+            self.__ensure_fresh()
+        return self.specs.get(symbol.split("_")[0])
+
+    def quantize_price(self, symbol, price):
+        spec = self.get(symbol)
+        if spec is None:
+            return float("%.5g" % price)
+        return spec.quantize_price(price)
+
+    def quantize_size(self, symbol, size, raise_to_min=True):
+        """
+        Size rounded down to the step; under the minimum it becomes the minimum, or 0 if not raise_to_min.
+
+        Without a spec the size is rounded down to four significant digits.
+        The minimum is unknown then, so a size that must not be raised to it
+        (raise_to_min=False) cannot be shown to clear it and comes back as 0.
+        """
+        spec = self.get(symbol)
+        if spec is None:
+            if not raise_to_min:
+                return 0.0
+            return floor_significant(size, 4)
+        return spec.quantize_size(size, raise_to_min)
+
+    def __ensure_fresh(self):
+        with self.__lock:
+            if not self.__loaded:
+                self.__loaded = True
+                self.load()
+            if time.time() - self.fetched_at > self.ttl:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    # keep trading on stale specs; retry after another ttl/10
+                    logger.warning("Contract refresh failed, using %d cached specs: %s", len(self.specs), e)
+                    self.fetched_at = time.time() - self.ttl * 0.9
+
+    def refresh(self):
+        if self.market_api is None:
+            from decouple import config
+            from bitget.v2.mix.market_api import MarketApi
+
+            self.market_api = MarketApi(config('apiKey'), config('secretKey'), config('passphrase'))
+        response = self.market_api.contracts({"productType": PRODUCT_TYPE})
+        self.specs = {row["symbol"]: ContractSpec.from_api(row) for row in response["data"]}
+        self.fetched_at = time.time()
+        self.save()
+        logger.info("Contract specs refreshed: %d symbols", len(self.specs))
+
+    def load(self):
+        try:
+            with open(self.file_path) as f:
+                cached = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        self.specs = {row["symbol"]: ContractSpec.from_api(row) for row in cached["contracts"]}
+        self.fetched_at = cached["fetched_at"]
+
+    def save(self):
+        tmp = self.file_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"fetched_at": self.fetched_at, "contracts": [s.to_dict() for s in self.specs.values()]}, f)
+        os.replace(tmp, self.file_path)
+
+
+contract_cache = ContractCache()
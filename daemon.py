@@ -0,0 +1,206 @@
+"""
+Long-running entry point: runs the 15m Bollinger cycle on every candle close.
+
+    python daemon.py [--profile]
+
+Unlike launching bollinger_15m.py from cron, clients, contract specs,
+order state and the price history stay in memory between cycles, so each
+cycle only fetches the bars that closed since the last one. With
+INTRABAR_CHECK_SECONDS set, the bands are also re-checked between closes
+against one bulk ticker request (ticker_snapshot.py). The daily S3
+jobs (order_fills.main, account.main) run on background threads.
+SIGINT/SIGTERM finish the running cycle, persist state and exit.
+"""
+import logging
+import signal
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from logging_config import setup_logging
+from profiler import profiler, span
+from constants import TRADING_STRATEGIES, INTRABAR_CHECK_SECONDS
+from bitget.client import Client
+from bitget.clock import ClockSync
+from bitget.metrics import MetricsRegistry, InProcessExporter
+
+logger = logging.getLogger("daemon")
+
+BAR_MS = 15 * 60 * 1000
+
+
+class BotDaemon:
+    """
+    Schedules the strategy cycle on candle closes and the daily jobs once a day.
+
+    Args:
+        close_delay: seconds to wait after a candle closes before fetching it
+        daily_at: UTC "HH:MM" at which the daily jobs start
+        daily_jobs: {name: callable}; defaults to order_fills.main and account.main
+        max_sleep: longest single sleep; the schedule is re-checked against
+            the server clock after each one, which corrects drift and suspends
+        clock_interval: seconds between background server clock syncs
+        intrabar_seconds: seconds between intra-bar band checks on a ticker
+            snapshot (bollinger.check_intrabar); None only runs on closes
+    """
+
+    def __init__(self, close_delay=5, daily_at="00:05", daily_jobs=None, max_sleep=60, clock_interval=300,
+                 intrabar_seconds=INTRABAR_CHECK_SECONDS):
+        self.close_delay = close_delay
+        self.daily_at = daily_at
+        self.daily_jobs = daily_jobs if daily_jobs is not None else {
+            "order_fills": _job("order_fills"), "account": _job("account")}
+        self.max_sleep = max_sleep
+        self.intrabar_seconds = intrabar_seconds
+        self.metrics = MetricsRegistry()
+        self.prices = None
+        self.last_daily = None
+        self.clock = ClockSync(interval=clock_interval)
+        self.__stop = threading.Event()
+        self.__jobs = {}
+
+    # clock
+
+    def server_now_ms(self):
+        return self.clock.now_ms()
+
+    def next_close_ms(self, now_ms):
+        return (now_ms // BAR_MS + 1) * BAR_MS
+
+    # run loop
+
+    def run(self):
+        Client.set_metrics(self.metrics)
+        # the same cached offset schedules cycles and signs every request
+        Client.set_clock(self.clock.start())
+        if self.__utc_now().strftime("%H:%M") >= self.daily_at:
+            # today's jobs already ran under the previous process or cron
+            self.last_daily = self.__utc_now().date()
+        logger.info("Daemon started, server offset %d ms", self.clock.offset_ms)
+        while not self.__stop.is_set():
+            target = self.next_close_ms(self.server_now_ms()) + self.close_delay * 1000
+            if not self.wait_for_close(target):
+                break
+            self.run_cycle()
+            self.maybe_run_daily()
+        self.shutdown()
+
+    def sleep_until(self, target_ms):
+        """Sleep in slices until server time reaches `target_ms`; False if stopped first."""
+        while not self.__stop.is_set():
+            remaining = target_ms - self.server_now_ms()
+            if remaining <= 0:
+                return True
+            self.__stop.wait(min(remaining / 1000, self.max_sleep))
+        return False
+
+    def wait_for_close(self, target_ms):
+        """sleep_until(target_ms), running an intra-bar check every intrabar_seconds on the way."""
+        while self.intrabar_seconds and self.prices is not None:
+            next_check = self.server_now_ms() + self.intrabar_seconds * 1000
+            if next_check >= target_ms:
+                break
+            if not self.sleep_until(next_check):
+                return False
+            self.run_intrabar()
+        return self.sleep_until(target_ms)
+
+    def run_intrabar(self):
+        from bollinger import check_intrabar
+
+        try:
+            with span("intrabar"):
+                check_intrabar(self.prices)
+        except Exception:
+            logger.exception("Intra-bar check failed")
+
+    def run_cycle(self):
+        from bollinger_15m import run_cycle
+        from market_data import update_candle_data
+
+        def fetch():
+            # the bar that just opened is the newest row, as in the full fetch
+            end_time = self.next_close_ms(self.server_now_ms()) - BAR_MS
+            self.prices = update_candle_data(self.prices, list(TRADING_STRATEGIES.keys()), '15m', end_time)
+            return self.prices
+
+        start = time.perf_counter()
+        with span("cycle"):
+            run_cycle(fetch)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logger.info("Cycle finished in %.0f ms", elapsed_ms,
+                    extra={"event": "cycle", "elapsed_ms": round(elapsed_ms, 3), "offset_ms": self.clock.offset_ms,
+                           "metrics": InProcessExporter(self.metrics).export()})
+        self.metrics.reset()
+
+    def __utc_now(self):
+        return datetime.fromtimestamp(self.server_now_ms() / 1000, tz=timezone.utc)
+
+    def maybe_run_daily(self):
+        now = self.__utc_now()
+        if now.strftime("%H:%M") < self.daily_at or self.last_daily == now.date():
+            return
+        self.last_daily = now.date()
+        for name, job in self.daily_jobs.items():
+            running = self.__jobs.get(name)
+            if running is not None and running.is_alive():
+                logger.warning("Daily job %s still running, skipping", name)
+                continue
+            thread = threading.Thread(target=self.__run_job, args=(name, job), name=f"daily-{name}", daemon=True)
+            self.__jobs[name] = thread
+            thread.start()
+
+    def __run_job(self, name, job):
+        start = time.perf_counter()
+        try:
+            job()
+            logger.info("Daily job %s finished in %.1fs", name, time.perf_counter() - start)
+        except Exception:
+            logger.exception("Daily job %s failed", name)
+
+    # shutdown
+
+    def stop(self, *args):
+        logger.info("Stop requested, finishing current work")
+        self.__stop.set()
+
+    def shutdown(self, job_timeout=60):
+        self.clock.stop()
+        for name, thread in self.__jobs.items():
+            if thread.is_alive():
+                logger.info("Waiting for daily job %s", name)
+                thread.join(job_timeout)
+        # open_trades are written every cycle; flush the execution-side state too
+        from execution import current_execution
+
+        execution = current_execution()
+        if execution is not None:
+            for state in (execution, execution.order_tracker):
+                if state is not None and hasattr(state, "save"):
+                    state.save()
+        trace_file = profiler.write(prefix="daemon")
+        if trace_file:
+            logger.info("Stage profile written to %s:\n%s", trace_file, profiler.format_summary())
+        logger.info("Daemon stopped")
+
+
+def _job(module_name):
+    def run():
+        module = __import__(module_name)
+        module.main()
+    return run
+
+
+def main():
+    setup_logging()
+    if "--profile" in sys.argv:
+        profiler.enable()
+    daemon = BotDaemon()
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    daemon.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Validation stage for close-price frames (the data_15m.csv layout: a 'time'
+column, or a time index, and one close column per market).
+
+    python data_quality.py data_15m.csv [--granularity 15m] [--now] [--output repaired.csv]
+
+Every ingest runs validate_prices(): the candle fetches in market_data.py
+before writing their CSV, manage_trade before deciding, and the
+backtester and sweep loaders. It returns a repaired frame and a
+QualityReport. Checks and repairs, all vectorised over the whole frame:
+
+- closes coerced to float; strings that do not parse and non-positive
+  prices become missing
+- rows sorted by time; duplicate timestamps (overlapping fetch ranges)
+  merged, keeping the newest value per market; rows off the bar grid dropped
+- missing bars reinserted on the grid, short gaps carried forward from
+  the previous close
+- one-bar spikes (a jump beyond max_return straight back) replaced;
+  single large moves are only reported
+- per-market freshness: a market whose last close is older than
+  stale_bars, or whose close (or volume) has not moved for stale_bars,
+  is stale and, with quarantine=True, dropped from the frame
+"""
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+
+from resample import BUCKET_OFFSET_MS, GRANULARITY_MS
+
+logger = logging.getLogger(__name__)
+
+MAX_RETURN = 0.25  # log return per bar beyond which a bar that reverts straight back is a spike
+FILL_BARS = 3  # longest run of missing closes carried forward
+STALE_BARS = 8  # bars without a new (or changing) close before a market is stale
+
+
+class QualityReport:
+    """
+    What validate_prices found and changed in one frame.
+
+    Counts per market are {market: n} dicts holding only non-zero entries;
+    `gaps` lists (first missing bar time, bars missing) for the largest gaps.
+    """
+
+    def __init__(self, granularity, rows):
+        self.granularity = granularity
+        self.rows = rows
+        self.rows_out = rows
+        self.bad_times = 0
+        self.misaligned = 0
+        self.unsorted = False
+        self.duplicates = 0
+        self.missing_bars = 0
+        self.gaps = []
+        self.coerced = {}
+        self.non_positive = {}
+        self.spikes = {}
+        self.jumps = {}
+        self.filled = {}
+        self.zero_volume = {}
+        self.stale = {}
+        self.flat = []
+        self.quarantined = []
+        self.elapsed_ms = 0.0
+
+    @property
+    def ok(self):
+        """True when nothing had to be repaired or flagged."""
+        return not any(value for key, value in self.to_dict().items()
+                       if key not in ("granularity", "rows", "rows_out", "elapsed_ms"))
+
+    def to_dict(self):
+        return {key: value for key, value in vars(self).items() if value or key in ("rows", "rows_out")}
+
+    def summary(self):
+        issues = []
+        for key in ("bad_times", "misaligned", "duplicates", "missing_bars"):
+            if getattr(self, key):
+                issues.append(f"{getattr(self, key)} {key.replace('_', ' ')}")
+        for key in ("coerced", "non_positive", "spikes", "jumps", "filled", "zero_volume"):
+            counts = getattr(self, key)
+            if counts:
+                issues.append(f"{sum(counts.values())} {key.replace('_', ' ')} in {len(counts)} markets")
+        if self.stale:
+            issues.append("stale: " + ", ".join(f"{m} ({bars} bars)" for m, bars in self.stale.items()))
+        if self.flat:
+            issues.append("flat: " + ", ".join(self.flat))
+        if self.quarantined:
+            issues.append("quarantined: " + ", ".join(self.quarantined))
+        return "; ".join(issues) or "clean"
+
+
+def _counts(markets, counts):
+    return {m: int(n) for m, n in zip(markets, counts) if n}
+
+
+def _place(values, slots, length, duplicates):
+    """Rows of `values` at their grid slots, NaN elsewhere; on duplicate slots the last value present wins."""
+    import pandas as pd
+
+    grid = np.full((length, values.shape[1]), np.nan)
+    if duplicates:
+        merged = pd.DataFrame(values).groupby(slots, sort=True).last()
+        grid[merged.index.to_numpy()] = merged.to_numpy()
+    else:
+        grid[slots] = values
+    return grid
+
+
+def _to_ms(values):
+    """Epoch milliseconds (NaN for unparseable) and whether the input was text."""
+    import pandas as pd
+
+    values = pd.Series(np.asarray(values))
+    text = values.dtype == object
+    if np.issubdtype(values.dtype, np.number):
+        parsed = pd.to_datetime(values, unit="ms", errors="coerce")
+    else:
+        parsed = pd.to_datetime(values, errors="coerce", format="ISO8601")
+    ms = parsed.to_numpy(dtype="datetime64[ms]").astype(np.int64).astype(np.float64)
+    ms[parsed.isna().to_numpy()] = np.nan
+    return ms, text
+
+
+def _from_ms(ms, text):
+    stamps = ms.astype(np.int64).astype("datetime64[ms]")
+    if not text:
+        return stamps.astype("datetime64[ns]")
+    # the "YYYY-MM-DD HH:MM:SS" strings market_data writes
+    return np.char.replace(np.datetime_as_string(stamps.astype("datetime64[s]")), "T", " ").astype(object)
+
+
+def validate_prices(price_data, granularity="15m", now_ms=None, volumes=None, max_return=MAX_RETURN,
+                    fill_bars=FILL_BARS, stale_bars=STALE_BARS, quarantine=False):
+    """
+    Check and repair a close-price frame.
+
+    Args:
+        price_data: DataFrame, closes per market with a 'time' column or time index
+        granularity: bar size as in resample.GRANULARITY_MS, or None to infer it from the times
+        now_ms: current time in Unix milliseconds; freshness is measured from
+            here instead of from the newest row
+        volumes: optional DataFrame of bar volumes with the same rows and columns
+        max_return: absolute log return per bar for the spike check
+        fill_bars: longest run of missing closes to carry forward
+        stale_bars: bars without a new or changing close before a market is stale
+        quarantine: drop stale markets from the returned frame
+
+    Returns:
+        tuple: (repaired DataFrame in the input's layout, QualityReport)
+    """
+    import pandas as pd
+
+    start = time.perf_counter()
+    report = QualityReport(granularity, len(price_data))
+    markets = [c for c in price_data.columns if c != 'time']
+    time_column = 'time' in price_data.columns
+    timed = time_column or not isinstance(price_data.index, pd.RangeIndex)
+
+    # values: numeric columns are taken as they are, text is parsed
+    frame = price_data[markets]
+    text_columns = [i for i, dtype in enumerate(frame.dtypes) if not pd.api.types.is_numeric_dtype(dtype)]
+    if not text_columns:
+        values = frame.to_numpy(dtype=np.float64, copy=True)
+    else:
+        values = np.empty(frame.shape)
+        numeric = np.setdiff1d(np.arange(len(markets)), text_columns)
+        if len(numeric):
+            values[:, numeric] = frame.iloc[:, numeric].to_numpy(dtype=np.float64)
+        raw = frame.iloc[:, text_columns]
+        try:
+            # numpy parses a block of well-formed number strings in one call
+            values[:, text_columns] = raw.to_numpy(dtype=np.float64)
+        except (TypeError, ValueError):
+            parsed = raw.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+            bad = np.isnan(parsed) & raw.notna().to_numpy() & (raw != "").to_numpy()
+            report.coerced = _counts(raw.columns, bad.sum(axis=0))
+            values[:, text_columns] = parsed
+    with np.errstate(invalid="ignore"):
+        non_positive = values <= 0
+    report.non_positive = _counts(markets, non_positive.sum(axis=0))
+    values[non_positive] = np.nan
+    volume = None if volumes is None else volumes[markets].apply(pd.to_numeric, errors="coerce").to_numpy(
+        dtype=np.float64)
+
+    if timed:
+        ms, text = _to_ms(price_data['time'] if time_column else price_data.index)
+        keep = ~np.isnan(ms)
+        report.bad_times = int((~keep).sum())
+        if granularity is None:
+            steps = np.diff(np.unique(ms[keep]))
+            bar_ms = int(np.median(steps)) if len(steps) else GRANULARITY_MS["15m"]
+            # 6H and longer come on the UTC+8 grid or, as the *utc granularities, on the UTC one
+            known = ms[keep]
+            report.granularity = max((g for g, size in GRANULARITY_MS.items() if size == bar_ms),
+                                     key=lambda g: np.count_nonzero((known + BUCKET_OFFSET_MS.get(g, 0)) % bar_ms == 0),
+                                     default=f"{bar_ms // 1000}s")
+        else:
+            bar_ms = GRANULARITY_MS[granularity]
+        offset_ms = BUCKET_OFFSET_MS.get(report.granularity, 0)
+        aligned = keep.copy()
+        aligned[keep] = (ms[keep] + offset_ms) % bar_ms == 0
+        report.misaligned = int(keep.sum() - aligned.sum())
+        rows = np.flatnonzero(aligned)
+        ms = ms[rows]
+        report.unsorted = bool((np.diff(ms) < 0).any())
+
+        # place every row on the bar grid; duplicates land on the same slot and the
+        # later row (the newer fetch) wins wherever it has a value
+        if len(ms):
+            first = ms.min()
+            slots = ((ms - first) // bar_ms).astype(np.intp)
+            length = int(slots.max()) + 1
+        else:
+            first, slots, length = 0.0, np.zeros(0, dtype=np.intp), 0
+        report.duplicates = int(len(slots) - len(np.unique(slots)))
+        values = _place(values[rows], slots, length, report.duplicates)
+        if volume is not None:
+            volume = _place(volume[rows], slots, length, report.duplicates)
+        occupied = np.zeros(length, dtype=bool)
+        occupied[slots] = True
+        report.missing_bars = int(length - occupied.sum())
+        if report.missing_bars:
+            edges = np.diff(np.concatenate([[0], (~occupied).astype(np.int8), [0]]))
+            starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+            largest = np.argsort(ends - starts, kind="stable")[::-1][:10]
+            report.gaps = [(str(np.datetime64(int(first + starts[i] * bar_ms), "ms")), int(ends[i] - starts[i]))
+                           for i in sorted(largest)]
+        times = first + np.arange(length) * bar_ms
+    else:
+        bar_ms, times, text = None, None, False
+
+    # spikes: a jump beyond max_return that reverts on the next bar
+    observed = ~np.isnan(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        logs = np.log(values)
+        moves = np.diff(logs, axis=0)
+    big = np.abs(moves) > max_return
+    spikes = np.zeros(values.shape, dtype=bool)
+    spikes[1:-1] = big[:-1] & big[1:] & (np.sign(moves[:-1]) != np.sign(moves[1:]))
+    spike_moves = np.zeros(big.shape, dtype=bool)
+    spike_moves[:-1] |= spikes[1:-1]
+    spike_moves[1:] |= spikes[1:-1]
+    report.spikes = _counts(markets, spikes.sum(axis=0))
+    report.jumps = _counts(markets, (big & ~spike_moves).sum(axis=0))
+    values[spikes] = np.nan
+    observed &= ~spikes
+
+    # freshness, measured on observed closes before anything is carried forward
+    last = np.where(observed.any(axis=0), len(values) - 1 - observed[::-1].argmax(axis=0), -1)
+    if times is not None and len(times):
+        reference = times[-1] if now_ms is None else max(float(now_ms), times[-1])
+        age = np.where(last >= 0, (reference - times[np.maximum(last, 0)]) // bar_ms, len(times))
+    else:
+        age = np.where(last >= 0, len(values) - 1 - last, len(values))
+    report.stale = {m: int(a) for m, a in zip(markets, age) if a > stale_bars}
+    tail = values[-(stale_bars + 1):]
+    flat = (tail == tail[-1]).all(axis=0) if len(values) > stale_bars else np.zeros(len(markets), dtype=bool)
+    if volume is not None:
+        report.zero_volume = _counts(markets, (volume == 0).sum(axis=0))
+        if len(volume) > stale_bars:
+            flat |= (volume[-(stale_bars + 1):] == 0).all(axis=0)
+    report.flat = [m for m, f in zip(markets, flat) if f and m not in report.stale]
+
+    # repair: carry short runs of missing closes forward
+    filled = pd.DataFrame(values).ffill(limit=fill_bars).to_numpy() if fill_bars else values
+    report.filled = _counts(markets, (~np.isnan(filled) & np.isnan(values)).sum(axis=0))
+
+    result = pd.DataFrame(filled, columns=markets)
+    if times is not None:
+        # rows that came through unchanged keep their original time values
+        unchanged = len(times) == len(price_data) and not (report.bad_times or report.misaligned or report.unsorted
+                                                           or report.duplicates or report.missing_bars)
+        original = price_data['time'] if time_column else price_data.index
+        stamps = original.to_numpy() if unchanged else _from_ms(times, text)
+        if time_column:
+            result.insert(0, 'time', stamps)
+        else:
+            result.index = pd.Index(stamps, name=price_data.index.name)
+    elif not time_column:
+        result.index = price_data.index
+    if quarantine:
+        report.quarantined = list(report.stale) + report.flat
+        if report.quarantined:
+            result = result.drop(columns=report.quarantined)
+    report.rows_out = len(result)
+    report.elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+
+    if report.ok:
+        logger.debug("Price data clean: %d rows, %d markets", len(result), len(markets))
+    else:
+        logger.warning("Price data repaired: %s", report.summary(),
+                       extra={"event": "data_quality", "report": report.to_dict()})
+    return result, report
+
+
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Validate a close-price CSV and print the report.")
+    parser.add_argument("data", help="close-only price CSV, data_15m.csv layout")
+    parser.add_argument("--granularity", default="15m", help="bar size, or 'auto' to infer it")
+    parser.add_argument("--now", action="store_true", help="measure freshness from the current time")
+    parser.add_argument("--output", help="write the repaired frame here")
+    args = parser.parse_args(argv)
+
+    granularity = None if args.granularity == "auto" else args.granularity
+    repaired, report = validate_prices(pd.read_csv(args.data), granularity,
+                                       now_ms=time.time() * 1000 if args.now else None)
+    if args.output:
+        repaired.to_csv(args.output, index=False)
+    print(json.dumps(report.to_dict(), indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import bisect
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# order sides that buy the contract; everything else sells
+BUY_SIDES = ("buy", "open_long", "close_short")
+
+
+def _market(symbol):
+    # v1 order params use the ETHUSDT_UMCBL form
+    return symbol.split("_")[0]
+
+
+class LiveExecution:
+    """Sends orders to Bitget through the v1 OrderApi."""
+
+    order_file = "order_responses.json"
+    open_trades_file = "open_trades.json"
+
+    def __init__(self, api_key, api_secret_key, passphrase):
+        import bitget.v1.mix.order_api as maxOrderApi
+        from bitget.v2.mix.order_api import OrderApi
+        from order_tracker import OrderTracker
+
+        self.order_api = maxOrderApi.OrderApi(api_key, api_secret_key, passphrase)
+        self.order_tracker = OrderTracker(OrderApi(api_key, api_secret_key, passphrase))
+
+    def place_order(self, params):
+        return self.order_api.placeOrder(params)
+
+    def on_price(self, market, price, ts=None):
+        pass
+
+    def on_candle(self, market, high, low, close, ts=None):
+        pass
+
+
+class PaperExecution:
+    """
+    Simulated matching engine behind the same place_order() interface as LiveExecution.
+
+    Market orders fill at the last price seen for the symbol, moved against
+    us by `slippage`, and pay `taker_fee`. Limit orders rest per symbol in
+    price-sorted books and fill at their limit price, paying `maker_fee`,
+    once a price or candle range crosses them. Prices arrive through
+    on_price() (ticks, or closes in the 15m batch job) and on_candle()
+    (high/low of live candles).
+
+    Matching only touches the best resting order on each side of the
+    symbol, so a price update costs a dict lookup when nothing is resting
+    and O(log n + fills) otherwise; the live feed can push ticks for
+    hundreds of symbols without falling behind.
+
+    Positions, balance and resting orders persist to `state_file` after
+    every change so 15m cron runs carry on from the previous cycle.
+    Accepted orders return the exchange's response shape, so
+    log_order_response writes the same journal, to `order_file`. The
+    bot's own position list goes to `open_trades_file`, so a paper run
+    never reads or overwrites the live open_trades.json.
+    """
+
+    # paper orders never reach the exchange, so there is nothing to reconcile
+    order_tracker = None
+
+    def __init__(self, initial_balance=10000.0, taker_fee=0.0006, maker_fee=0.0002, slippage=0.0005,
+                 state_file="paper_state.json", order_file="paper_order_responses.json",
+                 open_trades_file="paper_open_trades.json"):
+        self.taker_fee = taker_fee
+        self.maker_fee = maker_fee
+        self.slippage = slippage
+        self.state_file = state_file
+        self.order_file = order_file
+        self.open_trades_file = open_trades_file
+        self.balance = initial_balance
+        self.positions = {}
+        self.last_price = {}
+        self.fills = 0
+        # market -> sorted [(price, order_id)]; buys fill on a drop to price, sells on a rise
+        self.__buys = {}
+        self.__sells = {}
+        self.__orders = {}
+        self.__ids = itertools.count(int(time.time() * 1000))
+        self.__lock = threading.Lock()
+        if state_file:
+            self.load()
+
+    def place_order(self, params):
+        market = _market(params["symbol"])
+        with self.__lock:
+            order_id = str(next(self.__ids))
+            client_oid = params.get("clientOid") or order_id
+            if params["orderType"] == "market":
+                price = self.last_price.get(market)
+                if price is None:
+                    return self.__response(None, code="40034", msg=f"no price for {market} yet")
+                buy = params["side"] in BUY_SIDES
+                price *= 1 + self.slippage if buy else 1 - self.slippage
+                self.__fill(market, params["side"], float(params["size"]), price, self.taker_fee, order_id)
+            else:
+                order = {"orderId": order_id, "clientOid": client_oid, "market": market,
+                         "side": params["side"], "size": float(params["size"]), "price": float(params["price"])}
+                self.__orders[order_id] = order
+                book = self.__buys if order["side"] in BUY_SIDES else self.__sells
+                bisect.insort(book.setdefault(market, []), (order["price"], order_id))
+                last = self.last_price.get(market)
+                if last is not None:
+                    self.__match(market, last, last)
+            self.save()
+        return self.__response({"orderId": order_id, "clientOid": client_oid})
+
+    def cancel_order(self, order_id):
+        with self.__lock:
+            order = self.__orders.pop(order_id, None)
+            if order is None:
+                return False
+            book = (self.__buys if order["side"] in BUY_SIDES else self.__sells)[order["market"]]
+            book.remove((order["price"], order_id))
+            self.save()
+            return True
+
+    def open_orders(self, market=None):
+        with self.__lock:
+            return [dict(o) for o in self.__orders.values() if market is None or o["market"] == market]
+
+    def on_price(self, market, price, ts=None):
+        self.on_candle(market, price, price, price, ts)
+
+    def on_candle(self, market, high, low, close, ts=None):
+        self.last_price[market] = close
+        if market not in self.__buys and market not in self.__sells:
+            return
+        with self.__lock:
+            if self.__match(market, high, low):
+                self.save()
+
+    def __match(self, market, high, low):
+        filled = False
+        buys = self.__buys.get(market)
+        # highest resting buy is the last element
+        while buys and buys[-1][0] >= low:
+            price, order_id = buys.pop()
+            order = self.__orders.pop(order_id)
+            self.__fill(market, order["side"], order["size"], price, self.maker_fee, order_id)
+            filled = True
+        sells = self.__sells.get(market)
+        while sells and sells[0][0] <= high:
+            price, order_id = sells.pop(0)
+            order = self.__orders.pop(order_id)
+            self.__fill(market, order["side"], order["size"], price, self.maker_fee, order_id)
+            filled = True
+        if buys is not None and not buys:
+            del self.__buys[market]
+        if sells is not None and not sells:
+            del self.__sells[market]
+        return filled
+
+    def __fill(self, market, side, size, price, fee_rate, order_id):
+        signed = size if side in BUY_SIDES else -size
+        position = self.positions.get(market, {"size": 0.0, "entry_price": 0.0})
+        current = position["size"]
+        realized = 0.0
+        if current and (current > 0) != (signed > 0):
+            # reducing (and possibly flipping) the position realizes PnL on the closed part
+            closed = min(abs(signed), abs(current))
+            realized = closed * (price - position["entry_price"]) * (1 if current > 0 else -1)
+        new_size = current + signed
+        if abs(new_size) < 1e-12:
+            self.positions.pop(market, None)
+        else:
+            if current == 0 or (current > 0) != (new_size > 0):
+                entry = price
+            elif abs(new_size) > abs(current):
+                entry = (position["entry_price"] * abs(current) + price * size) / abs(new_size)
+            else:
+                entry = position["entry_price"]
+            self.positions[market] = {"size": new_size, "entry_price": entry}
+        fee = price * size * fee_rate
+        self.balance += realized - fee
+        self.fills += 1
+        logger.info("paper fill %s %s %s @ %s", side, size, market, price,
+                    extra={"event": "paper_fill", "market": market, "side": side, "size": size,
+                           "price": price, "fee": fee, "realized_pnl": realized, "order_id": order_id,
+                           "balance": self.balance})
+
+    def __response(self, data, code="00000", msg="success"):
+        return {"code": code, "msg": msg, "requestTime": int(time.time() * 1000), "data": data}
+
+    def equity(self):
+        """Balance plus unrealized PnL at the last seen prices."""
+        unrealized = sum(p["size"] * (self.last_price.get(m, p["entry_price"]) - p["entry_price"])
+                         for m, p in self.positions.items())
+        return self.balance + unrealized
+
+    def load(self):
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        self.balance = state["balance"]
+        self.positions = state["positions"]
+        self.last_price.update(state.get("last_price", {}))
+        self.fills = state.get("fills", 0)
+        for order in state.get("orders", []):
+            self.__orders[order["orderId"]] = order
+            book = self.__buys if order["side"] in BUY_SIDES else self.__sells
+            bisect.insort(book.setdefault(order["market"], []), (order["price"], order["orderId"]))
+
+    def save(self):
+        if not self.state_file:
+            return
+        # on_candle records prices without the lock; dict() copies in one step, json.dump would iterate live
+        state = {"balance": self.balance, "positions": self.positions, "last_price": dict(self.last_price),
+                 "fills": self.fills, "orders": list(self.__orders.values())}
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=4)
+        os.replace(tmp, self.state_file)
+
+
+_execution = None
+
+
+def current_execution():
+    """The execution backend if get_execution() has created it, else None."""
+    return _execution
+
+
+def set_execution(execution):
+    """Make `execution` the shared backend, e.g. a PaperExecution for a replayed feed."""
+    global _execution
+    _execution = execution
+    return execution
+
+
+def get_execution():
+    """
+    Shared execution backend, chosen by the TRADING_MODE env var ("live", the default, or "paper").
+
+    Credentials are only read for live trading.
+    """
+    global _execution
+    if _execution is None:
+        if os.environ.get("TRADING_MODE", "live").lower() == "paper":
+            _execution = PaperExecution(
+                initial_balance=float(os.environ.get("PAPER_BALANCE", 10000)),
+                taker_fee=float(os.environ.get("PAPER_TAKER_FEE", 0.0006)),
+                maker_fee=float(os.environ.get("PAPER_MAKER_FEE", 0.0002)),
+                slippage=float(os.environ.get("PAPER_SLIPPAGE", 0.0005)),
+            )
+            logger.info("Paper trading: balance %.2f, %d open positions", _execution.balance,
+                        len(_execution.positions))
+        else:
+            from decouple import config
+
+            _execution = LiveExecution(config('apiKey'), config('secretKey'), config('passphrase'))
+    return _execution
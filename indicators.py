@@ -0,0 +1,154 @@
+import numpy as np
+
+
+class WindowKernels:
+    """
+    SMA, rolling std, EMA and percentage slope for many windows and markets at once.
+
+    The prices are shifted per market and prefix-summed once (values,
+    squares and a count of valid bars); every rolling window after that is
+    a difference of two rows of those sums, taken for all windows in one
+    gather, so adding a window costs no extra pass over the data. Results
+    are (window x time x market) arrays.
+
+    Rolling values follow pandas rolling(window).mean()/.std(): NaN until
+    the window is full and while it contains a missing price. Internals are
+    float64; `dtype=np.float32` only stores the outputs in single precision,
+    halving their memory.
+
+    Args:
+        prices: DataFrame (time x market, a 'time' column is ignored) or 1-D/2-D array
+        dtype: dtype of the returned arrays
+    """
+
+    def __init__(self, prices, dtype=np.float64):
+        columns = getattr(prices, "columns", None)
+        if columns is not None:
+            self.markets = [c for c in columns if c != 'time']
+            values = prices[self.markets].to_numpy(dtype=np.float64)
+        else:
+            values = np.asarray(prices, dtype=np.float64)
+            if values.ndim == 1:
+                values = values[:, None]
+            self.markets = list(range(values.shape[1]))
+        self.dtype = dtype
+        self.values = values
+        valid = ~np.isnan(values)
+        # shifting by a per-market reference keeps the squared sums small enough to
+        # stay exact for high-priced markets; means are shifted back afterwards
+        counts = valid.sum(axis=0)
+        self.shift = np.where(valid, values, 0.0).sum(axis=0) / np.maximum(counts, 1)
+        centred = np.where(valid, values - self.shift, 0.0)
+        zeros = np.zeros((1, values.shape[1]))
+        self.__sum = np.concatenate([zeros, np.cumsum(centred, axis=0)])
+        self.__sum_sq = np.concatenate([zeros, np.cumsum(centred * centred, axis=0)])
+        self.__count = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+        self.__gaps = not valid.all()
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def __window_sums(self, cumulative, windows):
+        # sums over rows t+1-w .. t for every window w and bar t, (window x time x market);
+        # bars before a window is complete are NaN
+        ends = np.arange(1, len(self.values) + 1)
+        starts = ends[None, :] - np.asarray(windows, dtype=np.int64)[:, None]
+        sums = cumulative[np.maximum(starts, 0)]
+        np.subtract(cumulative[ends][None], sums, out=sums)
+        sums[starts < 0] = np.nan
+        return sums
+
+    def __totals(self, windows):
+        """Window sizes and centred window sums, NaN wherever a window is not full of prices."""
+        sizes = np.asarray(windows, dtype=np.float64)[:, None, None]
+        total = self.__window_sums(self.__sum, windows)
+        if self.__gaps:
+            total[self.__window_sums(self.__count, windows) != sizes] = np.nan
+        return sizes, total
+
+    def __mean(self, windows, dtype):
+        sizes, total = self.__totals(windows)
+        mean = np.empty(total.shape, dtype=dtype)
+        np.divide(total, sizes, out=mean, casting="same_kind")
+        mean += self.shift.astype(dtype)
+        return mean
+
+    def sma(self, windows):
+        """Simple moving averages, shape (len(windows), time, market)."""
+        return self.__mean(windows, self.dtype)
+
+    def std(self, windows, ddof=1):
+        """Rolling standard deviations (sample std by default, as pandas), shape (len(windows), time, market)."""
+        sizes, total = self.__totals(windows)
+        variance = self.__window_sums(self.__sum_sq, windows)
+        # sum of squares minus n * mean^2, on prices centred per market
+        variance -= total * total / sizes
+        out = np.empty(variance.shape, dtype=self.dtype)
+        np.divide(variance, sizes - ddof, out=out, casting="same_kind")
+        np.maximum(out, 0.0, out=out)
+        return np.sqrt(out, out=out)
+
+    def bands(self, windows, num_std):
+        """Bollinger (upper, middle, lower) arrays, each (len(windows), time, market)."""
+        middle = self.sma(windows)
+        width = self.std(windows) * num_std
+        return middle + width, middle, middle - width
+
+    def ema(self, spans):
+        """
+        Exponential moving averages (pandas ewm(span, adjust=False)), shape (len(spans), time, market).
+
+        Each market starts at its first price; a missing price carries the
+        previous value forward.
+        """
+        alpha = (2.0 / (np.asarray(spans, dtype=np.float64) + 1.0))[:, None]
+        values = self.values
+        valid = ~np.isnan(values)
+        first = np.where(valid.any(axis=0), valid.argmax(axis=0), len(values))
+        leading = np.arange(len(values))[:, None] < first[None, :]
+        # prices before a market's first bar repeat that first price, which leaves the
+        # average there unchanged; those bars are masked again below
+        filled = np.where(leading, values[np.minimum(first, len(values) - 1), np.arange(values.shape[1])], values)
+        out = np.empty((len(spans),) + values.shape, dtype=self.dtype)
+        state = np.repeat(filled[:1], len(spans), axis=0)
+        if not np.isnan(filled).any():
+            decay = 1.0 - alpha
+            for t, row in enumerate(filled):
+                state *= decay
+                state += alpha * row
+                out[:, t] = state
+        else:
+            for t, row in enumerate(filled):
+                observed = ~np.isnan(row)
+                state[:, observed] += alpha * (row[observed] - state[:, observed])
+                out[:, t] = state
+        out[:, leading] = np.nan
+        return out
+
+    def sma_slope(self, windows, lag=1):
+        """Percentage slope of each SMA, computed in float64 before any downcast (see pct_slope)."""
+        return pct_slope(self.__mean(windows, np.float64), lag).astype(self.dtype, copy=False)
+
+
+def pct_slope(values, lag=1, fill=0.0):
+    """
+    Percentage change over `lag` bars along the time axis: (x[t] - x[t-lag]) / x[t-1] * 100.
+
+    Works on (time x market) or (window x time x market) arrays; undefined
+    values become `fill`, as the notebooks' fillna(0).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    axis = values.ndim - 2 if values.ndim > 1 else 0
+    out = np.full(values.shape, np.nan)
+    current = [slice(None)] * values.ndim
+    current[axis] = slice(lag, None)
+    earlier = list(current)
+    earlier[axis] = slice(None, -lag)
+    previous = list(current)
+    previous[axis] = slice(lag - 1, -1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[tuple(current)] = (values[tuple(current)] - values[tuple(earlier)]) / values[tuple(previous)] * 100
+    if fill is not None:
+        out[~np.isfinite(out)] = fill
+    return out
@@ -0,0 +1,273 @@
+import collections
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+
+from constants import WINDOW, NUM_STD, TRADING_STRATEGIES
+from bollinger import evaluate_market, load_open_trades, save_open_trades
+from bitget import consts as c
+from bitget.exceptions import BitgetWsReconnectException
+from bitget.ws.bitget_ws_client import BitgetWsClient, SubscribeReq
+from bitget.ws.dispatcher import OrderedDispatcher
+from bitget.ws.recorder import WsRecorder
+from execution import PaperExecution, get_execution, set_execution
+from logging_config import setup_logging
+from profiler import profiler, span
+from resample import Resampler
+
+PRODUCT_TYPE = "USDT-FUTURES"
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalBands:
+    """
+    Bollinger Bands over a rolling window of closes, updated in O(1) per bar.
+
+    Matches calculate_bollinger_bands (rolling mean and sample standard
+    deviation). Running sums are rebuilt from the window every `window`
+    pushes so floating point drift cannot accumulate.
+    """
+
+    def __init__(self, window, num_std):
+        self.window = window
+        self.num_std = num_std
+        self.closes = collections.deque(maxlen=window)
+        self.__sum = 0.0
+        self.__sum_sq = 0.0
+        self.__pushes = 0
+
+    def ready(self):
+        return len(self.closes) == self.window
+
+    def push(self, close):
+        if len(self.closes) == self.window:
+            oldest = self.closes[0]
+            self.__sum -= oldest
+            self.__sum_sq -= oldest * oldest
+        self.closes.append(close)
+        self.__sum += close
+        self.__sum_sq += close * close
+        self.__pushes += 1
+        if self.__pushes % self.window == 0:
+            self.__sum = math.fsum(self.closes)
+            self.__sum_sq = math.fsum(x * x for x in self.closes)
+
+    def bands(self, price=None):
+        """
+        Return (upper, middle, lower) for the closed bars, or None while warming up.
+
+        When `price` is given it stands in for the still-forming bar, i.e. the
+        bands cover the last window-1 closes plus `price`, which is how the
+        batch script sees the market mid-bar.
+        """
+        n = self.window
+        total, total_sq = self.__sum, self.__sum_sq
+        if price is not None:
+            if len(self.closes) < n - 1:
+                return None
+            if len(self.closes) == n:
+                oldest = self.closes[0]
+                total -= oldest
+                total_sq -= oldest * oldest
+            total += price
+            total_sq += price * price
+        elif not self.ready():
+            return None
+
+        middle = total / n
+        variance = max((total_sq - n * middle * middle) / (n - 1), 0.0)
+        std = math.sqrt(variance)
+        return middle + std * self.num_std, middle, middle - std * self.num_std
+
+
+class LiveBollingerFeed:
+    """
+    Long-running Bollinger strategy driven by the public websocket.
+
+    Subscribes to the candle and ticker channels of every market in
+    TRADING_STRATEGIES, keeps IncrementalBands per market in memory and runs
+    evaluate_market on each bar close (evaluate_on="close") or on every
+    ticker update (evaluate_on="tick"). The candle snapshot sent on
+    (re)subscribe seeds the bands and backfills bars missed during a
+    disconnect, so no REST polling is needed.
+
+    Listeners run on an OrderedDispatcher pool: updates for one market stay
+    in order while order placement for one market never stalls frame reads
+    or other markets.
+
+    Every closed base bar, backfilled ones included, is also pushed into
+    `resampler`, so higher timeframes are available through
+    feed.resampler.subscribe('1H', callback) without extra subscriptions.
+
+    With a `recorder` (bitget.ws.recorder.WsRecorder) every frame is kept
+    on disk; start(client) with an offline client replays such recordings.
+    A replay always trades on a PaperExecution with its own replay_* state,
+    order and open-trades files, whatever TRADING_MODE says.
+    """
+
+    def __init__(self, markets=None, granularity='15m', evaluate_on='close', url=c.PUBLIC_WS_URL, workers=4,
+                 recorder=None):
+        if evaluate_on not in ('close', 'tick'):
+            raise ValueError("evaluate_on must be 'close' or 'tick'")
+        self.markets = list(markets or TRADING_STRATEGIES.keys())
+        self.granularity = granularity
+        self.evaluate_on = evaluate_on
+        self.url = url
+        self.dispatcher = OrderedDispatcher(workers=workers)
+        self.recorder = recorder
+        self.bands = {market: IncrementalBands(WINDOW, NUM_STD) for market in self.markets}
+        self.last_price = {}
+        # both are chosen in start(), once it is known whether the frames are live
+        self.execution = None
+        self.open_trades = {}
+        self.resampler = Resampler(granularity)
+        self.__forming = {}
+        self.__last_closed = {}
+        self.risk = None
+        self.__client = None
+        self.__save_lock = threading.Lock()
+
+    def candle_channel(self, market):
+        return SubscribeReq(PRODUCT_TYPE, f"candle{self.granularity}", market)
+
+    def ticker_channel(self, market):
+        return SubscribeReq(PRODUCT_TYPE, "ticker", market)
+
+    def start(self, client=None):
+        """
+        Connect and subscribe; pass an offline BitgetWsClient to run on replayed frames instead.
+        """
+        client = client or BitgetWsClient(self.url)
+        if client.is_offline():
+            # replayed frames must never reach the exchange or the live/paper position files
+            self.execution = set_execution(PaperExecution(state_file="replay_state.json",
+                                                          order_file="replay_order_responses.json",
+                                                          open_trades_file="replay_open_trades.json"))
+            logger.info("Offline client: trading on a replay PaperExecution")
+        else:
+            self.execution = get_execution()
+        self.open_trades = load_open_trades(self.execution.open_trades_file)
+        client.dispatcher(self.dispatcher)
+        if self.recorder is not None:
+            client.recorder(self.recorder)
+        # load the risk engine (and numpy) now rather than on the first entry
+        from risk import get_risk_engine
+        self.risk = get_risk_engine()
+        self.__client = client.build()
+        self.__client.subscribe([self.candle_channel(m) for m in self.markets], self.on_candle_message)
+        self.__client.subscribe([self.ticker_channel(m) for m in self.markets], self.on_ticker_message)
+        return self
+
+    def run_forever(self):
+        """
+        Start and block; raises the client's BitgetWsReconnectException once it stops reconnecting,
+        so a supervisor can restart the process instead of it sitting idle without data.
+        """
+        self.start()
+        while self.__client.failure() is None:
+            time.sleep(1)
+        raise self.__client.failure()
+
+    def on_candle_message(self, message):
+        with span("candle_message"):
+            self.__on_candle_message(message)
+
+    def __on_candle_message(self, message):
+        json_obj = json.loads(message)
+        market = json_obj['arg']['instId']
+        if market not in self.bands:
+            return
+        rows = sorted(json_obj['data'], key=lambda row: int(row[0]))
+        if json_obj.get('action') != 'snapshot':
+            self.on_candles(market, rows)
+            return
+
+        # Seed or backfill without replaying decisions on historical bars;
+        # only the newest bar closed by the snapshot is evaluated.
+        last_closed = self.__last_closed.get(market)
+        self.on_candles(market, rows, evaluate=False)
+        if self.evaluate_on == 'close' and self.__last_closed.get(market) != last_closed:
+            self.evaluate(market, self.bands[market].closes[-1], self.bands[market].bands())
+        if self.__client is not None:
+            # a fresh snapshot covers any gap left by a reconnect
+            self.__client.clear_missed([self.candle_channel(market)])
+
+    def on_ticker_message(self, message):
+        json_obj = json.loads(message)
+        for ticker in json_obj['data']:
+            market = ticker.get('instId') or json_obj['arg']['instId']
+            if market not in self.bands:
+                continue
+            price = float(ticker['lastPr'])
+            self.last_price[market] = price
+            self.execution.on_price(market, price)
+            if self.evaluate_on == 'tick':
+                self.evaluate(market, price, self.bands[market].bands(price))
+
+    def on_candles(self, market, rows, evaluate=True):
+        """
+        Fold candle rows ([ts, open, high, low, close, ...]) into the market's bands.
+
+        A row whose start time is newer than the forming bar closes that bar.
+        """
+        bands = self.bands[market]
+        for row in rows:
+            ts, close = int(row[0]), float(row[4])
+            if ts <= self.__last_closed.get(market, 0):
+                continue
+            forming = self.__forming.get(market)
+            if forming is not None and ts > forming[0]:
+                bands.push(forming[1])
+                self.__last_closed[market] = forming[0]
+                closed = forming[2]
+                self.resampler.push(market, forming[0], float(closed[1]), float(closed[2]), float(closed[3]),
+                                    forming[1], float(closed[5]))
+                if evaluate and self.evaluate_on == 'close':
+                    self.evaluate(market, forming[1], bands.bands())
+            self.__forming[market] = (ts, close, row)
+            self.last_price[market] = close
+            if evaluate:
+                self.execution.on_candle(market, float(row[2]), float(row[3]), close, ts)
+        if not evaluate and market in self.last_price:
+            # historical bars predate any resting order; only the current price counts
+            self.execution.on_price(market, self.last_price[market])
+
+    def evaluate(self, market, price, current_bands):
+        if current_bands is None:
+            return
+        upper, middle, lower = current_bands
+        before = self.open_trades.get(market)
+        if self.risk is not None:
+            # open positions are valued at their latest evaluated price
+            self.risk.update_prices({market: price})
+        with span("decision", market=market):
+            exit_hit = evaluate_market(market, price, upper, middle, lower, self.open_trades)
+        if exit_hit:
+            del self.open_trades[market]
+        if self.open_trades.get(market) != before:
+            # markets are evaluated on different workers; write a consistent copy
+            with self.__save_lock:
+                save_open_trades(dict(self.open_trades), self.execution.open_trades_file)
+
+
+if __name__ == "__main__":
+    setup_logging()
+    # WS_RECORD_DIR keeps a replayable recording of every frame (bitget/ws/recorder.py)
+    record_dir = os.environ.get("WS_RECORD_DIR")
+    feed = LiveBollingerFeed(recorder=WsRecorder(record_dir) if record_dir else None)
+    try:
+        feed.run_forever()
+    except KeyboardInterrupt:
+        pass
+    except BitgetWsReconnectException:
+        logger.exception("Websocket gave up reconnecting, exiting")
+        sys.exit(1)
+    finally:
+        if feed.recorder is not None:
+            feed.recorder.close()
+        profiler.write(prefix="live_bollinger")
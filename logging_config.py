@@ -0,0 +1,78 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+# attributes every LogRecord carries; anything else came in through `extra`
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with `extra` fields promoted to top-level keys."""
+
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def setup_logging(level=None, json_format=None, stream=None):
+    """
+    Route all logging through a queue so callers never block on stream I/O.
+
+    Records are put on an in-memory queue by a QueueHandler and written by a
+    background QueueListener. Level and format default to the LOG_LEVEL
+    (INFO) and LOG_FORMAT ("json" or "text") environment variables, so
+    debug detail stays off unless explicitly requested. Calling it again
+    replaces the previous configuration.
+
+    Args:
+        level: logging level name or number
+        json_format: emit JSON records instead of plain text
+        stream: output stream, stderr by default
+    """
+    global _listener
+
+    level = level or os.environ.get("LOG_LEVEL", "INFO")
+    if json_format is None:
+        json_format = os.environ.get("LOG_FORMAT", "json") == "json"
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    if json_format:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    if _listener is not None:
+        _listener.stop()
+
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    return _listener
+
+
+@atexit.register
+def _flush():
+    if _listener is not None:
+        _listener.stop()
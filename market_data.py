@@ -1,18 +1,26 @@
 from datetime import datetime, timedelta
-import pandas as pd
+import logging
 import time
 
-from bitget.bitget_api import BitgetApi
 from bitget.exceptions import BitgetAPIException
-from decouple import config
+from profiler import span
+from resample import GRANULARITY_MS
 
-# API credentials
-apiKey = config('apiKey')
-secretKey = config('secretKey')
-passphrase = config('passphrase')
+# Created on first use so importing this module stays cheap
+baseApi = None
 
-# Create an instance of the BitgetApi class
-baseApi = BitgetApi(apiKey, secretKey, passphrase)
+logger = logging.getLogger(__name__)
+
+
+def get_base_api():
+    """Return the shared BitgetApi, reading credentials on first call."""
+    global baseApi
+    if baseApi is None:
+        from bitget.bitget_api import BitgetApi
+        from decouple import config
+
+        baseApi = BitgetApi(config('apiKey'), config('secretKey'), config('passphrase'))
+    return baseApi
 
 
 def to_unix_milliseconds_rounded(dt):
@@ -71,42 +79,51 @@ def fetch_and_compile_candle_data(times_dict, markets, granularity):
         markets (list): List of market symbols to fetch
         granularity (str): Time granularity (e.g., '15m', '1h')
     """
+    import pandas as pd
+
+    api = get_base_api()
     try:
         final_df = pd.DataFrame()
+        volume_df = pd.DataFrame()
         
         for market in markets:
-            interim_df = pd.DataFrame()  # Reset interim_df for each market
-            
-            for times_key, times_value in times_dict.items():
-                params = {
-                    "symbol": market,
-                    "productType": "USDT-FUTURES",
-                    "granularity": granularity,
-                    "endTime": times_value["to_unix"],
-                    "limit": "200"
-                }
-                response = baseApi.get("/api/v2/mix/market/history-candles", params)
-            
-                # Temporary DataFrame from the response
-                temp_df = pd.DataFrame(response)
-                
-                # Process the 'time' column
-                temp_df['time'] = temp_df['data'].apply(lambda x: x[0])
-                temp_df['time'] = pd.to_numeric(temp_df['time'])
-                temp_df['time'] = pd.to_datetime(temp_df['time'], unit='ms')
-
-                # Append the data for the current market
-                interim_df = pd.concat([interim_df, temp_df], ignore_index=True, axis=0)
-                
+            with span("fetch", market=market):
+                interim_df = pd.DataFrame()  # Reset interim_df for each market
+
+                for times_key, times_value in times_dict.items():
+                    params = {
+                        "symbol": market,
+                        "productType": "USDT-FUTURES",
+                        "granularity": granularity,
+                        "endTime": times_value["to_unix"],
+                        "limit": "200"
+                    }
+                    with span("request"):
+                        response = api.get("/api/v2/mix/market/history-candles", params)
+
+                    with span("parse"):
+                        # Temporary DataFrame from the response
+                        temp_df = pd.DataFrame(response)
+
+                        # Process the 'time' column
+                        temp_df['time'] = temp_df['data'].apply(lambda x: x[0])
+                        temp_df['time'] = pd.to_numeric(temp_df['time'])
+                        temp_df['time'] = pd.to_datetime(temp_df['time'], unit='ms')
+
+                        # Append the data for the current market
+                        interim_df = pd.concat([interim_df, temp_df], ignore_index=True, axis=0)
+
                 # Create a new column for the market using the exit price (index 4)
-            final_df[market] = interim_df['data'].apply(lambda x: x[4])
+                final_df[market] = interim_df['data'].apply(lambda x: x[4])
+                # and keep the base volume (index 5) for the freshness check
+                volume_df[market] = interim_df['data'].apply(lambda x: x[5])
+
+                # Ensure the 'time' column is synchronized across all market columns
+                if 'time' not in final_df.columns:
+                    final_df['time'] = interim_df['time']
 
             # Sleep to avoid hitting the rate limit
-            time.sleep(0.2)  
-            
-            # Ensure the 'time' column is synchronized across all market columns
-            if 'time' not in final_df.columns:
-                final_df['time'] = interim_df['time']
+            time.sleep(0.2)
 
         # Sort the times in the DataFrame in ascending order
         final_df.sort_values(by='time', inplace=True)
@@ -114,13 +131,95 @@ def fetch_and_compile_candle_data(times_dict, markets, granularity):
         # Reorder the DataFrame columns to have 'time' as the first column
         cols = ['time'] + [col for col in final_df.columns if col != 'time']
         df_market_prices = final_df[cols]
+
+        # Overlapping ranges, gaps and string closes are repaired before anything reads the file
+        from data_quality import validate_prices
+
+        with span("validate"):
+            df_market_prices, _ = validate_prices(df_market_prices, granularity,
+                                                   volumes=volume_df.loc[final_df.index])
         
         # Export the compiled data to a CSV file
         output_filename = f"data_{granularity}.csv"
-        df_market_prices.to_csv(output_filename, index=False)
-        print(f"Data saved to {output_filename}")
+        with span("csv_write"):
+            df_market_prices.to_csv(output_filename, index=False)
+        logger.info("Data saved to %s", output_filename)
 
     except BitgetAPIException as e:
-        print(f"API error: {e.message}")
-    except Exception as e:
-        print(f"Unexpected error: {str(e)}")
+        logger.error("API error: %s", e.message)
+    except Exception:
+        logger.exception("Unexpected error")
+
+
+def update_candle_data(price_data, markets, granularity, end_time, output_filename=None):
+    """
+    Append candles newer than the last row of `price_data`, fetching only the missing bars.
+
+    The stored last row is fetched again and overwritten: it was the bar
+    that had just opened at the previous update, so its close is an early
+    intrabar price. Keeps the frame the same length (oldest rows drop off)
+    and falls back to a full refetch when more than one request's worth of
+    bars is missing.
+
+    Args:
+        price_data (DataFrame): prices as written by fetch_and_compile_candle_data, or None
+        markets (list): List of market symbols to fetch
+        granularity (str): Time granularity (e.g., '15m', '1h')
+        end_time (int): end of the newest range in Unix milliseconds (rounded to the bar)
+        output_filename (str): CSV to rewrite, defaults to data_{granularity}.csv
+
+    Returns:
+        DataFrame: updated prices
+    """
+    import pandas as pd
+
+    output_filename = output_filename or f"data_{granularity}.csv"
+    bar_ms = GRANULARITY_MS[granularity]
+    if price_data is not None and len(price_data):
+        last = int(pd.Timestamp(price_data['time'].iloc[-1]).value // 10 ** 6)
+        missing = (end_time - last) // bar_ms
+    if price_data is None or not len(price_data) or missing > 199:
+        fetch_and_compile_candle_data(get_unix_times(3), markets, granularity)
+        return pd.read_csv(output_filename)
+    if missing <= 0:
+        return price_data
+
+    api = get_base_api()
+    new_rows = {}
+    for market in markets:
+        params = {
+            "symbol": market,
+            "productType": "USDT-FUTURES",
+            "granularity": granularity,
+            "endTime": end_time,
+            # the bars from `last` (inclusive) up to end_time
+            "limit": str(missing + 2)
+        }
+        with span("request", market=market):
+            response = api.get("/api/v2/mix/market/history-candles", params)
+        for row in response['data']:
+            ts = int(row[0])
+            if ts >= last:
+                new_rows.setdefault(ts, {})[market] = float(row[4])
+        # Sleep to avoid hitting the rate limit
+        time.sleep(0.2)
+
+    final_closes = new_rows.pop(last, {})
+    if not new_rows and not final_closes:
+        return price_data
+    appended = pd.DataFrame.from_dict(new_rows, orient='index').sort_index()
+    appended.insert(0, 'time', pd.to_datetime(appended.index, unit='ms').astype(str))
+    updated = pd.concat([price_data, appended.reset_index(drop=True)], ignore_index=True)
+    if final_closes:
+        # replace the early close stored for the bar that was still forming
+        columns = [market for market in final_closes if market in updated.columns]
+        updated.loc[len(price_data) - 1, columns] = [final_closes[market] for market in columns]
+    from data_quality import validate_prices
+
+    with span("validate"):
+        updated, _ = validate_prices(updated, granularity)
+    updated = updated.iloc[-len(price_data):].reset_index(drop=True)
+    with span("csv_write"):
+        updated.to_csv(output_filename, index=False)
+    logger.info("Refreshed the last bar and appended %d bars to %s", len(appended), output_filename)
+    return updated
@@ -3,7 +3,6 @@ from constants import TRADING_STRATEGIES
 from decouple import config
 
 import pandas as pd
-import boto3
 import time
 from datetime import datetime
 
@@ -48,6 +47,8 @@ def fetch_order_fills(order_api, markets, start_time, end_time):
 
 def upload_to_s3(local_file, bucket_name, s3_key):
     """Upload a file to S3."""
+    import boto3  # only the upload path needs it
+
     s3_client = boto3.client("s3")
     try:
         s3_client.upload_file(local_file, bucket_name, s3_key)
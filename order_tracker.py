@@ -0,0 +1,205 @@
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_TYPE = "USDT-FUTURES"
+# batch-cancel-orders accepts at most 50 orderIds per request
+CANCEL_BATCH = 50
+PAGE_LIMIT = 100
+TERMINAL_STATES = ("filled", "canceled", "cancelled")
+
+
+def _market(symbol):
+    return symbol.split("_")[0]
+
+
+class OrderTracker:
+    """
+    Order state keyed by orderId, reconciled against the exchange in bulk.
+
+    Orders are added with track() right after placement. sync() pulls every
+    pending order and the order history since the oldest tracked order in a
+    few paginated requests, instead of polling each order, and returns the
+    orders that reached a terminal state (filled or canceled) since the
+    last sync; those are dropped from the index. on_order_message() applies
+    pushes from the private websocket "orders" channel for continuous
+    tracking. The index persists to `file_path` between 15m runs.
+    """
+
+    def __init__(self, order_api=None, file_path="tracked_orders.json"):
+        self.order_api = order_api
+        self.file_path = file_path
+        self.orders = {}
+        self.by_market = {}
+        self.__lock = threading.Lock()
+        if file_path:
+            self.load()
+
+    def track(self, market, params, response):
+        """Index an order accepted by placeOrder; `params` is the request, `response` its reply."""
+        data = response.get('data') or {}
+        if response.get('code') != '00000' or not data.get('orderId'):
+            return None
+        now = int(time.time() * 1000)
+        order = {
+            "orderId": data['orderId'],
+            "clientOid": data.get('clientOid'),
+            "market": market,
+            "side": params['side'],
+            "orderType": params['orderType'],
+            "price": params.get('price'),
+            "size": float(params['size']),
+            "filled": 0.0,
+            "status": "live",
+            "placed_at": now,
+            "updated_at": now,
+        }
+        with self.__lock:
+            self.orders[order['orderId']] = order
+            self.by_market.setdefault(market, set()).add(order['orderId'])
+            self.save()
+        return order
+
+    def live_orders(self, market=None, order_type=None):
+        with self.__lock:
+            ids = self.by_market.get(market, ()) if market else self.orders
+            return [dict(self.orders[i]) for i in ids
+                    if order_type is None or self.orders[i]['orderType'] == order_type]
+
+    def sync(self):
+        """
+        Reconcile every tracked order with two bulk queries.
+
+        Returns:
+            list: orders (dicts) that were filled or canceled since the last sync
+        """
+        if not self.orders:
+            return []
+        api = self.__api()
+        pending = {row['orderId']: row for row in self.__paginate(api.ordersPending, {"productType": PRODUCT_TYPE})}
+        oldest = min(o['placed_at'] for o in self.orders.values())
+        missing = [i for i in self.orders if i not in pending]
+        history = {}
+        if missing:
+            # the history endpoint only looks back 90 days and needs a start time
+            params = {"productType": PRODUCT_TYPE, "startTime": str(oldest - 60 * 1000)}
+            history = {row['orderId']: row for row in self.__paginate(api.ordersHistory, params)}
+
+        finished = []
+        with self.__lock:
+            for order_id in list(self.orders):
+                row = pending.get(order_id) or history.get(order_id)
+                if row is None:
+                    continue
+                order = self.__apply(order_id, row)
+                if order is not None:
+                    finished.append(order)
+            self.save()
+        logger.info("Order sync: %d tracked, %d pending on exchange, %d finished",
+                    len(self.orders), len(pending), len(finished),
+                    extra={"event": "order_sync", "tracked": len(self.orders), "pending": len(pending),
+                           "finished": len(finished)})
+        return finished
+
+    def on_order_message(self, message):
+        """Listener for the private websocket "orders" channel."""
+        json_obj = json.loads(message)
+        with self.__lock:
+            changed = False
+            for row in json_obj.get('data') or []:
+                if row.get('orderId') in self.orders:
+                    self.__apply(row['orderId'], row)
+                    changed = True
+            if changed:
+                self.save()
+
+    def __apply(self, order_id, row):
+        # REST rows carry "status", websocket rows may carry "state"
+        order = self.orders[order_id]
+        order['status'] = row.get('status') or row.get('state') or order['status']
+        order['filled'] = float(row.get('baseVolume') or row.get('accBaseVolume') or order['filled'])
+        order['updated_at'] = int(row.get('uTime') or time.time() * 1000)
+        if order['status'] not in TERMINAL_STATES:
+            return None
+        del self.orders[order_id]
+        ids = self.by_market.get(order['market'])
+        if ids is not None:
+            ids.discard(order_id)
+            if not ids:
+                del self.by_market[order['market']]
+        logger.info("Order %s %s on %s (%s)", order_id, order['status'], order['market'], order['side'],
+                    extra={"event": "order_finished", "order_id": order_id, "market": order['market'],
+                           "status": order['status'], "side": order['side'], "filled": order['filled']})
+        return order
+
+    def cancel(self, orders):
+        """Cancel orders (dicts from live_orders) with one batchCancelOrders call per 50 orders of a symbol."""
+        by_symbol = {}
+        for order in orders:
+            by_symbol.setdefault(order['market'], []).append(order['orderId'])
+        api = self.__api()
+        cancelled = []
+        for market, ids in by_symbol.items():
+            for start in range(0, len(ids), CANCEL_BATCH):
+                chunk = ids[start:start + CANCEL_BATCH]
+                response = api.batchCancelOrders({"symbol": market, "productType": PRODUCT_TYPE, "marginCoin": "USDT",
+                                                  "orderIdList": [{"orderId": i} for i in chunk]})
+                data = response.get('data') or {}
+                cancelled.extend(row['orderId'] for row in data.get('successList') or [])
+                for row in data.get('failureList') or []:
+                    logger.warning("Cancel failed for %s on %s: %s", row.get('orderId'), market, row.get('errorMsg'))
+        with self.__lock:
+            for order_id in cancelled:
+                if order_id in self.orders:
+                    self.__apply(order_id, {"status": "canceled"})
+            self.save()
+        return cancelled
+
+    def cancel_stale(self, max_age_seconds):
+        """Cancel tracked limit orders resting longer than `max_age_seconds`."""
+        cutoff = (time.time() - max_age_seconds) * 1000
+        stale = [o for o in self.live_orders(order_type="limit") if o['placed_at'] < cutoff]
+        return self.cancel(stale) if stale else []
+
+    def __paginate(self, request, params):
+        rows, end_id = [], None
+        while True:
+            page = dict(params, limit=str(PAGE_LIMIT))
+            if end_id:
+                page['idLessThan'] = end_id
+            data = request(page).get('data') or {}
+            batch = data.get('entrustedList') or []
+            rows.extend(batch)
+            end_id = data.get('endId')
+            if len(batch) < PAGE_LIMIT or not end_id:
+                return rows
+
+    def __api(self):
+        if self.order_api is None:
+            from decouple import config
+            from bitget.v2.mix.order_api import OrderApi
+
+            self.order_api = OrderApi(config('apiKey'), config('secretKey'), config('passphrase'))
+        return self.order_api
+
+    def load(self):
+        try:
+            with open(self.file_path) as f:
+                orders = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        for order in orders:
+            self.orders[order['orderId']] = order
+            self.by_market.setdefault(order['market'], set()).add(order['orderId'])
+
+    def save(self):
+        if not self.file_path:
+            return
+        tmp = self.file_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(list(self.orders.values()), f, indent=4)
+        os.replace(tmp, self.file_path)
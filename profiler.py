@@ -0,0 +1,131 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+PROFILE_ENV = "BOT_PROFILE"
+PROFILE_DIR_ENV = "BOT_PROFILE_DIR"
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class Profiler:
+    """
+    Nested wall-clock spans for one run of the bot.
+
+    Spans nest per thread, so the websocket worker pool and the batch script
+    can share one profiler. Output is a Chrome trace file (chrome://tracing,
+    Perfetto, speedscope), a folded-stack file for flamegraph.pl and a
+    compact per-stage summary. When disabled, span() returns a shared no-op
+    context manager.
+    """
+
+    def __init__(self, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        self.events = []
+        self.__origin = time.perf_counter()
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return self.__span(name, args)
+
+    @contextlib.contextmanager
+    def __span(self, name, args):
+        stack = getattr(self.__local, "stack", None)
+        if stack is None:
+            stack = self.__local.stack = []
+        stack.append(name)
+        path = ";".join(stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            event = {"name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                     "ts": (start - self.__origin) * 1e6, "dur": (end - start) * 1e6, "path": path}
+            if args:
+                event["args"] = args
+            with self.__lock:
+                self.events.append(event)
+
+    def summary(self):
+        """{stage path: {"count", "total_ms", "max_ms"}} aggregated over all spans."""
+        stages = {}
+        with self.__lock:
+            events = list(self.events)
+        for event in events:
+            stage = stages.setdefault(event["path"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stage["count"] += 1
+            stage["total_ms"] += event["dur"] / 1000
+            stage["max_ms"] = max(stage["max_ms"], event["dur"] / 1000)
+        return dict(sorted(stages.items()))
+
+    def format_summary(self):
+        lines = []
+        for path, stage in self.summary().items():
+            depth = path.count(";")
+            label = "  " * depth + path.rsplit(";", 1)[-1]
+            lines.append("{:<40} n={:<5d} total={:10.2f}ms max={:9.2f}ms".format(
+                label, stage["count"], stage["total_ms"], stage["max_ms"]))
+        return "\n".join(lines)
+
+    def folded_stacks(self):
+        """Self time per stack in microseconds, in flamegraph.pl's folded format."""
+        totals = {}
+        with self.__lock:
+            events = list(self.events)
+        for event in events:
+            totals[event["path"]] = totals.get(event["path"], 0.0) + event["dur"]
+        self_time = dict(totals)
+        for path, total in totals.items():
+            if ";" in path:
+                parent = path.rsplit(";", 1)[0]
+                if parent in self_time:
+                    self_time[parent] -= total
+        return "\n".join("{} {}".format(path, int(max(us, 0))) for path, us in sorted(self_time.items())) + "\n"
+
+    def write(self, directory=None, prefix="profile"):
+        """
+        Write <prefix>_<timestamp>.trace.json, .folded and .summary.json.
+
+        Returns:
+            str: path of the trace file, or None when profiling is disabled
+        """
+        if not self.enabled:
+            return None
+        directory = directory or os.environ.get(PROFILE_DIR_ENV, "profiles")
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, "{}_{}".format(prefix, datetime.now().strftime("%Y%m%d_%H%M%S")))
+        with self.__lock:
+            events = [{k: v for k, v in e.items() if k != "path"} for e in self.events]
+        with open(base + ".trace.json", "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        with open(base + ".folded", "w") as f:
+            f.write(self.folded_stacks())
+        with open(base + ".summary.json", "w") as f:
+            json.dump({"created": datetime.now().isoformat(), "stages": self.summary()}, f, indent=4)
+        return base + ".trace.json"
+
+    def reset(self):
+        with self.__lock:
+            self.events = []
+        self.__origin = time.perf_counter()
+
+
+# process-wide profiler used by the bot's modules
+profiler = Profiler()
+
+
+def span(name, **args):
+    return profiler.span(name, **args)
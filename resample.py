@@ -0,0 +1,159 @@
+import collections
+
+GRANULARITY_MS = {
+    '1m': 60000, '3m': 180000, '5m': 300000, '15m': 900000, '30m': 1800000,
+    '1H': 3600000, '2H': 7200000, '4H': 14400000, '6H': 21600000, '12H': 43200000, '1D': 86400000,
+    '6Hutc': 21600000, '12Hutc': 43200000, '1Dutc': 86400000,
+}
+
+# Bitget opens 6H and longer candles on UTC+8 boundaries (1D at 16:00 UTC);
+# the *utc granularities are the same spans on UTC boundaries
+UTC8_MS = 8 * 3600000
+BUCKET_OFFSET_MS = {'6H': UTC8_MS, '12H': UTC8_MS, '1D': UTC8_MS}
+
+
+class Bar:
+    """One OHLCV candle; `ts` is the bucket start in Unix milliseconds."""
+
+    __slots__ = ("ts", "open", "high", "low", "close", "volume")
+
+    def __init__(self, ts, open, high, low, close, volume=0.0):
+        self.ts = ts
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def as_row(self):
+        return [self.ts, self.open, self.high, self.low, self.close, self.volume]
+
+    def __repr__(self):
+        return "Bar(%s)" % ", ".join(str(v) for v in self.as_row())
+
+
+class Resampler:
+    """
+    Derives higher timeframes incrementally from one stream of closed base bars.
+
+    push() folds each closed base bar into the forming bar of every
+    subscribed granularity, in O(1) per granularity. A higher bar closes
+    when its last base bar arrives, or when a base bar from a later bucket
+    shows that bars were missed; it is then appended to a bounded history
+    and passed to the granularity's callbacks. Buckets line up with the
+    exchange's candles: UTC epoch multiples up to 4H and for the *utc
+    granularities, UTC+8 for 6H, 12H and 1D (BUCKET_OFFSET_MS).
+
+    Args:
+        base: granularity of the pushed bars, e.g. '15m'
+        history: closed bars kept per market and granularity
+    """
+
+    def __init__(self, base='15m', history=500):
+        self.base = base
+        self.base_ms = GRANULARITY_MS[base]
+        self.history = history
+        self.callbacks = {}
+        self.offsets = {}
+        self.__forming = {}
+        self.__closed = {}
+
+    def subscribe(self, granularity, callback=None, offset_ms=None):
+        """
+        Start rolling up `granularity`; `callback(market, granularity, bar)` runs on each close.
+
+        Args:
+            granularity: key of GRANULARITY_MS, e.g. '1H' or '1Dutc'
+            callback: called with (market, granularity, bar) when a bar closes
+            offset_ms: bucket boundaries fall where (ts + offset_ms) % span == 0;
+                defaults to the exchange's alignment in BUCKET_OFFSET_MS
+
+        Returns:
+            Resampler: self, for chaining
+        """
+        span = GRANULARITY_MS[granularity]
+        if span % self.base_ms:
+            raise ValueError(f"{granularity} is not a multiple of the {self.base} base bars")
+        if offset_ms is None:
+            offset_ms = BUCKET_OFFSET_MS.get(granularity, 0)
+        if offset_ms % self.base_ms:
+            raise ValueError(f"a {offset_ms} ms offset does not fall on {self.base} bar boundaries")
+        self.offsets[granularity] = offset_ms
+        callbacks = self.callbacks.setdefault(granularity, [])
+        if callback is not None:
+            callbacks.append(callback)
+        return self
+
+    def push(self, market, ts, open, high, low, close, volume=0.0):
+        """Fold one closed base bar (start time `ts`) into every subscribed granularity."""
+        for granularity, callbacks in self.callbacks.items():
+            span = GRANULARITY_MS[granularity]
+            bucket = ts - (ts + self.offsets[granularity]) % span
+            key = (market, granularity)
+            bar = self.__forming.get(key)
+            if bar is not None and bar.ts != bucket:
+                # a base bar from a later bucket: the previous one is as complete as it will get
+                self.__close(key, bar, callbacks)
+                bar = None
+            if bar is None:
+                bar = self.__forming[key] = Bar(bucket, open, high, low, close, volume)
+            else:
+                if high > bar.high:
+                    bar.high = high
+                if low < bar.low:
+                    bar.low = low
+                bar.close = close
+                bar.volume += volume
+            if ts + self.base_ms >= bucket + span:
+                self.__close(key, bar, callbacks)
+
+    def __close(self, key, bar, callbacks):
+        del self.__forming[key]
+        closed = self.__closed.get(key)
+        if closed is None:
+            closed = self.__closed[key] = collections.deque(maxlen=self.history)
+        closed.append(bar)
+        for callback in callbacks:
+            callback(key[0], key[1], bar)
+
+    def forming(self, market, granularity):
+        """The still-open bar for `granularity`, or None."""
+        return self.__forming.get((market, granularity))
+
+    def bars(self, market, granularity):
+        """Closed bars for `granularity`, oldest first."""
+        return list(self.__closed.get((market, granularity), ()))
+
+    def closes(self, market, granularity):
+        return [bar.close for bar in self.__closed.get((market, granularity), ())]
+
+
+def resample_frame(price_data, base, granularity):
+    """
+    Roll a close-only price frame (as in data_15m.csv) up to `granularity` closes.
+
+    The still-forming last bucket is left out, so the newest row is always
+    a closed bar; a bucket cut short by the start of the data is kept.
+
+    Args:
+        price_data: DataFrame with a 'time' column and one close column per market
+        base: granularity of the rows, e.g. '15m'
+        granularity: target granularity, e.g. '1H'
+
+    Returns:
+        DataFrame: same layout, one row per closed `granularity` bar
+    """
+    import pandas as pd
+
+    resampler = Resampler(base, history=len(price_data)).subscribe(granularity)
+    markets = [col for col in price_data.columns if col != 'time']
+    times = pd.to_datetime(price_data['time']).astype('int64') // 10 ** 6
+    for market in markets:
+        for ts, close in zip(times, price_data[market]):
+            if close == close:  # skip NaN gaps
+                resampler.push(market, int(ts), close, close, close, close)
+
+    closes = {m: {bar.ts: bar.close for bar in resampler.bars(m, granularity)} for m in markets}
+    frame = pd.DataFrame(closes).sort_index()
+    frame.insert(0, 'time', pd.to_datetime(frame.index, unit='ms').astype(str))
+    return frame.reset_index(drop=True)
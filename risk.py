@@ -0,0 +1,253 @@
+import logging
+import threading
+
+import numpy as np
+
+from constants import RISK_LIMITS, TRADING_STRATEGIES
+
+logger = logging.getLogger(__name__)
+
+# signed direction of each open_trades position_type: the bot enters longs by
+# closing shorts at market (see bollinger.evaluate_market)
+POSITION_SIGN = {"open_short": -1.0, "close_short": 1.0}
+
+
+class RiskEngine:
+    """
+    Pre-trade portfolio limits, checked for a whole batch of orders at once.
+
+    Positions (signed base size) and latest prices are kept as arrays with
+    one slot per market. check() takes every order proposed in a cycle and,
+    in one vectorised pass, scales the orders that add exposure so that
+    after the batch:
+
+    - no market's notional exceeds max_asset_notional
+    - gross notional stays under max_gross_notional
+    - net notional (longs minus shorts) stays within +/-max_net_notional,
+      so a market-wide spike cannot put every market on the same side at
+      full size
+    - estimated margin, gross / leverage, stays under max_margin_use of
+      margin_balance
+    - the one-sigma portfolio move per bar, from the return covariance
+      given to update_returns(), stays under max_volatility
+
+    Orders that reduce a position are never scaled; an order scaled below
+    min_scale of its size is vetoed. A limit set to None is not enforced.
+
+    Args:
+        limits: dict with the keys of constants.RISK_LIMITS
+        markets: markets to allocate slots for up front; others are added on first sight
+    """
+
+    def __init__(self, limits=None, markets=None):
+        self.limits = dict(RISK_LIMITS if limits is None else limits)
+        self.markets = []
+        self.index = {}
+        self.positions = np.zeros(0)
+        self.reserved = np.zeros(0)
+        self.prices = np.zeros(0)
+        self.covariance = None
+        self.__lock = threading.Lock()
+        self.add_markets(markets or TRADING_STRATEGIES.keys())
+
+    def add_markets(self, markets):
+        new = [m for m in dict.fromkeys(markets) if m not in self.index]
+        if not new:
+            return
+        for market in new:
+            self.index[market] = len(self.markets)
+            self.markets.append(market)
+        pad = np.zeros(len(new))
+        self.positions = np.concatenate([self.positions, pad])
+        self.reserved = np.concatenate([self.reserved, pad])
+        self.prices = np.concatenate([self.prices, pad])
+        if self.covariance is not None:
+            covariance = np.zeros((len(self.markets), len(self.markets)))
+            covariance[:len(self.covariance), :len(self.covariance)] = self.covariance
+            self.covariance = covariance
+
+    def update_prices(self, prices):
+        """Latest price per market, {market: price}."""
+        with self.__lock:
+            self.add_markets(prices)
+            for market, price in prices.items():
+                if price == price:
+                    self.prices[self.index[market]] = price
+
+    def update_returns(self, returns):
+        """
+        Per-bar return covariance for the volatility limit.
+
+        Args:
+            returns: DataFrame of per-bar returns, one column per market; NaNs count as 0
+        """
+        values = np.nan_to_num(returns.to_numpy(dtype=float))
+        if len(values) < 2 or not len(returns.columns):
+            return
+        with self.__lock:
+            self.add_markets(returns.columns)
+            covariance = np.zeros((len(self.markets), len(self.markets)))
+            slots = np.array([self.index[m] for m in returns.columns], dtype=np.intp)
+            covariance[np.ix_(slots, slots)] = np.atleast_2d(np.cov(values, rowvar=False))
+            self.covariance = covariance
+
+    def sync_open_trades(self, open_trades):
+        """Replace the positions with the ones in an open_trades dict (bollinger.load_open_trades)."""
+        trades = list(open_trades.items())
+        with self.__lock:
+            self.add_markets(market for market, _ in trades)
+            self.positions[:] = 0.0
+            for market, trade in trades:
+                sign = POSITION_SIGN.get(trade.get('position_type'), 0.0)
+                self.positions[self.index[market]] = sign * float(trade.get('base_position_size') or 0.0)
+
+    def exposure(self):
+        """Current notional per market and the portfolio totals the limits apply to."""
+        with self.__lock:
+            notional = (self.positions + self.reserved) * self.prices
+            return self.__totals(notional)
+
+    def __totals(self, notional):
+        gross = float(np.abs(notional).sum())
+        leverage = self.limits.get("leverage") or 1.0
+        totals = {"gross": gross, "net": float(notional.sum()), "margin": gross / leverage,
+                  "markets": {m: float(notional[i]) for i, m in enumerate(self.markets) if notional[i]}}
+        if self.covariance is not None:
+            totals["volatility"] = float(np.sqrt(max(notional @ self.covariance @ notional, 0.0)))
+        return totals
+
+    def check(self, orders, reserve=False):
+        """
+        Scale a batch of proposed orders to fit the limits.
+
+        Args:
+            orders: list of (market, signed base size, price); price None uses the latest price
+            reserve: count the approved sizes as exposure until release(), so
+                checks running concurrently (live feed workers) see each other's orders
+
+        Returns:
+            numpy array: one factor per order in [0, 1]; 0 is a veto
+        """
+        if not orders:
+            return np.zeros(0)
+        with self.__lock:
+            self.add_markets(market for market, _, _ in orders)
+            slots = np.fromiter((self.index[market] for market, _, _ in orders), dtype=np.intp, count=len(orders))
+            sizes = np.fromiter((size for _, size, _ in orders), dtype=float, count=len(orders))
+            prices = np.fromiter((np.nan if price is None else price for _, _, price in orders), dtype=float,
+                                 count=len(orders))
+            prices = np.where(np.isnan(prices), self.prices[slots], prices)
+            scales, factors = self.__scale(slots, sizes * prices)
+            if reserve:
+                np.add.at(self.reserved, slots, sizes * scales)
+        for i in np.flatnonzero(scales < 1.0):
+            market = orders[i][0]
+            # the tightest limit for this order; only min_scale vetoes without one below 1
+            limit = min(factors, default="min_scale",
+                        key=lambda name: factors[name][i] if np.ndim(factors[name]) else factors[name])
+            logger.info("Risk %s %s order: scale %.2f (%s)", "vetoed" if scales[i] == 0 else "scaled", market,
+                        scales[i], limit,
+                        extra={"event": "risk", "market": market, "size": orders[i][1], "scale": float(scales[i]),
+                               "limit": limit})
+        return scales
+
+    def release(self, orders, scales):
+        """Drop the reservations of check(reserve=True) once the positions are in open_trades."""
+        with self.__lock:
+            slots = np.fromiter((self.index[market] for market, _, _ in orders), dtype=np.intp, count=len(orders))
+            sizes = np.fromiter((size for _, size, _ in orders), dtype=float, count=len(orders))
+            np.subtract.at(self.reserved, slots, sizes * scales)
+
+    def __scale(self, slots, notional):
+        limits = self.limits
+        exposure = (self.positions + self.reserved) * self.prices
+        current = exposure[slots]
+        increasing = np.abs(current + notional) > np.abs(current) + 1e-12
+        adding = np.where(increasing, notional, 0.0)
+        factors = {}
+
+        # per market: share the room left under the cap among that market's orders
+        cap = limits.get("max_asset_notional")
+        scale = np.ones(len(slots))
+        if cap is not None:
+            added = np.zeros(len(exposure))
+            np.add.at(added, slots, np.abs(adding))
+            room = np.maximum(cap - np.abs(exposure), 0.0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                per_market = np.where(added > 0, np.minimum(room / added, 1.0), 1.0)
+            scale = np.where(increasing, per_market[slots], 1.0)
+            factors["max_asset_notional"] = scale
+        adding = adding * scale
+
+        # portfolio: one factor for every order that adds exposure
+        # (reducing orders are left out of gross, in case they do not fill)
+        total = np.abs(adding).sum()
+        gross = np.abs(exposure).sum()
+        common = 1.0
+        if total > 0:
+            if limits.get("max_gross_notional") is not None:
+                factors["max_gross_notional"] = _fit(limits["max_gross_notional"] - gross, total)
+            if limits.get("margin_balance") is not None:
+                budget = limits["margin_balance"] * (limits.get("max_margin_use") or 1.0) * \
+                    (limits.get("leverage") or 1.0)
+                factors["max_margin_use"] = _fit(budget - gross, total)
+            for name in ("max_gross_notional", "max_margin_use"):
+                if name in factors:
+                    common = min(common, factors[name])
+
+        # net: only the side pushing the net past its cap is scaled
+        side = np.ones(len(slots))
+        if limits.get("max_net_notional") is not None and total > 0:
+            cap = limits["max_net_notional"]
+            net = exposure.sum() + np.where(increasing, 0.0, notional).sum()
+            longs = adding[adding > 0].sum() * common
+            shorts = -adding[adding < 0].sum() * common
+            if net + longs - shorts > cap and longs > 0:
+                side = np.where(adding > 0, _fit(cap - net + shorts, longs), side)
+            elif net + longs - shorts < -cap and shorts > 0:
+                side = np.where(adding < 0, _fit(cap + net + longs, shorts), side)
+            factors["max_net_notional"] = side
+
+        # volatility: largest common step along the batch that keeps sqrt(x'Cx) under the limit
+        if limits.get("max_volatility") is not None and self.covariance is not None and total > 0:
+            step = np.zeros(len(exposure))
+            np.add.at(step, slots, adding * common * side)
+            base = exposure.copy()
+            np.add.at(base, slots, np.where(increasing, 0.0, notional))
+            covariance = self.covariance
+            a = step @ covariance @ step
+            b = base @ covariance @ step
+            c = base @ covariance @ base - limits["max_volatility"] ** 2
+            if c > 0:
+                volatility = 0.0
+            elif a <= 0:
+                volatility = 1.0
+            else:
+                volatility = min((-b + np.sqrt(max(b * b - a * c, 0.0))) / a, 1.0)
+            factors["max_volatility"] = volatility
+            common *= volatility
+
+        scales = np.where(increasing, scale * common * side, 1.0)
+        min_scale = limits.get("min_scale") or 0.0
+        scales = np.where(increasing & (scales < min_scale), 0.0, scales)
+
+        return scales, factors
+
+def _fit(room, amount):
+    """Fraction of `amount` that fits in `room`, in [0, 1]."""
+    if amount <= 0:
+        return 1.0
+    return float(min(max(room / amount, 0.0), 1.0))
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_risk_engine():
+    """Shared RiskEngine with the limits in constants.RISK_LIMITS."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RiskEngine()
+        return _engine
@@ -0,0 +1,97 @@
+"""
+Local stand-in for the Bitget REST and websocket APIs, replaying analysis/ price data.
+
+In-process:
+
+    sim = Simulator(latency_ms=5).start()
+    Client.set_base_url(sim.rest_url)
+    ...
+    sim.stop()
+
+Or run `python -m simulator` and point the whole bot at it with the
+BITGET_API_URL / BITGET_WS_PUBLIC_URL / BITGET_WS_PRIVATE_URL env vars.
+"""
+import asyncio
+import os
+import threading
+
+from constants import TRADING_STRATEGIES
+
+from .exchange import SimulatedExchange
+from .rest import SimulatedRestApi, make_server
+from .ws import SimulatedWsServer
+
+DEFAULT_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analysis", "data_15m.csv")
+
+
+class Simulator:
+    """
+    REST and websocket simulators sharing one SimulatedExchange, served from background threads.
+
+    `markets` (default: every TRADING_STRATEGIES market) are all tradeable;
+    those missing from the CSV replay synthetic prices (SimulatedExchange).
+    """
+
+    def __init__(self, data_path=DEFAULT_DATA, host="127.0.0.1", rest_port=0, ws_port=0, latency_ms=0,
+                 jitter_ms=0, rate_limit=None, speed=1.0, start_index=600, ws_interval=1.0, markets=None):
+        if markets is None:
+            markets = list(TRADING_STRATEGIES.keys())
+        self.exchange = SimulatedExchange(data_path, start_index=start_index, speed=speed, markets=markets)
+        self.rest_api = SimulatedRestApi(self.exchange, latency_ms, jitter_ms, rate_limit)
+        self.ws_server = SimulatedWsServer(self.exchange, interval=ws_interval)
+        self.host = host
+        self.rest_port = rest_port
+        self.ws_port = ws_port
+        self.__http = None
+        self.__loop = None
+        self.__threads = []
+
+    @property
+    def rest_url(self):
+        return f"http://{self.host}:{self.rest_port}"
+
+    @property
+    def ws_url(self):
+        return f"ws://{self.host}:{self.ws_port}"
+
+    def start(self):
+        self.__http = make_server(self.rest_api, self.host, self.rest_port)
+        self.rest_port = self.__http.server_port
+        http_thread = threading.Thread(target=self.__http.serve_forever, name="sim-rest", daemon=True)
+        http_thread.start()
+
+        started = threading.Event()
+        self.__loop = asyncio.new_event_loop()
+        ws_thread = threading.Thread(target=self.__run_ws, args=(started,), name="sim-ws", daemon=True)
+        ws_thread.start()
+        started.wait()
+        self.__threads = [http_thread, ws_thread]
+        return self
+
+    def __run_ws(self, started):
+        asyncio.set_event_loop(self.__loop)
+        server = self.__loop.run_until_complete(self.ws_server.serve(self.host, self.ws_port))
+        self.ws_port = server.sockets[0].getsockname()[1]
+        started.set()
+        try:
+            self.__loop.run_forever()
+        finally:
+            server.close()
+            self.__loop.run_until_complete(server.wait_closed())
+            self.__loop.close()
+
+    def stop(self):
+        if self.__http is not None:
+            self.__http.shutdown()
+            self.__http.server_close()
+        if self.__loop is not None:
+            self.__loop.call_soon_threadsafe(self.__loop.stop)
+        for thread in self.__threads:
+            thread.join(timeout=5)
+        self.__threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,45 @@
+"""
+Run the exchange simulator.
+
+    python -m simulator --port 8080 --ws-port 8081 --latency-ms 20 --rate-limit 20 --speed 60
+
+then, in another shell:
+
+    BITGET_API_URL=http://127.0.0.1:8080 BITGET_WS_PUBLIC_URL=ws://127.0.0.1:8081 python live_bollinger.py
+"""
+import argparse
+import logging
+import time
+
+from logging_config import setup_logging
+
+from . import DEFAULT_DATA, Simulator
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="REST port")
+    parser.add_argument("--ws-port", type=int, default=8081, help="websocket port")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="close-price CSV with a time column")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="requests per second per endpoint")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 60 = one 15m bar every 15s")
+    parser.add_argument("--start-index", type=int, default=600, help="CSV row replayed as the current bar")
+    parser.add_argument("--ws-interval", type=float, default=1.0, help="seconds between websocket pushes")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    simulator = Simulator(args.data, args.host, args.port, args.ws_port, args.latency_ms, args.jitter_ms,
+                          args.rate_limit, args.speed, args.start_index, args.ws_interval).start()
+    logging.info("simulator REST %s, websocket %s", simulator.rest_url, simulator.ws_url)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
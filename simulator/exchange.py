@@ -0,0 +1,225 @@
+import itertools
+import logging
+import math
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from resample import BUCKET_OFFSET_MS, GRANULARITY_MS
+
+
+SELL_SIDES = ("sell", "open_short", "close_long")
+
+logger = logging.getLogger(__name__)
+
+
+class SimulatedExchange:
+    """
+    Replayed USDT-futures market with a minimal order book of our own orders.
+
+    Prices come from a close-only CSV such as analysis/data_15m.csv. The
+    replay is shifted so that bar `start_index` is the current wall-clock
+    bar, and it advances `speed` bars per bar interval of wall time. Market
+    orders fill at the current close; limit orders rest until a later bar's
+    high/low crosses their price.
+
+    Symbols in `markets` that the CSV lacks get a synthetic series: a random
+    walk with the per-bar volatility and price level of the CSV's first
+    market, seeded from `seed` and the symbol so every run replays the same
+    prices.
+    """
+
+    def __init__(self, data_path, start_index=600, speed=1.0, fee_rate=0.0006, markets=None, seed=0):
+        prices = pd.read_csv(data_path)
+        times = pd.to_datetime(prices.pop("time")).astype("int64").to_numpy() // 10 ** 6
+        self.bar_ms = int(np.median(np.diff(times)))
+        self.closes = {s: prices[s].to_numpy(dtype=float) for s in prices.columns}
+        self.synthesized = [m for m in dict.fromkeys(markets or ()) if m not in self.closes]
+        if self.synthesized:
+            template = self.closes[prices.columns[0]]
+            for symbol in self.synthesized:
+                rng = np.random.default_rng([seed, zlib.crc32(symbol.encode())])
+                self.closes[symbol] = _random_walk(template, rng)
+            logger.info("No price data for %s in %s, replaying seeded random walks", ", ".join(self.synthesized),
+                        data_path)
+        self.symbols = list(self.closes)
+        self.speed = speed
+        self.fee_rate = fee_rate
+        self.start_index = min(start_index, len(times) - 1)
+        self.started_ms = int(time.time() * 1000)
+        # shift data time so the start bar is the bar containing "now"
+        self.offset_ms = (self.started_ms // self.bar_ms) * self.bar_ms - int(times[self.start_index])
+        self.times = times + self.offset_ms
+        self.orders = {}
+        self.fills = []
+        self.__ids = itertools.count(int(time.time() * 1000))
+        self.__matched_index = self.start_index
+        self.__lock = threading.RLock()
+
+    # clock
+
+    def now_ms(self):
+        elapsed = (time.time() * 1000 - self.started_ms) * self.speed
+        return int(self.times[self.start_index] + self.started_ms % self.bar_ms + elapsed)
+
+    def now_index(self):
+        index = self.start_index + int((self.now_ms() - self.times[self.start_index]) // self.bar_ms)
+        return min(index, len(self.times) - 1)
+
+    # market data
+
+    def _bar(self, symbol, i):
+        close = self.closes[symbol][i]
+        open_ = self.closes[symbol][i - 1] if i > 0 else close
+        return open_, max(open_, close), min(open_, close), close
+
+    def candles(self, symbol, granularity="15m", end_time=None, limit=100):
+        """Rows of [ts, open, high, low, close, base vol, quote vol] as strings, oldest first."""
+        if granularity[-1] in "hd":
+            # older clients spell hours and days in lower case
+            granularity = granularity[:-1] + granularity[-1].upper()
+        span_ms = max(GRANULARITY_MS[granularity], self.bar_ms)
+        offset_ms = BUCKET_OFFSET_MS.get(granularity, 0)
+        last = self.now_index()
+        if end_time:
+            last = min(last, int(np.searchsorted(self.times, int(end_time), side="right")) - 1)
+        rows = []
+        end = last + 1
+        while end > 0 and len(rows) < int(limit):
+            # bucket boundaries are aligned to the granularity, so the newest one may be partial
+            start = max(end - 1 - int((self.times[end - 1] + offset_ms) % span_ms) // self.bar_ms, 0)
+            bars = [self._bar(symbol, i) for i in range(start, end)]
+            o, h, l, c = bars[0][0], max(b[1] for b in bars), min(b[2] for b in bars), bars[-1][3]
+            volume = 1000.0 * (end - start)
+            rows.append([str(int(self.times[start])), repr(o), repr(h), repr(l), repr(c),
+                         repr(volume), repr(volume * c)])
+            end = start
+        rows.reverse()
+        return rows
+
+    def ticker(self, symbol):
+        i = self.now_index()
+        last = self.closes[symbol][i]
+        return {"symbol": symbol, "lastPr": repr(last), "bidPr": repr(last * 0.9999), "askPr": repr(last * 1.0001),
+                "ts": str(self.now_ms())}
+
+    def tickers(self):
+        return [self.ticker(s) for s in self.symbols]
+
+    def contracts(self):
+        """Contract specs with precision derived from each symbol's price level."""
+        rows = []
+        for symbol in self.symbols:
+            magnitude = math.floor(math.log10(self.closes[symbol][self.start_index]))
+            volume_place = min(max(magnitude - 1, 0), 4)
+            rows.append({"symbol": symbol, "baseCoin": symbol[:-4], "quoteCoin": "USDT",
+                         "pricePlace": str(max(4 - magnitude, 0)), "priceEndStep": "1",
+                         "volumePlace": str(volume_place), "sizeMultiplier": repr(10.0 ** -volume_place),
+                         "minTradeNum": repr(10.0 ** -volume_place), "minTradeUSDT": "5",
+                         "symbolStatus": "normal"})
+        return rows
+
+    # orders
+
+    def _symbol(self, symbol):
+        # v1 order endpoints use the ETHUSDT_UMCBL form
+        return symbol.split("_")[0]
+
+    def place_order(self, params):
+        symbol = self._symbol(params["symbol"])
+        if symbol not in self.closes:
+            raise ValueError("symbol not found: %s" % params["symbol"])
+        with self.__lock:
+            self.match()
+            order = {
+                "orderId": str(next(self.__ids)),
+                "clientOid": params.get("clientOid") or str(next(self.__ids)),
+                "symbol": symbol,
+                "side": params["side"],
+                "tradeSide": params.get("tradeSide"),
+                "orderType": params.get("orderType", "market"),
+                "size": str(params["size"]),
+                "price": str(params.get("price", "")),
+                "status": "live",
+                "cTime": str(self.now_ms()),
+                "uTime": str(self.now_ms()),
+            }
+            self.orders[order["orderId"]] = order
+            if order["orderType"] == "market":
+                self._fill(order, self.closes[symbol][self.now_index()])
+            return order
+
+    def cancel_order(self, order_id=None, client_oid=None):
+        with self.__lock:
+            self.match()
+            order = self.orders.get(order_id) or next(
+                (o for o in self.orders.values() if client_oid and o["clientOid"] == client_oid), None)
+            if order is None or order["status"] != "live":
+                raise ValueError("order does not exist or is not cancelable")
+            order["status"] = "canceled"
+            order["uTime"] = str(self.now_ms())
+            return order
+
+    def orders_pending(self, symbol=None):
+        with self.__lock:
+            self.match()
+            return [dict(o) for o in self.orders.values()
+                    if o["status"] == "live" and (symbol is None or o["symbol"] == self._symbol(symbol))]
+
+    def orders_history(self, symbol=None):
+        with self.__lock:
+            self.match()
+            return [dict(o) for o in self.orders.values()
+                    if o["status"] != "live" and (symbol is None or o["symbol"] == self._symbol(symbol))]
+
+    def fill_list(self, symbol=None, start_time=None, end_time=None):
+        with self.__lock:
+            self.match()
+            return [dict(f) for f in self.fills
+                    if (symbol is None or f["symbol"] == self._symbol(symbol))
+                    and (start_time is None or int(f["cTime"]) >= int(start_time))
+                    and (end_time is None or int(f["cTime"]) <= int(end_time))]
+
+    def match(self):
+        """Fill resting limit orders against the bars replayed since the last call."""
+        with self.__lock:
+            current = self.now_index()
+            for i in range(self.__matched_index + 1, current + 1):
+                for order in self.orders.values():
+                    if order["status"] != "live" or order["orderType"] != "limit":
+                        continue
+                    _, high, low, _ = self._bar(order["symbol"], i)
+                    price = float(order["price"])
+                    if (order["side"] in SELL_SIDES and high >= price) or (order["side"] not in SELL_SIDES and low <= price):
+                        self._fill(order, price, int(self.times[i]))
+            self.__matched_index = max(self.__matched_index, current)
+
+    def _fill(self, order, price, ts=None):
+        ts = ts or self.now_ms()
+        size = float(order["size"])
+        order.update(status="filled", priceAvg=repr(price), baseVolume=order["size"], uTime=str(ts))
+        self.fills.append({
+            "tradeId": str(next(self.__ids)),
+            "orderId": order["orderId"],
+            "symbol": order["symbol"],
+            "side": order["side"],
+            "tradeSide": order["tradeSide"],
+            "orderType": order["orderType"],
+            "price": repr(price),
+            "baseVolume": order["size"],
+            "quoteVolume": repr(price * size),
+            "feeDetail": [{"feeCoin": "USDT", "totalFee": repr(-price * size * self.fee_rate)}],
+            "cTime": str(ts),
+        })
+
+
+def _random_walk(template, rng):
+    """Log-normal walk as long as `template`, starting at its first price with its per-bar volatility."""
+    returns = np.diff(np.log(template))
+    sigma = float(np.nanstd(returns)) if np.isfinite(returns).any() else 0.002
+    start = template[np.isfinite(template)][0]
+    steps = rng.normal(0.0, sigma, len(template) - 1)
+    return start * np.exp(np.concatenate([[0.0], np.cumsum(steps)]))
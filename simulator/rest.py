@@ -0,0 +1,191 @@
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Requests-per-second limiter; `take()` is False when the bucket is empty."""
+
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class ExchangeError(Exception):
+
+    def __init__(self, code, msg, status=400):
+        self.code = code
+        self.msg = msg
+        self.status = status
+
+
+def _required(params, *names):
+    for name in names:
+        if not params.get(name):
+            raise ExchangeError("40019", f"Parameter {name} cannot be empty")
+
+
+class SimulatedRestApi:
+    """
+    Routes for the Bitget REST endpoints this project calls, answered from a SimulatedExchange.
+
+    `latency_ms` and `jitter_ms` delay every response; `rate_limit` is
+    requests per second per endpoint (None disables it), beyond which the
+    server answers 429 with Bitget's 429 body.
+    """
+
+    def __init__(self, exchange, latency_ms=0, jitter_ms=0, rate_limit=None):
+        self.exchange = exchange
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.buckets = {}
+        self.routes = {
+            ("GET", "/api/v2/public/time"): self.server_time,
+            ("GET", "/api/v2/mix/market/contracts"): self.contracts,
+            ("GET", "/api/v2/mix/market/history-candles"): self.candles,
+            ("GET", "/api/v2/mix/market/candles"): self.candles,
+            ("GET", "/api/v2/mix/market/tickers"): self.tickers,
+            ("GET", "/api/v2/mix/market/ticker"): self.ticker,
+            ("POST", "/api/v2/mix/order/place-order"): self.place_order,
+            ("POST", "/api/v2/mix/order/batch-place-order"): self.batch_place_order,
+            ("POST", "/api/v2/mix/order/cancel-order"): self.cancel_order,
+            ("POST", "/api/v2/mix/order/batch-cancel-orders"): self.batch_cancel_orders,
+            ("GET", "/api/v2/mix/order/orders-pending"): self.orders_pending,
+            ("GET", "/api/v2/mix/order/orders-history"): self.orders_history,
+            ("GET", "/api/v2/mix/order/fills"): self.fills,
+            # bollinger.py still places orders through the v1 endpoint
+            ("POST", "/api/mix/v1/order/placeOrder"): self.place_order,
+        }
+
+    def handle(self, method, path, params):
+        """Return (http status, response body dict) for one request."""
+        route = self.routes.get((method, path))
+        if route is None:
+            return 404, self.__envelope(None, code="40404", msg="Request URL NOT FOUND")
+        if self.rate_limit and not self.buckets.setdefault(path, TokenBucket(self.rate_limit)).take():
+            return 429, self.__envelope(None, code="429", msg="Too Many Requests")
+        if self.latency_ms or self.jitter_ms:
+            time.sleep(max(self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms), 0) / 1000)
+        try:
+            return 200, self.__envelope(route(params))
+        except ExchangeError as e:
+            return e.status, self.__envelope(None, code=e.code, msg=e.msg)
+        except (KeyError, ValueError) as e:
+            return 400, self.__envelope(None, code="40034", msg=str(e))
+
+    def __envelope(self, data, code="00000", msg="success"):
+        return {"code": code, "msg": msg, "requestTime": self.exchange.now_ms(), "data": data}
+
+    def server_time(self, params):
+        return {"serverTime": str(self.exchange.now_ms())}
+
+    def contracts(self, params):
+        return self.exchange.contracts()
+
+    def candles(self, params):
+        _required(params, "symbol", "granularity")
+        if params["symbol"] not in self.exchange.closes:
+            raise ExchangeError("40034", "Parameter symbol does not exist")
+        return self.exchange.candles(params["symbol"], params["granularity"],
+                                     params.get("endTime"), params.get("limit", 100))
+
+    def tickers(self, params):
+        return self.exchange.tickers()
+
+    def ticker(self, params):
+        _required(params, "symbol")
+        return [self.exchange.ticker(params["symbol"])]
+
+    def place_order(self, params):
+        _required(params, "symbol", "side", "size")
+        order = self.exchange.place_order(params)
+        return {"orderId": order["orderId"], "clientOid": order["clientOid"]}
+
+    def batch_place_order(self, params):
+        success, failure = [], []
+        for item in params.get("orderList", []):
+            try:
+                success.append(self.place_order(dict(item, symbol=params.get("symbol"))))
+            except (ExchangeError, KeyError, ValueError) as e:
+                failure.append({"clientOid": item.get("clientOid"), "errorMsg": getattr(e, "msg", str(e))})
+        return {"successList": success, "failureList": failure}
+
+    def cancel_order(self, params):
+        order = self.exchange.cancel_order(params.get("orderId"), params.get("clientOid"))
+        return {"orderId": order["orderId"], "clientOid": order["clientOid"]}
+
+    def batch_cancel_orders(self, params):
+        success, failure = [], []
+        for item in params.get("orderIdList", []):
+            try:
+                success.append(self.cancel_order(item))
+            except ValueError as e:
+                failure.append({"orderId": item.get("orderId"), "clientOid": item.get("clientOid"), "errorMsg": str(e)})
+        return {"successList": success, "failureList": failure}
+
+    def orders_pending(self, params):
+        return {"entrustedList": self.exchange.orders_pending(params.get("symbol")) or None, "endId": None}
+
+    def orders_history(self, params):
+        return {"entrustedList": self.exchange.orders_history(params.get("symbol")) or None, "endId": None}
+
+    def fills(self, params):
+        return {"fillList": self.exchange.fill_list(params.get("symbol"), params.get("startTime"),
+                                                    params.get("endTime")) or None, "endId": None}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    api = None
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        self.__reply(*self.api.handle("GET", url.path, params))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.__reply(400, {"code": "40017", "msg": "Parameter verification failed", "data": None})
+            return
+        self.__reply(*self.api.handle("POST", urlparse(self.path).path, params))
+
+    def __reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def make_server(api, host="127.0.0.1", port=0):
+    """ThreadingHTTPServer serving `api`; port 0 picks a free port (see server.server_port)."""
+    handler = type("SimulatedRestHandler", (_Handler,), {"api": api})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
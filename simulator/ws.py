@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+import math
+import random
+from zlib import crc32
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+BOOK_LEVELS = 50
+
+
+def signed_checksum(asks, bids):
+    """The crc32 Bitget sends with books messages, over the top 25 bid/ask levels interleaved."""
+    parts = []
+    for i in range(25):
+        if i < len(bids):
+            parts.append(bids[i][0] + ":" + bids[i][1])
+        if i < len(asks):
+            parts.append(asks[i][0] + ":" + asks[i][1])
+    value = crc32(":".join(parts).encode())
+    return value - 2 ** 32 if value >= 2 ** 31 else value
+
+
+class _Book:
+
+    def __init__(self, price, rng):
+        self.rng = rng
+        self.price = price
+        # roughly five significant digits of tick, like most USDT-M contracts
+        exponent = math.floor(math.log10(price)) - 4
+        self.tick = 10.0 ** exponent
+        self.decimals = max(-exponent, 0)
+        self.asks = [[self.__fmt(price + self.tick * (i + 1)), self.__size()] for i in range(BOOK_LEVELS)]
+        self.bids = [[self.__fmt(price - self.tick * (i + 1)), self.__size()] for i in range(BOOK_LEVELS)]
+
+    def __fmt(self, price):
+        return "%.*f" % (self.decimals, price)
+
+    def __size(self):
+        return "%.3f" % self.rng.uniform(0.1, 500)
+
+    def update(self, count=5):
+        """Resize a few levels in place and return (asks, bids) deltas."""
+        asks, bids = [], []
+        for side, delta in ((self.asks, asks), (self.bids, bids)):
+            for i in {self.rng.randrange(BOOK_LEVELS) for _ in range(count)}:
+                side[i][1] = self.__size()
+                delta.append(list(side[i]))
+        return asks, bids
+
+    def message(self, asks, bids):
+        return {"asks": asks, "bids": bids, "checksum": signed_checksum(self.asks, self.bids)}
+
+
+class SimulatedWsServer:
+    """
+    Bitget v2 public/private websocket stand-in.
+
+    Answers ping/login/subscribe/unsubscribe and, every `interval` seconds,
+    pushes candle{granularity}, ticker and books updates for each subscribed
+    instrument from the SimulatedExchange replay. Candle and books
+    subscriptions get a snapshot first, like the real feed.
+    """
+
+    def __init__(self, exchange, interval=1.0, snapshot_candles=200, seed=None):
+        self.exchange = exchange
+        self.interval = interval
+        self.snapshot_candles = snapshot_candles
+        self.rng = random.Random(seed)
+        self.connections = 0
+        self.messages_sent = 0
+
+    async def handler(self, websocket):
+        self.connections += 1
+        subscriptions = {}
+        books = {}
+        pusher = asyncio.create_task(self.__push(websocket, subscriptions, books))
+        try:
+            async for message in websocket:
+                if message == "ping":
+                    await websocket.send("pong")
+                    continue
+                try:
+                    request = json.loads(message)
+                except ValueError:
+                    await self.__send(websocket, {"event": "error", "code": 30001, "msg": "illegal request"})
+                    continue
+                await self.__on_request(websocket, request, subscriptions, books)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            pusher.cancel()
+            self.connections -= 1
+
+    async def __on_request(self, websocket, request, subscriptions, books):
+        op = request.get("op")
+        if op == "login":
+            await self.__send(websocket, {"event": "login", "code": 0, "msg": ""})
+            return
+        if op not in ("subscribe", "unsubscribe"):
+            await self.__send(websocket, {"event": "error", "code": 30001, "msg": f"unknown op {op}"})
+            return
+        for raw in request.get("args", []):
+            # the sync client serializes SubscribeReq attributes (inst_type/inst_id)
+            arg = {"instType": raw.get("instType") or raw.get("inst_type"),
+                   "channel": raw.get("channel"),
+                   "instId": raw.get("instId") or raw.get("inst_id")}
+            key = (arg["channel"], arg["instId"])
+            if arg["instId"] not in self.exchange.closes:
+                await self.__send(websocket, {"event": "error", "arg": arg, "code": 30001,
+                                              "msg": f"instType:{arg['instType']},channel:{arg['channel']},"
+                                                     f"instId:{arg['instId']} doesn't exist"})
+                continue
+            if op == "unsubscribe":
+                subscriptions.pop(key, None)
+                books.pop(key, None)
+                await self.__send(websocket, {"event": "unsubscribe", "arg": arg})
+                continue
+            subscriptions[key] = arg
+            await self.__send(websocket, {"event": "subscribe", "arg": arg})
+            await self.__snapshot(websocket, arg, books)
+
+    async def __snapshot(self, websocket, arg, books):
+        channel, inst_id = arg["channel"], arg["instId"]
+        if channel.startswith("candle"):
+            rows = self.exchange.candles(inst_id, channel[len("candle"):], limit=self.snapshot_candles)
+            await self.__send(websocket, {"action": "snapshot", "arg": arg, "data": rows, "ts": self.exchange.now_ms()})
+        elif channel.startswith("books"):
+            book = books[(channel, inst_id)] = _Book(self.exchange.closes[inst_id][self.exchange.now_index()], self.rng)
+            data = book.message([list(a) for a in book.asks], [list(b) for b in book.bids])
+            await self.__send(websocket, {"action": "snapshot", "arg": arg, "data": [data], "ts": self.exchange.now_ms()})
+
+    async def __push(self, websocket, subscriptions, books):
+        while True:
+            await asyncio.sleep(self.interval)
+            for (channel, inst_id), arg in list(subscriptions.items()):
+                now = self.exchange.now_ms()
+                if channel.startswith("candle"):
+                    rows = self.exchange.candles(inst_id, channel[len("candle"):], limit=1)
+                    await self.__send(websocket, {"action": "update", "arg": arg, "data": rows, "ts": now})
+                elif channel == "ticker":
+                    await self.__send(websocket, {"action": "snapshot", "arg": arg,
+                                                  "data": [self.exchange.ticker(inst_id)], "ts": now})
+                elif channel.startswith("books"):
+                    book = books.get((channel, inst_id))
+                    price = self.exchange.closes[inst_id][self.exchange.now_index()]
+                    if book is None or book.price != price:
+                        # the replay moved to a new bar; re-center the book
+                        await self.__snapshot(websocket, arg, books)
+                        continue
+                    data = book.message(*book.update())
+                    await self.__send(websocket, {"action": "update", "arg": arg, "data": [data], "ts": now})
+
+    async def __send(self, websocket, message):
+        await websocket.send(json.dumps(message))
+        self.messages_sent += 1
+
+    def serve(self, host="127.0.0.1", port=0):
+        """websockets server coroutine; await it inside a running loop."""
+        return websockets.serve(self.handler, host, port)
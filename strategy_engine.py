@@ -0,0 +1,463 @@
+import logging
+
+from constants import WINDOW, NUM_STD, TRADING_STRATEGIES, STRATEGIES
+from bollinger import evaluate_market
+from profiler import span
+
+logger = logging.getLogger(__name__)
+
+# Indicator keys are tuples: (name, *params). A param may itself be a key,
+# e.g. ("pct_slope", ("sma", 50)) is the percentage slope of the 50-bar SMA.
+# Equal keys are computed once per data pass, whichever strategies ask for them.
+CLOSE = ("close",)
+
+# rolling keys over the closes, computed for all their windows at once by indicators.WindowKernels
+KERNEL_KEYS = ("sma", "std", "ema")
+
+
+def _pct_slope(get, source):
+    series = get(source)
+    return (series.diff(1) / series.shift(1) * 100).fillna(0)
+
+
+def _slope(get, source, lag):
+    series = get(source)
+    return (series.diff(lag) / series.shift(1) * 100).fillna(0)
+
+
+def _minmax(get, source, window):
+    # min-max normalisation to [-1, 1], as in normalized_slope_simulation.ipynb
+    series = get(source)
+    low = series.rolling(window=window, min_periods=1).min()
+    high = series.rolling(window=window, min_periods=1).max()
+    return (2 * (series - low) / (high - low).replace(0, 1) - 1).fillna(0)
+
+
+def _kalman(get, process_var=1e-5, meas_var=0.1):
+    """
+    One-dimensional random-walk Kalman filter, run for every market at once.
+
+    Same model and initial state as the pykalman filter in the notebooks
+    (initial mean = first price, initial covariance 1); a missing price
+    only advances the prediction.
+    """
+    import numpy as np
+    import pandas as pd
+
+    prices = get(CLOSE)
+    z = prices.to_numpy(dtype=float)
+    out = np.full_like(z, np.nan)
+    x = np.full(z.shape[1], np.nan)
+    p = np.ones(z.shape[1])
+    for row in range(len(z)):
+        observed = ~np.isnan(z[row])
+        new = observed & np.isnan(x)
+        x[new] = z[row, new]
+        p[new] = 1.0
+        # the first observation is updated against the initial state, without a transition
+        p[observed & ~new] += process_var
+        p[~observed] += process_var
+        gain = p[observed] / (p[observed] + meas_var)
+        x[observed] += gain * (z[row, observed] - x[observed])
+        p[observed] *= 1 - gain
+        out[row] = x
+    return pd.DataFrame(out, index=prices.index, columns=prices.columns)
+
+
+INDICATORS = {
+    "pct_slope": _pct_slope,
+    "slope": _slope,
+    "minmax": _minmax,
+    "kalman": _kalman,
+}
+
+
+class IndicatorSet:
+    """
+    Indicator values for one pass over a close-only price frame.
+
+    Each key is computed at most once, over every market column in a single
+    vectorised call, and kept as a bars x markets array. The sma, std and
+    ema keys of a pass share one WindowKernels prefix-sum pass (prefetch).
+    """
+
+    def __init__(self, closes):
+        self.closes = closes
+        self.columns = {market: i for i, market in enumerate(closes.columns)}
+        self.__frames = {CLOSE: closes}
+        self.__arrays = {}
+        self.__kernels = None
+
+    def prefetch(self, keys):
+        """Compute the sma/std/ema keys among `keys` and their inputs, one kernel call per kind."""
+        import pandas as pd
+        from indicators import WindowKernels
+
+        windows = {}
+        for key in _walk(keys):
+            if key[0] in KERNEL_KEYS and key not in self.__frames:
+                windows.setdefault(key[0], {})[key[1]] = None
+        if not windows:
+            return
+        if self.__kernels is None:
+            self.__kernels = WindowKernels(self.closes)
+        for name, values in windows.items():
+            values = list(values)
+            with span("indicator", key=name, windows=len(values)):
+                arrays = getattr(self.__kernels, name)(values)
+            for window, array in zip(values, arrays):
+                self.__arrays[(name, window)] = array
+                self.__frames[(name, window)] = pd.DataFrame(array, index=self.closes.index,
+                                                             columns=self.closes.columns)
+
+    def frame(self, key):
+        frame = self.__frames.get(key)
+        if frame is None:
+            if key[0] in KERNEL_KEYS:
+                self.prefetch([key])
+                return self.__frames[key]
+            with span("indicator", key=repr(key)):
+                frame = INDICATORS[key[0]](self.frame, *key[1:])
+            self.__frames[key] = frame
+        return frame
+
+    def array(self, key):
+        array = self.__arrays.get(key)
+        if array is None:
+            array = self.__arrays[key] = self.frame(key).to_numpy(dtype=float)
+        return array
+
+    def __len__(self):
+        return len(self.closes)
+
+
+def _walk(keys):
+    """Every key in `keys` and, depth first, the keys nested in their parameters."""
+    for key in keys:
+        yield key
+        yield from _walk(param for param in key[1:] if isinstance(param, tuple))
+
+
+class BarView:
+    """One market at one bar of an IndicatorSet, as seen by Strategy.evaluate."""
+
+    __slots__ = ("indicators", "column", "row")
+
+    def __init__(self, indicators, column, row):
+        self.indicators = indicators
+        self.column = column
+        self.row = row
+
+    @property
+    def price(self):
+        return self[CLOSE]
+
+    def __getitem__(self, key):
+        return self.indicators.array(key)[self.row, self.column]
+
+    def prev(self, key, bars=1):
+        """`key` `bars` bars back, or NaN before the first bar."""
+        row = self.row - bars if self.row >= 0 else len(self.indicators) + self.row - bars
+        if row < 0:
+            return float("nan")
+        return self.indicators.array(key)[row, self.column]
+
+
+class Strategy:
+    """
+    Base class for strategies run by StrategyEngine.
+
+    Subclasses list the indicator keys they read in indicators() and return
+    a signal from evaluate(): "long", "short", "exit" or None. They never
+    compute indicators themselves, so strategies asking for the same key
+    share one computation.
+
+    Args:
+        name: name used in logs and in the engine's results
+        markets: markets to evaluate; defaults to the TRADING_STRATEGIES keys
+        directions: {market: "long" | "short" | "both"}; defaults to TRADING_STRATEGIES
+    """
+
+    def __init__(self, name, markets=None, directions=None):
+        self.name = name
+        self.directions = directions if directions is not None else TRADING_STRATEGIES
+        self.markets = list(markets or self.directions.keys())
+        self.positions = {}
+
+    def indicators(self):
+        return []
+
+    def evaluate(self, market, bar):
+        raise NotImplementedError
+
+    def allows(self, market, side):
+        return self.directions.get(market, "both") in (side, "both")
+
+
+class BollingerStrategy(Strategy):
+    """
+    The live band strategy from bollinger.py; places orders through evaluate_market.
+
+    `positions` is the open_trades dict and is persisted by manage_trade.
+    """
+
+    def __init__(self, name="bollinger", window=WINDOW, num_std=NUM_STD, **kwargs):
+        super().__init__(name, **kwargs)
+        self.num_std = num_std
+        self.mean_key = ("sma", window)
+        self.std_key = ("std", window)
+
+    def indicators(self):
+        return [self.mean_key, self.std_key]
+
+    def evaluate(self, market, bar):
+        middle, std = bar[self.mean_key], bar[self.std_key]
+        upper, lower = middle + std * self.num_std, middle - std * self.num_std
+        direction = self.directions.get(market, "both")
+        if evaluate_market(market, bar.price, upper, middle, lower, self.positions, direction):
+            del self.positions[market]
+            return "exit"
+        return None
+
+
+class SignalStrategy(Strategy):
+    """
+    Strategy that only reports signals and tracks its own paper positions.
+
+    Subclasses implement entry(bar) -> "long" | "short" | None and
+    exit(bar, side) -> bool. Entries against the market's configured
+    direction are ignored. Subclasses whose conditions are plain array
+    comparisons also implement masks(), which the backtester uses to skip
+    bars with nothing to decide (analysis/backtester.py).
+    """
+
+    def masks(self, indicators):
+        """
+        entry() and exit() for every bar at once, or None if the strategy has no array form.
+
+        Returns:
+            tuple: ({"long": array, "short": array} entry conditions,
+                    {"long": array, "short": array} exit conditions), bars x markets booleans
+        """
+        return None
+
+    def evaluate(self, market, bar):
+        position = self.positions.get(market)
+        if position is not None:
+            if not self.exit(bar, position['side']):
+                return None
+            del self.positions[market]
+            signal = "exit"
+        else:
+            signal = self.entry(bar)
+            if signal is None or not self.allows(market, signal):
+                return None
+            self.positions[market] = {"side": signal, "price": bar.price}
+        logger.info("%s %s %s at %s", self.name, signal, market, bar.price,
+                    extra={"event": "signal", "strategy": self.name, "market": market,
+                           "signal": signal, "price": bar.price})
+        return signal
+
+
+class SlopeMomentumStrategy(SignalStrategy):
+    """
+    Moving-average slope momentum from the slope simulation notebooks.
+
+    Enters long when the slope is at or above `entry_threshold`, short at or
+    below -entry_threshold; exits a long at or below `exit_threshold` and a
+    short at or above -exit_threshold.
+
+    Parameters:
+    - window (int): SMA window (also the slope lag and normalisation window when normalized).
+    - slope (str): "percentage" (bar-to-bar % change) or "normalized" (min-max scaled to [-1, 1]).
+    - use_kalman (bool): Smooth with a Kalman filter instead of the SMA.
+    - kalman_params (dict): process_var and meas_var for the Kalman filter.
+    """
+
+    def __init__(self, name, window=50, entry_threshold=0.1, exit_threshold=0.0, slope="percentage",
+                 use_kalman=False, kalman_params=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.entry_threshold = entry_threshold
+        self.exit_threshold = exit_threshold
+        if use_kalman:
+            params = kalman_params or {}
+            source = ("kalman", params.get("process_var", 1e-5), params.get("meas_var", 0.1))
+        else:
+            source = ("sma", window)
+        if slope == "percentage":
+            self.slope_key = ("pct_slope", source)
+        elif slope == "normalized":
+            self.slope_key = ("minmax", ("slope", source, window), window)
+        else:
+            raise ValueError("slope must be 'percentage' or 'normalized'")
+
+    def indicators(self):
+        return [self.slope_key]
+
+    def entry(self, bar):
+        slope = bar[self.slope_key]
+        if slope >= self.entry_threshold:
+            return "long"
+        if slope <= -self.entry_threshold:
+            return "short"
+        return None
+
+    def exit(self, bar, side):
+        slope = bar[self.slope_key]
+        if side == "long":
+            return slope <= self.exit_threshold
+        return slope >= -self.exit_threshold
+
+    def masks(self, indicators):
+        slope = indicators.array(self.slope_key)
+        return ({"long": slope >= self.entry_threshold, "short": slope <= -self.entry_threshold},
+                {"long": slope <= self.exit_threshold, "short": slope >= -self.exit_threshold})
+
+
+class EmaSmaStrategy(SignalStrategy):
+    """
+    EMA/SMA trend strategy from ema_sma.ipynb.
+
+    Enters long when the EMA is above the SMA and its slope exceeds
+    `entry_threshold` (short: below, and under -entry_threshold); exits when
+    the EMA crosses back or its slope turns past `exit_threshold`.
+    """
+
+    def __init__(self, name, ema_span=20, sma_window=50, entry_threshold=0.05, exit_threshold=0.05, **kwargs):
+        super().__init__(name, **kwargs)
+        self.entry_threshold = entry_threshold
+        self.exit_threshold = exit_threshold
+        self.ema_key = ("ema", ema_span)
+        self.sma_key = ("sma", sma_window)
+        self.slope_key = ("pct_slope", self.ema_key)
+
+    def indicators(self):
+        return [self.ema_key, self.sma_key, self.slope_key]
+
+    def entry(self, bar):
+        ema, sma, slope = bar[self.ema_key], bar[self.sma_key], bar[self.slope_key]
+        if ema > sma and slope > self.entry_threshold:
+            return "long"
+        if ema < sma and slope < -self.entry_threshold:
+            return "short"
+        return None
+
+    def exit(self, bar, side):
+        ema, sma, slope = bar[self.ema_key], bar[self.sma_key], bar[self.slope_key]
+        if side == "long":
+            return ema < sma or slope < -self.exit_threshold
+        return ema > sma or slope > self.exit_threshold
+
+    def masks(self, indicators):
+        ema, sma = indicators.array(self.ema_key), indicators.array(self.sma_key)
+        slope = indicators.array(self.slope_key)
+        return ({"long": (ema > sma) & (slope > self.entry_threshold),
+                 "short": (ema < sma) & (slope < -self.entry_threshold)},
+                {"long": (ema < sma) | (slope < -self.exit_threshold),
+                 "short": (ema > sma) | (slope > self.exit_threshold)})
+
+
+STRATEGY_TYPES = {
+    "bollinger": BollingerStrategy,
+    "slope_momentum": SlopeMomentumStrategy,
+    "ema_sma": EmaSmaStrategy,
+}
+
+
+class StrategyEngine:
+    """
+    Runs every registered strategy over one shared pass of market data.
+
+    load() computes the union of the indicators the strategies ask for, each
+    key once for all markets and all moving-average windows in one kernel
+    pass; step() then evaluates every strategy on one
+    bar with plain array lookups. Adding a strategy that reuses existing
+    indicators costs only its evaluate() calls.
+    """
+
+    def __init__(self, strategies=()):
+        self.strategies = []
+        self.indicators = None
+        for strategy in strategies:
+            self.add(strategy)
+
+    def add(self, strategy):
+        if any(s.name == strategy.name for s in self.strategies):
+            raise ValueError(f"Duplicate strategy name: {strategy.name}")
+        self.strategies.append(strategy)
+        return strategy
+
+    def get(self, name):
+        for strategy in self.strategies:
+            if strategy.name == name:
+                return strategy
+        return None
+
+    def markets(self):
+        return list(dict.fromkeys(m for s in self.strategies for m in s.markets))
+
+    def load(self, price_data):
+        """
+        Compute every requested indicator over `price_data`.
+
+        Args:
+            price_data: DataFrame with one close column per market (and optionally 'time')
+
+        Returns:
+            IndicatorSet: the shared indicator values
+        """
+        markets = [m for m in self.markets() if m in price_data.columns]
+        missing = set(self.markets()) - set(markets)
+        if missing:
+            logger.warning("No price data for %s", ", ".join(sorted(missing)))
+        indicators = IndicatorSet(price_data[markets])
+        keys = dict.fromkeys(key for s in self.strategies for key in s.indicators())
+        indicators.prefetch(keys)
+        for key in keys:
+            indicators.array(key)
+        self.indicators = indicators
+        return indicators
+
+    def step(self, row=-1):
+        """
+        Evaluate every strategy on bar `row` of the loaded data.
+
+        Returns:
+            dict: {strategy name: {market: signal}} for the non-None signals
+        """
+        columns = self.indicators.columns
+        signals = {}
+        for strategy in self.strategies:
+            fired = {}
+            with span("decision", strategy=strategy.name):
+                for market in strategy.markets:
+                    column = columns.get(market)
+                    if column is None:
+                        continue
+                    signal = strategy.evaluate(market, BarView(self.indicators, column, row))
+                    if signal is not None:
+                        fired[market] = signal
+            signals[strategy.name] = fired
+        return signals
+
+    def run(self, price_data):
+        """Load `price_data` and evaluate its newest bar."""
+        self.load(price_data)
+        return self.step(-1)
+
+
+def build_strategy(name, params):
+    params = dict(params)
+    strategy_type = params.pop("type", name)
+    return STRATEGY_TYPES[strategy_type](name=name, **params)
+
+
+_engine = None
+
+
+def get_engine():
+    """Shared engine holding the strategies configured in constants.STRATEGIES."""
+    global _engine
+    if _engine is None:
+        _engine = StrategyEngine(build_strategy(name, params) for name, params in STRATEGIES.items())
+    return _engine
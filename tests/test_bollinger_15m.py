@@ -0,0 +1,15 @@
+import bollinger_15m
+
+
+def test_failed_fetch_skips_the_cycle(monkeypatch):
+    traded = []
+    monkeypatch.setattr(bollinger_15m, "manage_trade", traded.append)
+
+    def fetch():
+        raise ConnectionError("candles unavailable")
+
+    bollinger_15m.run_cycle(fetch)
+    assert traded == []
+
+    bollinger_15m.run_cycle(lambda: "prices")
+    assert traded == ["prices"]
@@ -0,0 +1,37 @@
+import threading
+import time
+
+from bitget.client import Client
+from bitget.clock import ClockSync
+
+
+def test_lazy_server_clock_is_installed_once_without_blocking(monkeypatch):
+    synced = threading.Event()
+
+    def slow_sync(self):
+        time.sleep(0.5)
+        self.offset_ms = 1000
+        synced.set()
+        return self.offset_ms
+
+    monkeypatch.setattr(ClockSync, "sync", slow_sync)
+    monkeypatch.setattr(Client, "clock", None)
+    clocks = []
+
+    def first_request():
+        clocks.append(Client._server_clock())
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=first_request) for _ in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    try:
+        assert time.perf_counter() - start < 0.4
+        assert len(set(map(id, clocks))) == 1
+        assert clocks[0].offset_ms == 0
+        assert synced.wait(5)
+        assert clocks[0].offset_ms == 1000
+    finally:
+        clocks[0].stop()
@@ -0,0 +1,26 @@
+from contracts import ContractCache
+
+
+class FakeMarketApi:
+    def contracts(self, params):
+        return {"data": [{"symbol": "BTCUSDT", "pricePlace": "1", "priceEndStep": "1", "volumePlace": "3",
+                          "sizeMultiplier": "0.001", "minTradeNum": "0.01"}]}
+
+
+def cache(tmp_path):
+    return ContractCache(file_path=str(tmp_path / "contracts.json"), market_api=FakeMarketApi())
+
+
+def test_spec_sizes_round_down_and_respect_the_minimum(tmp_path):
+    contracts = cache(tmp_path)
+    assert contracts.quantize_size("BTCUSDT", 0.12399) == 0.123
+    assert contracts.quantize_size("BTCUSDT", 0.004) == 0.01
+    assert contracts.quantize_size("BTCUSDT", 0.004, raise_to_min=False) == 0.0
+
+
+def test_sizes_without_a_spec_round_toward_zero(tmp_path):
+    contracts = cache(tmp_path)
+    assert contracts.quantize_size("NEWUSDT", 1.99999) == 1.999
+    assert contracts.quantize_size("NEWUSDT", 123456.7) == 123400.0
+    # the minimum is unknown, so a scaled-down size is not placed
+    assert contracts.quantize_size("NEWUSDT", 1.99999, raise_to_min=False) == 0.0
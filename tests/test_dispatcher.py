@@ -0,0 +1,31 @@
+import threading
+
+from bitget.ws.dispatcher import OrderedDispatcher
+
+
+def test_pending_counts_return_to_zero():
+    dispatcher = OrderedDispatcher(workers=4).start()
+    done = threading.Event()
+    handled = []
+
+    def handler(message):
+        handled.append(message)
+        if len(handled) == 20000:
+            done.set()
+
+    for i in range(20000):
+        dispatcher.submit("M%d" % (i % 50), handler, i)
+    assert done.wait(10)
+    dispatcher.stop()
+    assert dispatcher.stats()["pending_by_key"] == {}
+
+
+def test_full_queue_drops_are_logged_and_uncounted(caplog):
+    dispatcher = OrderedDispatcher(workers=1, max_queue=2)
+    # not started: nothing drains the queue
+    results = [dispatcher.submit("BTCUSDT", print, "candle %d" % i) for i in range(4)]
+    assert results == [True, True, False, False]
+    stats = dispatcher.stats()
+    assert stats["dropped"] == 2
+    assert stats["pending_by_key"] == {"BTCUSDT": 2}
+    assert [r.levelname for r in caplog.records if "dropped" in r.getMessage()] == ["WARNING", "WARNING"]
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from data_quality import validate_prices
+from resample import BUCKET_OFFSET_MS, GRANULARITY_MS
+from simulator.exchange import SimulatedExchange
+
+
+def closes(start, freq, rows=48):
+    times = pd.date_range(start, periods=rows, freq=freq)
+    return pd.DataFrame({"time": times.strftime("%Y-%m-%d %H:%M:%S"), "BTCUSDT": np.linspace(100, 110, rows)})
+
+
+def test_long_granularities_validate_on_the_utc8_grid():
+    # Bitget's 6H and 1D candles open at 16:00 UTC, the UTC+8 midnight
+    for granularity, freq in (("6H", "6h"), ("1D", "1D")):
+        _, report = validate_prices(closes("2024-01-01 16:00", freq), granularity)
+        assert report.misaligned == 0
+        assert report.missing_bars == 0
+
+
+def test_inferred_granularity_follows_the_grid():
+    assert validate_prices(closes("2024-01-01 16:00", "1D"), None)[1].granularity == "1D"
+    assert validate_prices(closes("2024-01-01 00:00", "1D"), None)[1].granularity == "1Dutc"
+
+
+def test_simulator_buckets_match_resample(tmp_path):
+    path = tmp_path / "data_15m.csv"
+    closes("2024-01-01 00:00", "15min", rows=400).to_csv(path, index=False)
+    exchange = SimulatedExchange(str(path), start_index=399)
+    for requested, granularity in (("1H", "1H"), ("1h", "1H"), ("6H", "6H"), ("1D", "1D"), ("1Dutc", "1Dutc")):
+        rows = exchange.candles("BTCUSDT", requested, limit=3)
+        span, offset = GRANULARITY_MS[granularity], BUCKET_OFFSET_MS.get(granularity, 0)
+        assert all((int(row[0]) + offset) % span == 0 for row in rows[1:]), requested
@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+from benchmarks.import_budget import BUDGETS, LAZY_MODULES, measure
+
+# slow CI hosts can widen the budgets, as --scale does for the script
+SCALE = float(os.environ.get("IMPORT_BUDGET_SCALE", 1.0))
+
+
+@pytest.mark.parametrize("name", list(BUDGETS))
+def test_entry_point_import_budget(name):
+    modules, budget = BUDGETS[name]
+    elapsed, loaded = measure(modules, repeat=3)
+    assert not loaded, "importing %s loads %s, which should wait for first use (LAZY_MODULES: %s)" % (
+        name, ", ".join(loaded), ", ".join(LAZY_MODULES))
+    assert elapsed <= budget * SCALE, "importing %s took %.1f ms, budget %.0f ms" % (name, elapsed, budget * SCALE)
@@ -0,0 +1,28 @@
+import json
+
+from bitget import consts as c
+from bitget.ws.bitget_ws_client import WS_OP_SUBSCRIBE, BaseWsReq, SubscribeReq
+from bitget.ws.reconnect import ReconnectManager
+
+
+def test_batches_fit_the_message_limits_with_envelope():
+    manager = ReconnectManager()
+    channels = [SubscribeReq("USDT-FUTURES", "candle15m", "MARKET%04dUSDT" % i) for i in range(500)]
+    batches = list(manager.batches(channels))
+    assert sum(len(batch) for batch in batches) == len(channels)
+    for batch in batches:
+        # serialized exactly as send_message sends it
+        frame = json.dumps(BaseWsReq(WS_OP_SUBSCRIBE, batch), default=lambda o: o.__dict__)
+        assert len(frame.encode()) <= c.WS_MAX_MESSAGE_BYTES
+        assert len(batch) <= c.WS_MAX_ARGS_PER_MESSAGE
+
+
+def test_snapshot_after_reconnect_clears_gap():
+    manager = ReconnectManager()
+    manager.on_disconnect(["a", "b"])
+    manager.on_reconnected()
+    # a snapshot for "a" handled before the resubscription finishes
+    manager.clear_missed(["a"])
+    manager.on_resubscribed()
+    assert list(manager.missed_channels()) == ["b"]
+    assert manager.stats()["gap_count"] == 1
@@ -0,0 +1,83 @@
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+import requests
+
+from analysis.results_store import ResultsStore
+from analysis.sweep import SweepCoordinator, SweepQueue, make_server, run_workers, split_units
+
+SPACE = {"name": "test_sweep", "iterations": 6, "unit_size": 2, "seed": 1,
+         "window_range": [10, 30], "entry_threshold_range": [0.01, 0.05], "exit_threshold_range": [-0.05, 0.0],
+         # an unparseable date range makes every unit of the second half fail on the worker
+         "date_ranges": [[None, None], ["not a date", "not a date"]]}
+
+
+def price_data(rows=400):
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2024-01-01", periods=rows, freq="15min", name="time")
+    walks = {market: 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows))) for market in ("BTCUSDT", "ETHUSDT")}
+    return pd.DataFrame(walks, index=index)
+
+
+def serve(db_path):
+    """Coordinator on a free port; it is built on the server thread, which owns its SQLite connection."""
+    started = threading.Event()
+    state = {}
+
+    def run():
+        coordinator = SweepCoordinator(SPACE, price_data(), db_path, lease_seconds=60, max_attempts=2)
+        state["server"] = server = make_server(coordinator, "127.0.0.1", 0)
+        started.set()
+        try:
+            server.serve_forever(poll_interval=0.05)
+        finally:
+            server.server_close()
+            coordinator.store.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert started.wait(30)
+    return state["server"], thread
+
+
+def test_workers_finish_the_sweep_and_completion_is_idempotent(tmp_path, monkeypatch):
+    # workers cache the Parquet data under the temp dir; keep it inside the test's directory
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    db_path = str(tmp_path / "results.db")
+    server, thread = serve(db_path)
+    url = "http://127.0.0.1:%d" % server.server_port
+    try:
+        completed = run_workers(url, 3)
+        assert sum(completed) == 3
+        status = requests.get(url + "/status", timeout=10).json()
+        assert (status["done"], status["failed"], status["finished"]) == (3, 3, True)
+
+        with ResultsStore(db_path) as store:
+            evaluations = len(store.select())
+        assert evaluations == 6
+
+        unit_id = split_units(SPACE)[0][0]
+        duplicate = {"unit": unit_id, "worker": "late", "results": [{"window": 10, "returns": 1.0}]}
+        for _ in range(2):
+            reply = requests.post(url + "/complete", json=duplicate, timeout=10).json()
+            assert reply == {"accepted": False}
+        with ResultsStore(db_path) as store:
+            assert len(store.select()) == evaluations
+    finally:
+        server.shutdown()
+        thread.join(10)
+
+
+def test_second_completion_of_a_unit_is_ignored(tmp_path):
+    with ResultsStore(str(tmp_path / "results.db")) as store:
+        queue = SweepQueue(store, SPACE["name"])
+        queue.create(dict(SPACE, date_ranges=[[None, None]]), "fingerprint", "percentage_slope")
+        unit = queue.lease("a")[0]
+        results = [{"window": 10, "returns": 1.0}]
+        assert queue.complete(unit["id"], "a", results) is True
+        # a worker whose lease expired reports the same unit again
+        assert queue.complete(unit["id"], "b", results) is False
+        assert len(store.select()) == 1
+        assert queue.status()["done"] == 1
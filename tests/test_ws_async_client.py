@@ -0,0 +1,168 @@
+import asyncio
+import json
+
+from bitget.ws.bitget_ws_async_client import COALESCE, DROP_OLDEST, BitgetWsAsyncClient, ChannelQueue
+from bitget.ws.bitget_ws_client import SubscribeReq
+from bitget.ws.reconnect import ReconnectManager
+from ws_stub import StubServer
+
+TICKER = SubscribeReq("USDT-FUTURES", "ticker", "BTCUSDT")
+
+
+def ticker_frame(price):
+    return {"action": "snapshot", "arg": {"instType": "USDT-FUTURES", "channel": "ticker", "instId": "BTCUSDT"},
+            "data": [{"instId": "BTCUSDT", "lastPr": str(price)}]}
+
+
+async def until(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+
+def run(coroutine):
+    asyncio.run(asyncio.wait_for(coroutine, 20))
+
+
+def fast_reconnect():
+    return ReconnectManager(base_delay=0.01, max_delay=0.05, messages_per_second=1000)
+
+
+def test_subscribe_routes_channel_frames_to_listener():
+    async def scenario():
+        async with StubServer() as server:
+            client = await BitgetWsAsyncClient(server.url).build()
+            received = []
+            await client.subscribe([TICKER], received.append)
+            await until(lambda: server.subscribes())
+            assert server.subscribes()[0]["channel"] == "ticker"
+            await server.push(ticker_frame(100))
+            await until(lambda: received)
+            assert json.loads(received[0])["data"][0]["lastPr"] == "100"
+            await client.close()
+
+    run(scenario())
+
+
+def test_login_before_connected():
+    async def scenario():
+        async with StubServer() as server:
+            client = BitgetWsAsyncClient(server.url, need_login=True)
+            client.api_key("key").api_secret_key("secret").passphrase("phrase")
+            await client.build()
+            login = [request for _, request in server.requests if request["op"] == "login"]
+            assert len(login) == 1
+            assert login[0]["args"][0]["api_key"] == "key"
+            assert login[0]["args"][0]["sign"]
+            assert client.has_connect()
+            await client.close()
+
+    run(scenario())
+
+
+def test_drop_oldest_keeps_newest_messages():
+    async def scenario():
+        queue = ChannelQueue(3, DROP_OLDEST)
+        for i in range(5):
+            queue.put(i)
+        assert queue.dropped == 2
+        assert [await queue.get() for _ in range(len(queue))] == [2, 3, 4]
+
+    run(scenario())
+
+
+def test_coalesce_collapses_pending_messages():
+    async def scenario():
+        queue = ChannelQueue(3, COALESCE)
+        for i in range(5):
+            queue.put(i)
+        # the fourth put found the queue full and dropped the three pending messages
+        assert queue.dropped == 3
+        assert [await queue.get() for _ in range(len(queue))] == [3, 4]
+
+    run(scenario())
+
+
+def test_slow_listener_overflow_is_counted():
+    async def scenario():
+        async with StubServer() as server:
+            client = await BitgetWsAsyncClient(server.url, queue_size=2).build()
+            busy, release = asyncio.Event(), asyncio.Event()
+
+            async def slow(message):
+                busy.set()
+                await release.wait()
+
+            await client.subscribe([TICKER], slow)
+            await server.push(ticker_frame(0))
+            await busy.wait()
+            for price in range(1, 6):
+                await server.push(ticker_frame(price))
+            # the first frame is held by the listener, two queue up, the rest are dropped
+            await until(lambda: sum(q["dropped"] for q in client.queue_stats().values()) == 3)
+            release.set()
+            await client.close()
+
+    run(scenario())
+
+
+def test_missing_pong_closes_and_reconnects():
+    async def scenario():
+        async with StubServer(pong=False) as server:
+            client = await BitgetWsAsyncClient(server.url, ping_interval=0.1, ping_timeout=0.1,
+                                               reconnect_manager=fast_reconnect()).build()
+            await until(lambda: len(server.sockets) >= 2)
+            await until(client.has_connect)
+            assert client.reconnect_stats()["gap_count"] >= 1
+            await client.close()
+
+    run(scenario())
+
+
+def test_bad_frames_do_not_stop_the_read_loop():
+    async def scenario():
+        async with StubServer() as server:
+            client = await BitgetWsAsyncClient(server.url).build()
+            received = []
+            client.listener(lambda message: 1 / 0)
+            await client.subscribe([TICKER], received.append)
+            await server.push("{not json")
+            await server.push({"event": "info"})  # goes to the failing default listener
+            await server.push(ticker_frame(101))
+            await until(lambda: received)
+            assert client.has_connect()
+            assert len(server.sockets) == 1
+            await client.close()
+
+    run(scenario())
+
+
+def test_reconnect_resubscribes_and_marks_gap():
+    async def scenario():
+        async with StubServer() as server:
+            client = await BitgetWsAsyncClient(server.url, reconnect_manager=fast_reconnect()).build()
+            received = []
+            await client.subscribe([TICKER], received.append)
+            await until(lambda: server.subscribes(1))
+            await server.sockets[0].close()
+            await until(lambda: server.subscribes(2))
+            assert server.subscribes(2)[0]["inst_id"] == "BTCUSDT"
+            assert TICKER in client.missed_channels()
+            await server.push(ticker_frame(102))
+            await until(lambda: received)
+            await client.close()
+
+    run(scenario())
+
+
+def test_build_times_out_without_server():
+    async def scenario():
+        client = BitgetWsAsyncClient("ws://127.0.0.1:1", connect_timeout=0.3, reconnect_manager=fast_reconnect())
+        try:
+            await client.build()
+        except asyncio.TimeoutError:
+            return
+        raise AssertionError("build() did not time out")
+
+    run(scenario())
@@ -0,0 +1,60 @@
+import time
+
+from bitget.exceptions import BitgetWsReconnectException
+from bitget.ws.bitget_ws_client import BitgetWsClient, SubscribeReq
+from bitget.ws.reconnect import ReconnectManager
+from ws_stub import ThreadedStubServer
+
+TICKER = SubscribeReq("USDT-FUTURES", "ticker", "BTCUSDT")
+
+
+def until(condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "condition not met in time"
+        time.sleep(0.02)
+
+
+def fast_reconnect(budget=20):
+    return ReconnectManager(base_delay=0.01, max_delay=0.05, budget=budget, messages_per_second=1000)
+
+
+def test_every_drop_reconnects_and_resubscribes():
+    with ThreadedStubServer() as server:
+        client = BitgetWsClient(server.url).reconnect_manager(fast_reconnect()).build()
+        try:
+            client.subscribe([TICKER], lambda message: None)
+            until(lambda: server.subscribes(1))
+            # the second drop only reconnects if the first reconnect released its flag
+            for connection in (2, 3):
+                server.drop()
+                until(lambda: server.subscribes(connection))
+                assert server.subscribes(connection)[0]["inst_id"] == "BTCUSDT"
+            assert client.failure() is None
+            assert client.reconnect_stats()["gap_count"] == 2
+        finally:
+            client.close()
+
+
+def test_spent_budget_is_reported_through_failure():
+    errors = []
+    with ThreadedStubServer() as server:
+        client = BitgetWsClient(server.url).reconnect_manager(fast_reconnect(budget=2))
+        client.error_listener(errors.append).build()
+        try:
+            server.stop()
+            until(lambda: client.failure() is not None)
+        finally:
+            client.close()
+    assert isinstance(client.failure(), BitgetWsReconnectException)
+    assert errors and "budget" in errors[0]
+    assert not client.has_connect()
+
+
+def test_close_stops_reconnecting():
+    with ThreadedStubServer() as server:
+        client = BitgetWsClient(server.url).reconnect_manager(fast_reconnect()).build()
+        client.close()
+        time.sleep(0.3)
+        assert len(server.sockets) == 1
+        assert not client.has_connect()
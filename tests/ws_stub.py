@@ -0,0 +1,87 @@
+import asyncio
+import json
+import threading
+
+import websockets
+
+
+class StubServer:
+    """Minimal Bitget websocket: answers ping and login, acknowledges subscribes and records every request."""
+
+    def __init__(self, pong=True):
+        self.pong = pong
+        self.requests = []
+        self.sockets = []
+        self.server = None
+
+    async def handler(self, websocket):
+        self.sockets.append(websocket)
+        try:
+            async for message in websocket:
+                if message == "ping":
+                    if self.pong:
+                        await websocket.send("pong")
+                    continue
+                request = json.loads(message)
+                self.requests.append((len(self.sockets), request))
+                if request["op"] == "login":
+                    await websocket.send(json.dumps({"event": "login", "code": 0}))
+                elif request["op"] == "subscribe":
+                    for arg in request["args"]:
+                        await websocket.send(json.dumps({"event": "subscribe", "arg": arg}))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def push(self, frame):
+        await self.sockets[-1].send(frame if isinstance(frame, str) else json.dumps(frame))
+
+    def subscribes(self, connection=None):
+        return [arg for n, request in self.requests if request["op"] == "subscribe"
+                and (connection is None or n == connection) for arg in request["args"]]
+
+    async def __aenter__(self):
+        self.server = await websockets.serve(self.handler, "127.0.0.1", 0, close_timeout=1)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    @property
+    def url(self):
+        return "ws://127.0.0.1:%d" % self.server.sockets[0].getsockname()[1]
+
+
+class ThreadedStubServer(StubServer):
+    """StubServer on its own event loop thread, for the thread-based BitgetWsClient."""
+
+    def __enter__(self):
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def serve():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.__aenter__())
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=serve, daemon=True)
+        self.thread.start()
+        started.wait()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(5)
+
+    def drop(self):
+        """Close the newest client connection from the server side."""
+        self.call(self.sockets[-1].close())
+
+    def stop(self):
+        if self.loop.is_running():
+            self.call(self.__aexit__())
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(5)
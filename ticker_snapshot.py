@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from constants import TRADING_STRATEGIES
+from contracts import PRODUCT_TYPE
+from profiler import span
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("lastPr", "bidPr", "askPr")
+
+
+class TickerSnapshot:
+    """
+    Last, bid and ask price of every USDT-M contract from one MarketApi.tickers request.
+
+    The whole product type comes back in a single response, so a price
+    check over all of TRADING_STRATEGIES costs one request however many
+    markets it covers. Snapshots are reused for `ttl` seconds; after that
+    the next lookup refreshes. If a refresh fails, the previous snapshot is
+    kept (age() shows how old it is) and the next attempt waits another ttl.
+
+    Prices are held as (symbol x field) arrays; prices(markets) gathers a
+    whole universe with one index, NaN where the exchange sent no ticker.
+
+    Args:
+        ttl: seconds a snapshot is served before refetching
+        market_api: MarketApi to use; built from the credentials on first refresh otherwise
+    """
+
+    def __init__(self, ttl=5, market_api=None):
+        self.ttl = ttl
+        self.market_api = market_api
+        self.fetched_at = 0
+        self.__retry_at = 0
+        # (symbol -> row, values, timestamps, {markets: rows}), swapped whole on refresh;
+        # values end in an all-NaN row, which row -1 picks for markets without a ticker
+        self.__snapshot = ({}, np.full((1, len(FIELDS)), np.nan), np.zeros(0, dtype=np.int64), {})
+        self.__lock = threading.Lock()
+
+    @property
+    def symbols(self):
+        return list(self.__snapshot[0])
+
+    def age(self):
+        """Seconds since the current snapshot was fetched."""
+        return time.time() - self.fetched_at
+
+    def prices(self, markets=None, field="lastPr"):
+        """
+        One price per market, refreshing first if the snapshot is older than ttl.
+
+        Args:
+            markets: symbols, defaults to TRADING_STRATEGIES
+            field: "lastPr", "bidPr" or "askPr"
+
+        Returns:
+            numpy array aligned with `markets`, NaN for markets without a ticker
+        """
+        self.__ensure_fresh()
+        symbols, values, _, cache = self.__snapshot
+        markets = tuple(TRADING_STRATEGIES.keys() if markets is None else markets)
+        # lookups repeat the same universe every cycle; keep its rows per snapshot
+        rows = cache.get(markets)
+        if rows is None:
+            rows = cache[markets] = np.array([symbols.get(m, -1) for m in markets], dtype=np.intp)
+        return values[rows, FIELDS.index(field)]
+
+    def price(self, market, field="lastPr"):
+        """Price of one market, or None when the exchange sent no ticker for it."""
+        self.__ensure_fresh()
+        symbols, values, _, _ = self.__snapshot
+        row = symbols.get(market)
+        return None if row is None else float(values[row, FIELDS.index(field)])
+
+    def as_dict(self, markets=None, field="lastPr"):
+        """{market: price} for `markets`, leaving out markets without a ticker."""
+        markets = list(TRADING_STRATEGIES.keys() if markets is None else markets)
+        return {m: float(p) for m, p in zip(markets, self.prices(markets, field)) if p == p}
+
+    def __ensure_fresh(self):
+        if time.time() - self.fetched_at <= self.ttl or time.time() < self.__retry_at:
+            return
+        with self.__lock:
+            if time.time() - self.fetched_at <= self.ttl or time.time() < self.__retry_at:
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                # age() keeps growing, so callers can tell the snapshot went stale
+                logger.warning("Ticker refresh failed, keeping the previous %d tickers: %s", len(self.__snapshot[0]), e)
+                self.__retry_at = time.time() + self.ttl
+
+    def refresh(self):
+        if self.market_api is None:
+            from decouple import config
+            from bitget.v2.mix.market_api import MarketApi
+
+            self.market_api = MarketApi(config('apiKey'), config('secretKey'), config('passphrase'))
+        with span("ticker_snapshot"):
+            response = self.market_api.tickers({"productType": PRODUCT_TYPE})
+            rows = response["data"]
+            values = np.full((len(rows) + 1, len(FIELDS)), np.nan)
+            timestamps = np.zeros(len(rows), dtype=np.int64)
+            symbols = {}
+            for i, row in enumerate(rows):
+                symbols[row["symbol"]] = i
+                values[i] = [float(row.get(field) or "nan") for field in FIELDS]
+                timestamps[i] = int(row.get("ts") or 0)
+        self.__snapshot = (symbols, values, timestamps, {})
+        self.fetched_at = time.time()
+        logger.debug("Ticker snapshot refreshed: %d symbols", len(symbols))
+
+
+ticker_snapshot = TickerSnapshot()